@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark parsowania M3U w IPTV Dream
+1) Rozmiary: dawny parser tekstowy PlaylistLoader vs silnik M3U (bytes i mmap)
+   na syntetycznych listach 10k/100k/500k linii - czas i szczyt pamięci.
+2) Kształty list (plain, m3u_plus, EXTGRP, same URL): dawne parsery z czterech
+   miejsc wywołań vs wspólny silnik w odpowiadających im konfiguracjach.
+3) Tryb wieloprocesowy: parse_parallel na liście ~300k linii, przyspieszenie
+   (czas ścienny) względem liczby wycinków/procesów.
+
+Uruchomienie (na tunerze lub w środowisku z modułami Enigma2):
+    python bench_m3u.py                # domyślne rozmiary
+    python bench_m3u.py 20000 200000   # własne liczby linii
+"""
+
+import gc
+import importlib
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # Py2
+    tracemalloc = None
+
+DEFAULT_SIZES = (10000, 100000, 500000)
+SHAPE_CHANNELS = 50000
+PARALLEL_LINES = 300000
+PARALLEL_SLICES = (1, 2, 3, 4, 6, 8)
+GROUPS = ("Polska", "Sport HD", "VOD | Filmy", "XXX Adult", "Kids", "News", "Muzyka")
+
+
+def make_playlist(lines, seed=1):
+    """Syntetyczna lista m3u_plus (~lines linii): EXTINF z atrybutami, czasem EXTGRP, URL."""
+    rnd = random.Random(seed)
+    out = ["#EXTM3U"]
+    i = 0
+    while len(out) < lines:
+        group = rnd.choice(GROUPS)
+        out.append('#EXTINF:-1 tvg-id="ch%d.pl" tvg-name="Kanał %d" tvg-logo="http://logo.example.com/picons/%d.png" '
+                   'group-title="%s",Kanał żółć %d HD' % (i, i, i, group, i))
+        if i % 9 == 0:
+            out.append("#EXTGRP:Extra")
+        out.append("http://srv.example.com:8080/user/pass/%d.ts" % i)
+        i += 1
+    return ("\r\n".join(out) + "\r\n").encode("utf-8")
+
+
+def make_shapes(channels=SHAPE_CHANNELS):
+    """Listy o różnych kształtach, każda z ``channels`` pozycjami."""
+    url = "http://srv.example.com:8080/user/pass/%d.ts"
+    plain = ["#EXTM3U"]
+    extgrp = ["#EXTM3U"]
+    for i in range(channels):
+        plain.extend(("#EXTINF:-1,Channel %d HD" % i, url % i))
+        extgrp.extend(("#EXTINF:-1,Channel %d" % i, "#EXTGRP:Group %d" % (i % 50), url % i))
+    return (
+        ("plain", "\n".join(plain).encode("utf-8")),
+        ("m3u_plus", make_playlist(channels * 2 + channels // 9)),
+        ("EXTGRP", "\n".join(extgrp).encode("utf-8")),
+        ("same URL", "\n".join(url % i for i in range(channels)).encode("utf-8")),
+    )
+
+
+# ---------- dawne parsery (stan sprzed wspólnego silnika, tylko do porównań) ----------
+
+_L_ATTR = re.compile(r'([a-zA-Z0-9_-]+)\s*=\s*("[^"]*"|[^,;\s]+)')
+_L_GROUP = re.compile(r'^\[([^\]]+)\]')
+_L_ADULT = re.compile(r'(xxx|adult|porn|sex|erotic|18\+|mature)', re.IGNORECASE)
+_L_VOD = re.compile(r'(vod|movie|film|video|series|serial)', re.IGNORECASE)
+_L_EXT = re.compile(r'\.(ts|m3u8|mp4|mkv)$', re.IGNORECASE)
+_L_QUALITY = re.compile(r'(HD|FHD|UHD|4K|RAW|VIP|PL|UK|US)', re.IGNORECASE)
+_L_COUNTRIES = {
+    'PL': ['PL', 'POLSKA', 'POLAND'],
+    'UK': ['UK', 'GB', 'ENGLAND'],
+    'US': ['US', 'USA', 'AMERICA'],
+    'DE': ['DE', 'GERMANY', 'DEUTSCHLAND'],
+    'FR': ['FR', 'FRANCE'],
+    'IT': ['IT', 'ITALY'],
+    'ES': ['ES', 'SPAIN'],
+}
+
+
+def _legacy_loader_parse(content):
+    """Dawny PlaylistLoader.parse_m3u_content (ChannelMapper.map_channels parsował tak samo)."""
+    channels = []
+    current = {}
+    for line in content.decode("utf-8", "ignore").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF"):
+            current = {}
+            if ',' in line:
+                meta, title = line.split(',', 1)
+                current["title"] = title.strip()
+            else:
+                meta = line
+                current["title"] = "No Name"
+            for key, val in _L_ATTR.findall(meta):
+                val = val.replace('"', '').strip()
+                key = key.lower()
+                if key in ["group-title", "group", "category", "cat"]:
+                    current["group"] = val
+                elif key in ["tvg-logo", "logo"]:
+                    current["logo"] = val
+                elif key in ["tvg-id", "epg-id", "id"]:
+                    current["epg_id"] = val
+            if "group" not in current:
+                m = _L_GROUP.match(current["title"])
+                if m:
+                    current["group"] = m.group(1).strip()
+            continue
+        if line.startswith("#EXTGRP:"):
+            grp = line.split(":", 1)[1].strip()
+            if grp:
+                current["group"] = grp
+            continue
+        if "://" not in line or line.startswith("#"):
+            continue
+        entry = current or {"title": _L_EXT.sub('', line.split('/')[-1])}
+        current = {}
+        if not entry.get("group"):
+            title_lower = entry.get("title", "").lower()
+            if _L_ADULT.search(title_lower):
+                entry["group"] = "XXX"
+            elif _L_VOD.search(title_lower):
+                entry["group"] = "VOD"
+            elif '/movie/' in line.lower() or '/series/' in line.lower():
+                entry["group"] = "VOD"
+            else:
+                entry["group"] = "Inne"
+        channels.append({"title": entry.get("title", "No Name"), "url": line, "group": entry["group"],
+                         "logo": entry.get("logo", ""), "epg_id": entry.get("epg_id", "")})
+    return channels
+
+
+def _legacy_mapper_parse(content):
+    """Dawny ChannelMapper.map_channels (bez mapowania satelitarnego): grupa XXX/VOD/Inne
+    i metadane liczone regexami dla każdego kanału osobno."""
+    channels = []
+    for ch in _legacy_loader_parse(content):
+        title = ch["title"]
+        title_lower = title.lower()
+        url_lower = ch["url"].lower()
+        # dawne _determine_group nadpisywało każdą grupę
+        if _L_ADULT.search(title_lower):
+            group = "XXX"
+        elif _L_VOD.search(title_lower) or '/movie/' in url_lower or '/series/' in url_lower:
+            group = "VOD"
+        else:
+            group = "Inne"
+        m = _L_QUALITY.search(title)
+        title_upper = title.upper()
+        country = "UNKNOWN"
+        for code, keywords in _L_COUNTRIES.items():
+            if any(k in title_upper for k in keywords):
+                country = code
+                break
+        channels.append({"title": title, "url": ch["url"], "group": group, "logo": ch["logo"],
+                         "epg_id": ch["epg_id"],
+                         "metadata": {"quality": m.group(1) if m else "SD", "country": country,
+                                      "is_adult": group == "XXX", "is_vod": group == "VOD"}})
+    return channels
+
+
+def _legacy_mac_parse(content, clean_name, is_adult):
+    """Dawny tools/mac_portal.parse_m3u_text (na tekście)."""
+    channels = []
+    current = {}
+    attr_re = re.compile(r'([\w-]+)="(.*?)"')
+    for line in (content or '').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXTINF'):
+            title = line.rsplit(',', 1)[1].strip() if ',' in line else 'No Name'
+            attrs = {k.lower(): v for k, v in attr_re.findall(line.split(',', 1)[0])}
+            current = {
+                'title': clean_name(attrs.get('tvg-name') or title),
+                'group': clean_name(attrs.get('group-title') or attrs.get('group') or 'Main'),
+                'logo': attrs.get('tvg-logo') or attrs.get('logo') or '',
+                'epg_id': attrs.get('tvg-id') or attrs.get('epg-id') or attrs.get('id') or '',
+            }
+        elif (line.startswith('http') or '://' in line) and current:
+            logo = current['logo']
+            epg_id = current['epg_id']
+            channels.append({'title': current['title'], 'url': line, 'group': current['group'], 'logo': logo,
+                             'tvg-logo': logo, 'epg': '', 'epg_id': epg_id, 'tvg-id': epg_id,
+                             'is_adult': is_adult(current['title'], current['group'])})
+            current = {}
+    return channels
+
+
+def _legacy_xtream_parse(data):
+    """Dawny dream_v6.parse_m3u_bytes_improved (bez filtra treści)."""
+    extinf_re = re.compile(r"#EXTINF:(?P<attrs>[^,]*),(?P<title>.*)$")
+    attr_re = re.compile(r'(\w+?)="(.*?)"')
+    out = []
+    cur = None
+    for ln in data.decode("utf-8", "ignore").splitlines():
+        ln = ln.strip()
+        if not ln:
+            continue
+        if ln.startswith("#EXTINF"):
+            m = extinf_re.match(ln)
+            if not m:
+                cur = None
+                continue
+            a = {k: v for (k, v) in attr_re.findall(m.group("attrs"))}
+            cur = {"title": (m.group("title") or "").strip(), "group": a.get("group-title") or a.get("group") or "Inne",
+                   "tvg-logo": a.get("tvg-logo") or "", "tvg-id": a.get("tvg-id", ""), "tvg-name": a.get("tvg-name", "")}
+            continue
+        if ln.startswith("#"):
+            continue
+        if cur is not None:
+            cur["url"] = ln
+            out.append(cur)
+            cur = None
+    return out
+
+
+# ---------- pomiar ----------
+
+def _import_plugin():
+    """Importuje moduły pluginu z katalogu, w którym leży ten skrypt."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(here))
+    pkg = os.path.basename(here)
+    engine_mod = importlib.import_module(pkg + ".core.m3u_engine")
+    mapper_mod = importlib.import_module(pkg + ".core.channel_mapper")
+    mac_mod = importlib.import_module(pkg + ".tools.mac_portal")
+    main_mod = importlib.import_module(pkg + ".dream_v6")
+    return engine_mod, mapper_mod, mac_mod, main_mod
+
+
+# Czas CPU procesu (stabilniejszy niż zegar ścienny na obciążonym tunerze/VM).
+_clock = getattr(time, "process_time", time.time)
+
+
+def _best_of(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = _clock()
+        result = fn()
+        dt = _clock() - t0
+        best = dt if best is None else min(best, dt)
+    return best, result
+
+
+def _peak_mb(fn):
+    """Szczyt pamięci (MB) podczas jednego przebiegu - osobny przebieg, bo tracemalloc spowalnia."""
+    if tracemalloc is None:
+        return 0.0
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024.0 / 1024.0
+    finally:
+        tracemalloc.stop()
+
+
+def bench_sizes(engine_mod, sizes=DEFAULT_SIZES, repeat=5):
+    print("📊 BENCHMARK PARSOWANIA M3U - ROZMIARY")
+    print("=" * 84)
+    print("%-10s %-10s %-24s %9s %10s %7s %9s" % ("linie", "kanały", "parser", "czas [s]", "kanały/s", "x", "szczyt MB"))
+    for lines in sizes:
+        data = make_playlist(lines)
+        fd, path = tempfile.mkstemp(suffix=".m3u")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            runs = (
+                ("dawny parse_m3u_content", lambda: _legacy_loader_parse(data)),
+                ("silnik (bytes)", lambda: engine_mod.scan_m3u_bytes(data)),
+                ("silnik (mmap)", lambda: engine_mod.scan_m3u_file(path)),
+            )
+            baseline = None
+            for name, fn in runs:
+                dt, table = _best_of(fn, repeat)
+                count = len(table)
+                if baseline is None:
+                    baseline = dt
+                speed = (count / dt) if dt > 0 else 0
+                ratio = (baseline / dt) if dt > 0 else 0
+                peak = _peak_mb(fn)
+                print("%-10d %-10d %-24s %9.3f %10.0f %7.2f %9.1f" % (lines, count, name, dt, speed, ratio, peak))
+        finally:
+            os.remove(path)
+    print("=" * 84)
+
+
+def bench_shapes(engine_mod, mapper_mod, mac_mod, main_mod, channels=SHAPE_CHANNELS, repeat=5):
+    """Każde miejsce wywołania: dawny parser vs silnik w tej samej konfiguracji (ten sam wynik)."""
+    mapper = mapper_mod.ChannelMapper()
+    clean_name = mac_mod.clean_name
+    is_adult = mac_mod._is_adult_title_group
+
+    pairs = (
+        ("PlaylistLoader", _legacy_loader_parse, engine_mod.scan_m3u_bytes),
+        ("ChannelMapper", _legacy_mapper_parse, mapper.engine.parse),
+        ("MAC parse_m3u_text", lambda d: _legacy_mac_parse(d.decode("utf-8", "ignore"), clean_name, is_adult),
+         mac_mod.parse_m3u_text),
+        ("Xtream (dream_v6)", _legacy_xtream_parse, main_mod.parse_m3u_bytes_improved),
+    )
+
+    print("📊 BENCHMARK PARSOWANIA M3U - KSZTAŁTY LIST (%d pozycji)" % channels)
+    print("=" * 84)
+    print("%-10s %-20s %12s %12s %12s %8s" % ("kształt", "miejsce", "dawny [s]", "silnik [s]", "kanały", "x"))
+    for shape, data in make_shapes(channels):
+        for site, legacy, engine in pairs:
+            t_old, _res = _best_of(lambda: legacy(data), repeat)
+            t_new, res = _best_of(lambda: engine(data), repeat)
+            ratio = (t_old / t_new) if t_new > 0 else 0
+            print("%-10s %-20s %12.3f %12.3f %12d %8.2f" % (shape, site, t_old, t_new, len(res), ratio))
+    print("=" * 84)
+
+
+def bench_parallel(engine_mod, lines=PARALLEL_LINES, slice_counts=PARALLEL_SLICES, repeat=3):
+    """parse_parallel vs parse - czas ścienny (procesy potomne nie liczą się do process_time)."""
+    import multiprocessing
+    data = make_playlist(lines)
+    engine = engine_mod.DEFAULT_ENGINE
+    wall = getattr(time, "perf_counter", time.time)
+
+    def _wall_best(fn):
+        best = None
+        for _ in range(repeat):
+            gc.collect()
+            t0 = wall()
+            result = fn()
+            dt = wall() - t0
+            best = dt if best is None else min(best, dt)
+        return best, result
+
+    print("📊 BENCHMARK PARSOWANIA M3U - WIELE PROCESÓW (%d linii, %.1f MB, rdzenie: %d)" % (
+        lines, len(data) / 1024.0 / 1024.0, multiprocessing.cpu_count()))
+    print("=" * 84)
+    print("%-24s %10s %12s %10s" % ("tryb", "czas [s]", "kanały", "x"))
+    t_one, ref = _wall_best(lambda: engine.parse(data))
+    print("%-24s %10.3f %12d %10.2f" % ("parse (1 proces)", t_one, len(ref), 1.0))
+    for n in slice_counts:
+        dt, table = _wall_best(lambda: engine.parse_parallel(data, workers=n, slices=n, min_size=0))
+        ratio = (t_one / dt) if dt > 0 else 0
+        print("%-24s %10.3f %12d %10.2f" % ("parse_parallel x%d" % n, dt, len(table), ratio))
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:] if a.isdigit()]
+    mods = _import_plugin()
+    bench_sizes(mods[0], tuple(args) or DEFAULT_SIZES)
+    bench_shapes(*mods)
+    bench_parallel(mods[0])
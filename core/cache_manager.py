@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - MENADŻER CACHE (wspólny budżet bajtów + LRU)
+
+/tmp na większości obrazów Enigma2 jest w RAM, a katalogi cache pluginu
+(playlisty, EPG, picony, pliki tymczasowe) były czyszczone tylko po wieku i tylko
+na żądanie. CacheManager pilnuje jednego budżetu bajtów dla wszystkich katalogów:
+- trwały indeks (index.json w katalogu cache playlist - ten sam plik co PlaylistCache)
+  trzyma rozmiar i czas ostatniego użycia każdego pliku, więc decyzja o eksmisji
+  nie wymaga os.listdir + getmtime na każdym pliku,
+- po zapisie pliku (``record``) nadmiar ponad budżet jest usuwany od najdawniej
+  używanych; pliki o wspólnym rdzeniu nazwy (<klucz>.m3u / .meta.json / .parsed)
+  usuwane są razem,
+- liczniki trafień, chybień i eksmisji (``stats``).
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = "/tmp/iptvdream_cache"
+# Opisy VOD/seriali pobierane na żądanie (tools.vod_meta)
+META_DIR = "/tmp/iptvdream_meta"
+CACHE_ROOTS = (
+    CACHE_DIR,
+    META_DIR,
+    "/tmp/iptvdream_epg_cache",
+    "/tmp/iptvdream_picon_cache",
+    "/tmp/iptvdream_temp",
+)
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+INDEX_VERSION = 2
+
+DEFAULT_BUDGET = 64 * 1024 * 1024
+# Po przekroczeniu budżetu usuwamy do 90% - kolejny zapis nie wywoła od razu następnej eksmisji.
+LOW_WATERMARK = 0.9
+# Indeks zapisywany najwyżej co tyle sekund (eksmisja i flush() zapisują od razu).
+SAVE_INTERVAL = 10.0
+
+# Pliki w trakcie zapisu i sam indeks nie podlegają eksmisji.
+_SKIP_SUFFIXES = (".part", ".tmp")
+
+
+def _stem(path):
+    """'/tmp/iptvdream_cache/abc.meta.json' -> '/tmp/iptvdream_cache/abc' (pliki jednego wpisu)."""
+    head, tail = os.path.split(path)
+    return os.path.join(head, tail.split(".", 1)[0])
+
+
+class CacheManager(object):
+    """Budżet bajtów i eksmisja LRU dla katalogów cache pluginu."""
+
+    def __init__(self, roots=CACHE_ROOTS, index_file=INDEX_FILE, budget=DEFAULT_BUDGET):
+        self.roots = tuple(os.path.abspath(r) for r in roots)
+        self.index_file = index_file
+        self.budget = budget
+        self.files = {}      # ścieżka -> [rozmiar, czas ostatniego użycia]
+        self.playlists = {}  # wpisy PlaylistCache (klucz md5 -> url/metadata/timestamp)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.total = 0
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._saved_at = 0.0
+        self.load_index()
+
+    # ---------- indeks ----------
+
+    def load_index(self):
+        """Wczytuje indeks; brak/uszkodzony indeks (albo stary format PlaylistCache) -> jednorazowy rescan."""
+        data = None
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, "r") as f:
+                    data = json.load(f)
+        except Exception:
+            data = None
+        with self._lock:
+            if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+                self.playlists = dict(data.get("playlists") or {})
+                self.files = {}
+                for path, entry in (data.get("files") or {}).items():
+                    try:
+                        self.files[path] = [int(entry[0]), float(entry[1])]
+                    except Exception:
+                        pass
+                stats = data.get("stats") or {}
+                self.hits = int(stats.get("hits", 0))
+                self.misses = int(stats.get("misses", 0))
+                self.evictions = int(stats.get("evictions", 0))
+                self.evicted_bytes = int(stats.get("evicted_bytes", 0))
+                self.total = sum(e[0] for e in self.files.values())
+                return
+            # stary index.json PlaylistCache był płaskim słownikiem wpisów playlist
+            self.playlists = data if isinstance(data, dict) else {}
+        self.rescan()
+
+    def save_index(self, force=True):
+        """Zapisuje indeks atomowo (tmp + os.replace)."""
+        with self._lock:
+            if not force and (not self._dirty or time.time() - self._saved_at < SAVE_INTERVAL):
+                return
+            data = {
+                "version": INDEX_VERSION,
+                "playlists": dict(self.playlists),
+                "files": dict((k, list(v)) for k, v in self.files.items()),
+                "stats": {
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "evicted_bytes": self.evicted_bytes,
+                },
+            }
+            self._dirty = False
+            self._saved_at = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            tmp = self.index_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.index_file)
+        except Exception:
+            pass
+
+    def flush(self):
+        self.save_index(force=True)
+
+    def rescan(self):
+        """Pełny przegląd katalogów (tylko gdy indeksu brak albo przy jawnym czyszczeniu cache)."""
+        files = {}
+        for root in self.roots:
+            try:
+                names = os.listdir(root)
+            except Exception:
+                continue
+            for name in names:
+                path = os.path.join(root, name)
+                if not self._managed(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except Exception:
+                    continue
+                if not os.path.isfile(path):
+                    continue
+                files[path] = [int(st.st_size), float(st.st_mtime)]
+        with self._lock:
+            # znane pliki zachowują czas ostatniego użycia z indeksu (kolejność LRU)
+            for path, entry in files.items():
+                known = self.files.get(path)
+                if known is not None and known[1] > entry[1]:
+                    entry[1] = known[1]
+            self.files = files
+            self.total = sum(e[0] for e in files.values())
+            self._dirty = True
+        self.save_index()
+        return len(files)
+
+    def _managed(self, path):
+        if path == self.index_file or path.endswith(_SKIP_SUFFIXES):
+            return False
+        return os.path.dirname(os.path.abspath(path)) in self.roots
+
+    # ---------- użycie ----------
+
+    def hit(self, *paths):
+        """Trafienie w cache: odświeża czas użycia plików (kolejność LRU)."""
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            for path in paths:
+                entry = self.files.get(path)
+                if entry is not None:
+                    entry[1] = now
+                elif self._managed(path):
+                    self._add(path, now)
+            self._dirty = True
+        self.save_index(force=False)
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+            self._dirty = True
+
+    def record(self, *paths):
+        """Rejestruje zapisane/zmienione pliki i egzekwuje budżet (pliki z tego wywołania zostają)."""
+        now = time.time()
+        with self._lock:
+            for path in paths:
+                if self._managed(path):
+                    self._add(path, now)
+            self._dirty = True
+        self.enforce(keep=[_stem(p) for p in paths])
+        self.save_index(force=False)
+
+    def forget(self, *paths):
+        """Usuwa pliki z indeksu (po skasowaniu ich przez właściciela)."""
+        with self._lock:
+            for path in paths:
+                entry = self.files.pop(path, None)
+                if entry is not None:
+                    self.total -= entry[0]
+            self._dirty = True
+
+    def _add(self, path, now):
+        try:
+            size = int(os.path.getsize(path))
+        except Exception:
+            self.forget(path)
+            return
+        old = self.files.get(path)
+        if old is not None:
+            self.total -= old[0]
+        self.files[path] = [size, now]
+        self.total += size
+
+    # ---------- eksmisja ----------
+
+    def enforce(self, budget=None, keep=()):
+        """Usuwa najdawniej używane wpisy, aż suma rozmiarów zmieści się w budżecie.
+
+        Zwraca liczbę usuniętych bajtów. ``keep`` - rdzenie nazw, których nie ruszamy.
+        """
+        budget = self.budget if budget is None else budget
+        if not budget or budget <= 0:
+            return 0
+        with self._lock:
+            if self.total <= budget:
+                return 0
+            target = int(budget * LOW_WATERMARK)
+            groups = {}
+            for path, (size, used) in self.files.items():
+                g = groups.setdefault(_stem(path), [0.0, []])
+                g[0] = max(g[0], used)
+                g[1].append(path)
+            keep = set(keep or ())
+            freed = 0
+            for stem, (used, paths) in sorted(groups.items(), key=lambda kv: kv[1][0]):
+                if self.total <= target:
+                    break
+                if stem in keep:
+                    continue
+                for path in paths:
+                    size = self.files.pop(path, [0])[0]
+                    self.total -= size
+                    try:
+                        os.remove(path)
+                        freed += size
+                    except Exception:
+                        pass
+                self.evictions += 1
+            self.evicted_bytes += freed
+            self._dirty = True
+        self.save_index()
+        return freed
+
+    def cleanup(self, max_age, roots=None):
+        """Usuwa wpisy nieużywane dłużej niż ``max_age`` sekund (według indeksu).
+
+        ``roots`` zawęża czyszczenie do podanych katalogów (domyślnie wszystkie).
+        """
+        limit = time.time() - max_age
+        dirs = set(os.path.abspath(r) for r in roots) if roots else None
+        with self._lock:
+            old = [p for p, (_size, used) in self.files.items()
+                   if used < limit and (dirs is None or os.path.dirname(p) in dirs)]
+        for path in old:
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+        self.forget(*old)
+        self.save_index()
+        return len(old)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": len(self.files),
+                "bytes": self.total,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / float(lookups)) if lookups else 0.0,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+            }
+
+
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_cache_manager():
+    """Wspólna instancja dla wszystkich katalogów cache pluginu."""
+    global _MANAGER
+    if _MANAGER is None:
+        with _MANAGER_LOCK:
+            if _MANAGER is None:
+                _MANAGER = CacheManager()
+                # zapis odłożony przez SAVE_INTERVAL nie może przepaść przy wyjściu z Enigmy
+                atexit.register(_MANAGER.flush)
+    return _MANAGER
@@ -9,6 +9,8 @@ IPTV Dream v6.0 - MAPOWANIE KANAŁÓW
 
 import re, time
 from .config_manager import ConfigManager
+from .m3u_engine import M3UEngine
+from .classifier import CLASSIFIER
 
 class ChannelMapper:
     """Inteligentny mapowacz kanałów."""
@@ -21,13 +23,13 @@ class ChannelMapper:
             'extinf': re.compile(r'#EXTINF:([^,]*),(.*)', re.IGNORECASE),
             'attrs': re.compile(r'([a-zA-Z0-9_-]+)\s*=\s*("[^"]*"|[^,;\s]+)'),
             'group_bracket': re.compile(r'^\[([^\]]+)\]'),
-            'adult': re.compile(r'(xxx|adult|porn|sex|erotic|18\+|mature)', re.IGNORECASE),
-            'vod': re.compile(r'(vod|movie|film|video|series|serial)', re.IGNORECASE),
-            'quality': re.compile(r'(HD|FHD|UHD|4K|RAW|VIP|PL|UK|US)', re.IGNORECASE),
             'clean_name': re.compile(r'[^\w\s]'),
             'prefix': re.compile(r'^(PL|EN|DE|IT|UK|VIP|RAW|FHD|UHD|HEVC|4K)\s*[|:-]?\s*', re.IGNORECASE),
             'suffix': re.compile(r'\s+[-|]?\s*(HD|FHD|UHD|4K|RAW|VIP|PL|UK|US)$', re.IGNORECASE)
         }
+
+        # Wspólny silnik M3U; mapper zawsze nadaje grupę XXX/VOD/Inne i buduje kanały z metadanymi.
+        self.engine = M3UEngine(classify=self._classify_group, emit=self._emit_channel)
         
         # Mapowanie kanałów satelitarnych
         self.sat_mapping = {
@@ -64,48 +66,7 @@ class ChannelMapper:
         start_time = time.time()
         
         try:
-            # Dekodowanie z obsługą błędów
-            try:
-                text = raw_content.decode("utf-8", "ignore")
-            except:
-                text = str(raw_content)
-            
-            lines = text.splitlines()
-            channels = []
-            current_entry = {}
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # EXTINF
-                if line.startswith("#EXTINF"):
-                    current_entry = self._parse_extinf(line)
-                    
-                # EXTGRP
-                elif line.startswith("#EXTGRP:"):
-                    grp_name = line.split(":", 1)[1].strip()
-                    if grp_name:
-                        current_entry["group"] = grp_name
-                        
-                # URL
-                elif "://" in line and not line.startswith("#"):
-                    url = line.strip()
-                    
-                    if not current_entry:
-                        name = url.split('/')[-1]
-                        name = re.sub(r'\.(ts|m3u8|mp4|mkv)$', '', name, flags=re.IGNORECASE)
-                        current_entry = {"title": name}
-                    
-                    # Określenie grupy
-                    self._determine_group(current_entry, url)
-                    
-                    # Tworzenie kanału
-                    channel = self._create_channel(current_entry, url)
-                    channels.append(channel)
-                    
-                    current_entry = {}
+            channels = self.engine.parse(raw_content)
             
             # Mapowanie do kanałów satelitarnych
             channels = self._map_to_satellite_channels(channels)
@@ -120,96 +81,44 @@ class ChannelMapper:
             print(f"[ChannelMapper] Błąd mapowania: {e}")
             return []
     
-    def _parse_extinf(self, line):
-        """Parsuje linię EXTINF z maksymalną wydajnością."""
-        entry = {}
-        
-        # Tytuł
-        if ',' in line:
-            parts = line.split(',', 1)
-            meta_part = parts[0]
-            entry["title"] = parts[1].strip() if len(parts) > 1 else "No Name"
-        else:
-            meta_part = line
-            entry["title"] = "No Name"
+    def _classify_group(self, title, group, url):
+        """Określa grupę kanału XXX/VOD/Inne (hak klasyfikacji silnika M3U).
 
-        # Atrybuty
-        attrs = self.patterns['attrs'].findall(meta_part)
-        for key, val in attrs:
-            clean_val = val.replace('"', '').strip()
-            key_lower = key.lower()
-            
-            if key_lower in ["group-title", "group", "category", "cat"]:
-                entry["group"] = clean_val
-            elif key_lower in ["tvg-logo", "logo"]:
-                entry["logo"] = clean_val
-            elif key_lower in ["tvg-id", "epg-id", "id"]:
-                entry["epg_id"] = clean_val
-        
-        # Grupa z tytułu
-        if "group" not in entry:
-            group_match = self.patterns['group_bracket'].match(entry.get("title", ""))
-            if group_match:
-                entry["group"] = group_match.group(1).strip()
-        
-        return entry
+        Tylko tytuł i URL, jak przed wspólnym klasyfikatorem - nazwa grupy źródła ("Filmy")
+        nie przenosi całej grupy kanałów live do VOD.
+        """
+        return CLASSIFIER.classify(title, "", url).group
     
-    def _determine_group(self, entry, url):
-        """Określa grupę kanału."""
-        title_lower = entry.get("title", "").lower()
-        
-        # Detekcja XXX
-        if self.patterns['adult'].search(title_lower):
-            entry["group"] = "XXX"
-        # Detekcja VOD
-        elif self.patterns['vod'].search(title_lower):
-            entry["group"] = "VOD"
-        elif '/movie/' in url.lower() or '/series/' in url.lower():
-            entry["group"] = "VOD"
-        # Domyślnie
-        else:
-            entry["group"] = "Inne"
+    def _emit_channel(self, title, url, group, logo, epg_id):
+        """Buduje kanał z pól zwróconych przez silnik M3U."""
+        return self._create_channel({"title": title, "group": group, "logo": logo, "epg_id": epg_id}, url)
     
     def _create_channel(self, entry, url):
-        """Tworzy obiekt kanału."""
+        """Tworzy obiekt kanału; metadane pochodzą z jednej (zapamiętanej) klasyfikacji."""
+        title = entry.get("title", "No Name")
+        group = entry.get("group", "Inne")
+        info = CLASSIFIER.classify(title, "", url)
         return {
-            "title": entry.get("title", "No Name"),
+            "title": title,
             "url": url,
-            "group": entry.get("group", "Inne"),
+            "group": group,
             "logo": entry.get("logo", ""),
             "epg_id": entry.get("epg_id", ""),
             "metadata": {
-                "quality": self._detect_quality(entry.get("title", "")),
-                "country": self._detect_country(entry.get("title", "")),
-                "is_adult": entry.get("group") == "XXX",
-                "is_vod": entry.get("group") == "VOD"
+                "quality": info.quality,
+                "country": info.country,
+                "is_adult": group == "XXX",
+                "is_vod": group == "VOD"
             }
         }
     
     def _detect_quality(self, title):
         """Wykrywa jakość kanału."""
-        quality_match = self.patterns['quality'].search(title)
-        if quality_match:
-            return quality_match.group(1)
-        return "SD"
+        return CLASSIFIER.classify(title).quality
     
     def _detect_country(self, title):
         """Wykrywa kraj kanału."""
-        title_upper = title.upper()
-        countries = {
-            'PL': ['PL', 'POLSKA', 'POLAND'],
-            'UK': ['UK', 'GB', 'ENGLAND'],
-            'US': ['US', 'USA', 'AMERICA'],
-            'DE': ['DE', 'GERMANY', 'DEUTSCHLAND'],
-            'FR': ['FR', 'FRANCE'],
-            'IT': ['IT', 'ITALY'],
-            'ES': ['ES', 'SPAIN']
-        }
-        
-        for country, keywords in countries.items():
-            if any(keyword in title_upper for keyword in keywords):
-                return country
-        return "UNKNOWN"
+        return CLASSIFIER.classify(title).country
     
     def _map_to_satellite_channels(self, channels):
         """Mapuje kanały do kanałów satelitarnych."""
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - KOLUMNOWA TABELA KANAŁÓW
+
+Lista słowników (jeden dict na kanał) przy 200k pozycji VOD zjada większość RAM
+tunera 512 MB. ChannelTable trzyma kanały w kolumnach:
+- title/url/epg_id jako zwykłe listy,
+- grupa jako indeks (array 'I') do tablicy unikalnych nazw grup,
+- logo rozbite na internowany prefiks (host + katalog) i końcówkę ścieżki,
+- rzadkie, dodatkowe klucze w słowniku ``extras`` tylko dla kanałów, które je mają,
+- flagi XXX/VOD jako bajt na kanał (bytearray), liczone raz przy pierwszym odczycie
+  (``content_flags``) - eksport nie klasyfikuje kanału ponownie.
+
+Wiersz (ChannelRow) to lekki widok z ``__slots__`` - wspiera .get(), [], in, keys(),
+items() i dict(row), więc GUI, eksport i ulubione korzystają z niego jak ze słownika.
+"""
+
+import sys
+from array import array
+
+from .classifier import CLASSIFIER
+
+try:
+    from collections.abc import MutableMapping
+except Exception:  # pragma: no cover - Py2
+    from collections import MutableMapping
+
+# Kolumny zawsze obecne w wierszu (tak jak w dictach z parserów M3U).
+FIELDS = ("title", "url", "group", "logo", "epg_id")
+
+# Zduplikowane klucze spotykane w kanałach (logo/tvg-logo, epg_id/tvg-id) wskazują na tę samą kolumnę.
+ALIASES = {
+    "tvg-logo": "logo",
+    "tvg_logo": "logo",
+    "tvg-id": "epg_id",
+    "tvg_id": "epg_id",
+}
+
+_DEFAULTS = {"title": "No Name", "url": "", "group": "Inne", "logo": "", "epg_id": ""}
+_MISSING = object()
+
+# Bity kolumny flag: wynik klasyfikacji znany / XXX / VOD.
+_FLAG_KNOWN, _FLAG_ADULT, _FLAG_VOD = 1, 2, 4
+# Zmiana tych kluczy unieważnia zapamiętane flagi kanału.
+_FLAG_KEYS = ("title", "url", "group", "name", "is_adult", "is_vod", "metadata")
+
+
+def _split_logo(logo):
+    """'http://host/dir/x.png' -> ('http://host/dir/', 'x.png'); prefiks jest wspólny dla wielu kanałów."""
+    pos = logo.rfind("/")
+    if pos < 0:
+        return "", logo
+    return logo[:pos + 1], logo[pos + 1:]
+
+
+class ChannelRow(MutableMapping):
+    """Widok jednego kanału w ChannelTable (zachowuje się jak dict)."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def get(self, key, default=None):
+        value = self._table._get(self._index, key, _MISSING)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self._table._get(self._index, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._table._set(self._index, key, value)
+
+    def __delitem__(self, key):
+        self._table._del(self._index, key)
+
+    def __contains__(self, key):
+        return self._table._get(self._index, key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        for f in FIELDS:
+            yield f
+        extra = self._table._extras.get(self._index)
+        if extra:
+            for k in list(extra):
+                yield k
+
+    def __len__(self):
+        return len(FIELDS) + len(self._table._extras.get(self._index) or ())
+
+    def __eq__(self, other):
+        try:
+            return dict(self) == dict(other)
+        except Exception:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def copy(self):
+        return dict(self)
+
+    def content_flags(self):
+        """(is_adult, is_vod) - klasyfikacja liczona raz i trzymana w kolumnie flag tabeli."""
+        return self._table.content_flags(self._index)
+
+    def __repr__(self):
+        return "ChannelRow(%r)" % (dict(self),)
+
+
+class ChannelTable(object):
+    """Kolumnowa lista kanałów z internowanymi grupami i prefiksami logo."""
+
+    def __init__(self, channels=None):
+        self._titles = []
+        self._urls = []
+        self._epg_ids = []
+        self._group_ids = array("I")
+        self._groups = []
+        self._group_index = {}
+        self._logo_prefix_ids = array("I")
+        self._logo_prefixes = [""]
+        self._logo_prefix_index = {"": 0}
+        self._logo_tails = []
+        self._flags = bytearray()
+        self._extras = {}
+        if channels is not None:
+            self.extend(channels)
+
+    def clear(self):
+        """Usuwa wszystkie kanały (tabela jak po utworzeniu)."""
+        self.__init__()
+
+    @classmethod
+    def from_channels(cls, channels):
+        """Zwraca tabelę; istniejąca ChannelTable jest przekazywana bez kopiowania."""
+        if isinstance(channels, cls):
+            return channels
+        return cls(channels)
+
+    # ---------- internowanie ----------
+
+    def _group_id(self, group):
+        gid = self._group_index.get(group)
+        if gid is None:
+            gid = self._group_index[group] = len(self._groups)
+            self._groups.append(sys.intern(group) if type(group) is str else group)
+        return gid
+
+    def _logo_id(self, prefix):
+        pid = self._logo_prefix_index.get(prefix)
+        if pid is None:
+            pid = self._logo_prefix_index[prefix] = len(self._logo_prefixes)
+            self._logo_prefixes.append(prefix)
+        return pid
+
+    # ---------- budowanie ----------
+
+    def append_fields(self, title, url, group="Inne", logo="", epg_id=""):
+        """Szybka ścieżka dla parserów: dodaje kanał bez tworzenia słownika."""
+        self._titles.append(title)
+        self._urls.append(url)
+        self._epg_ids.append(epg_id or "")
+        gid = self._group_index.get(group)
+        if gid is None:
+            gid = self._group_id(group)
+        self._group_ids.append(gid)
+        if logo:
+            pos = logo.rfind("/") + 1
+            prefix = logo[:pos]
+            pid = self._logo_prefix_index.get(prefix)
+            if pid is None:
+                pid = self._logo_id(prefix)
+            self._logo_prefix_ids.append(pid)
+            self._logo_tails.append(logo[pos:])
+        else:
+            self._logo_prefix_ids.append(0)
+            self._logo_tails.append("")
+        self._flags.append(0)
+        return len(self._titles) - 1
+
+    def extend_fields(self, rows):
+        """Dodaje partię krotek (title, url, group, logo, epg_id) - ścieżka silnika M3U."""
+        titles = self._titles.append
+        urls = self._urls.append
+        epg_ids = self._epg_ids.append
+        group_ids = self._group_ids.append
+        group_index = self._group_index
+        logo_ids = self._logo_prefix_ids.append
+        logo_index = self._logo_prefix_index
+        tails = self._logo_tails.append
+        for title, url, group, logo, epg_id in rows:
+            titles(title)
+            urls(url)
+            epg_ids(epg_id)
+            gid = group_index.get(group)
+            if gid is None:
+                gid = self._group_id(group)
+            group_ids(gid)
+            if logo:
+                pos = logo.rfind("/") + 1
+                prefix = logo[:pos]
+                pid = logo_index.get(prefix)
+                if pid is None:
+                    pid = self._logo_id(prefix)
+                logo_ids(pid)
+                tails(logo[pos:])
+            else:
+                logo_ids(0)
+                tails("")
+        self._flags.extend(bytes(len(self._titles) - len(self._flags)))
+
+    def append(self, channel):
+        get = channel.get
+        logo = get("logo") or get("tvg-logo") or get("tvg_logo") or ""
+        epg_id = get("epg_id") or get("tvg-id") or get("tvg_id") or ""
+        idx = self.append_fields(
+            get("title", _DEFAULTS["title"]),
+            get("url", ""),
+            get("group", _DEFAULTS["group"]),
+            logo,
+            epg_id,
+        )
+        extra = None
+        for key in list(channel.keys()):
+            if key in _DEFAULTS:
+                continue
+            value = channel[key]
+            alias = ALIASES.get(key)
+            if alias is not None and value == (logo if alias == "logo" else epg_id):
+                continue
+            if extra is None:
+                extra = {}
+            extra[key] = value
+        if extra:
+            self._extras[idx] = extra
+        return idx
+
+    def extend_table(self, other):
+        """Dokleja całą inną tabelę kolumnami (np. wynik równoległego parsowania wycinka).
+
+        Indeksy grup i prefiksów logo drugiej tabeli są przemapowane na indeksy tej tabeli.
+        """
+        base = len(self._titles)
+        group_map = [self._group_id(g) for g in other._groups]
+        prefix_map = [self._logo_id(p) for p in other._logo_prefixes]
+        self._titles.extend(other._titles)
+        self._urls.extend(other._urls)
+        self._epg_ids.extend(other._epg_ids)
+        self._logo_tails.extend(other._logo_tails)
+        self._flags.extend(other._flags)
+        if group_map == list(range(len(group_map))):
+            self._group_ids.extend(other._group_ids)
+        else:
+            self._group_ids.extend([group_map[g] for g in other._group_ids])
+        if prefix_map == list(range(len(prefix_map))):
+            self._logo_prefix_ids.extend(other._logo_prefix_ids)
+        else:
+            self._logo_prefix_ids.extend([prefix_map[p] for p in other._logo_prefix_ids])
+        for idx, extra in other._extras.items():
+            self._extras[base + idx] = dict(extra)
+
+    def extend(self, channels):
+        if isinstance(channels, ChannelTable):
+            self.extend_table(channels)
+            return
+        for channel in channels:
+            self.append(channel)
+
+    # ---------- dostęp ----------
+
+    def _get(self, idx, key, default):
+        field = ALIASES.get(key, key)
+        if field == "title":
+            return self._titles[idx]
+        if field == "url":
+            return self._urls[idx]
+        if field == "group":
+            return self._groups[self._group_ids[idx]]
+        if field == "logo":
+            extra = self._extras.get(idx)
+            if extra and key in extra:
+                return extra[key]
+            prefix = self._logo_prefixes[self._logo_prefix_ids[idx]]
+            tail = self._logo_tails[idx]
+            return prefix + tail if tail else prefix
+        if field == "epg_id":
+            extra = self._extras.get(idx)
+            if extra and key in extra:
+                return extra[key]
+            return self._epg_ids[idx]
+        extra = self._extras.get(idx)
+        if extra:
+            return extra.get(key, default)
+        return default
+
+    def content_flags(self, idx):
+        """(is_adult, is_vod) kanału ``idx``; flagi zapisane w kanale mają pierwszeństwo (classify_channel)."""
+        flags = self._flags[idx]
+        if not flags & _FLAG_KNOWN:
+            info = CLASSIFIER.classify_channel(ChannelRow(self, idx))
+            flags = _FLAG_KNOWN | (_FLAG_ADULT if info.is_adult else 0) | (_FLAG_VOD if info.is_vod else 0)
+            self._flags[idx] = flags
+        return bool(flags & _FLAG_ADULT), bool(flags & _FLAG_VOD)
+
+    def _set(self, idx, key, value):
+        if key in _FLAG_KEYS:
+            self._flags[idx] = 0
+        if key == "title":
+            self._titles[idx] = value
+        elif key == "url":
+            self._urls[idx] = value
+        elif key == "group":
+            self._group_ids[idx] = self._group_id(value)
+        elif key == "logo":
+            prefix, tail = _split_logo(value or "")
+            self._logo_prefix_ids[idx] = self._logo_id(prefix)
+            self._logo_tails[idx] = tail
+        elif key == "epg_id":
+            self._epg_ids[idx] = value or ""
+        else:
+            self._extras.setdefault(idx, {})[key] = value
+
+    def _del(self, idx, key):
+        field = ALIASES.get(key, key)
+        if field in _DEFAULTS:
+            # alias (tvg-logo, tvg_id ...) usuwa też własne nadpisanie z extras, potem kolumna wraca do domyślnej
+            extra = self._extras.get(idx)
+            if extra and key in extra:
+                del extra[key]
+                if not extra:
+                    del self._extras[idx]
+            self._set(idx, field, _DEFAULTS[field])
+            return
+        extra = self._extras.get(idx)
+        if not extra or key not in extra:
+            raise KeyError(key)
+        if key in _FLAG_KEYS:
+            self._flags[idx] = 0
+        del extra[key]
+        if not extra:
+            del self._extras[idx]
+
+    def __len__(self):
+        return len(self._titles)
+
+    def __bool__(self):
+        return bool(self._titles)
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        for idx in range(len(self._titles)):
+            yield ChannelRow(self, idx)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [ChannelRow(self, i) for i in range(*idx.indices(len(self._titles)))]
+        if idx < 0:
+            idx += len(self._titles)
+        if idx < 0 or idx >= len(self._titles):
+            raise IndexError("channel index out of range")
+        return ChannelRow(self, idx)
+
+    def to_columns(self):
+        """Kolumny w postaci do serializacji (marshal/pickle) - używane przez cache *.parsed."""
+        return (self._titles, self._urls, self._epg_ids, self._group_ids.tobytes(), self._groups,
+                self._logo_prefix_ids.tobytes(), self._logo_prefixes, self._logo_tails, self._extras)
+
+    @classmethod
+    def from_columns(cls, columns):
+        titles, urls, epg_ids, group_ids, groups, logo_ids, logo_prefixes, logo_tails, extras = columns
+        table = cls()
+        table._titles = list(titles)
+        table._urls = list(urls)
+        table._epg_ids = list(epg_ids)
+        table._group_ids = array("I")
+        table._group_ids.frombytes(group_ids)
+        table._groups = list(groups)
+        table._group_index = dict((g, i) for i, g in enumerate(table._groups))
+        table._logo_prefix_ids = array("I")
+        table._logo_prefix_ids.frombytes(logo_ids)
+        table._logo_prefixes = list(logo_prefixes)
+        table._logo_prefix_index = dict((p, i) for i, p in enumerate(table._logo_prefixes))
+        table._logo_tails = list(logo_tails)
+        table._extras = dict(extras or {})
+        n = len(table._titles)
+        table._flags = bytearray(n)
+        if not (len(table._urls) == len(table._epg_ids) == len(table._group_ids) ==
+                len(table._logo_prefix_ids) == len(table._logo_tails) == n):
+            raise ValueError("inconsistent channel table columns")
+        return table
+
+    def groups(self):
+        """Unikalne nazwy grup w kolejności pierwszego wystąpienia."""
+        return list(self._groups)
+
+    def to_dicts(self):
+        return [dict(row) for row in self]
+
+    def memory_usage(self):
+        """Szacunkowe zużycie pamięci tabeli (bajty łącznie i na kanał)."""
+        size = sys.getsizeof
+        total = 0
+        for col in (self._titles, self._urls, self._epg_ids, self._logo_tails):
+            total += size(col)
+            seen = set()
+            for s in col:
+                if id(s) not in seen:
+                    seen.add(id(s))
+                    total += size(s)
+        total += size(self._group_ids) + size(self._logo_prefix_ids) + size(self._flags)
+        for col in (self._groups, self._logo_prefixes):
+            total += size(col) + sum(size(s) for s in col)
+        total += size(self._group_index) + size(self._logo_prefix_index) + size(self._extras)
+        for extra in self._extras.values():
+            total += size(extra) + sum(size(v) for v in extra.values())
+        count = len(self._titles)
+        return {
+            "channels": count,
+            "bytes": total,
+            "bytes_per_channel": (total / float(count)) if count else 0.0,
+        }
+
+
+def dict_list_memory_usage(channels):
+    """To samo oszacowanie dla klasycznej listy słowników (do porównań/benchmarku)."""
+    size = sys.getsizeof
+    total = size(channels)
+    seen = set()
+    for ch in channels:
+        total += size(ch)
+        for key, value in ch.items():
+            for obj in (key, value):
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    total += size(obj)
+    count = len(channels)
+    return {
+        "channels": count,
+        "bytes": total,
+        "bytes_per_channel": (total / float(count)) if count else 0.0,
+    }
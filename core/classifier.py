@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - KLASYFIKATOR TREŚCI (XXX / VOD / jakość / kraj)
+
+Jedno miejsce z heurystykami, które wcześniej były powielone w parserze M3U,
+ChannelMapper, portalu MAC, eksporcie bukietów i filtrze Xtream:
+- jedno przejście daje komplet: is_adult, is_vod, jakość, kraj i grupę XXX/VOD/Inne,
+- wynik jest zapamiętywany w LRU pod kluczem (grupa, znormalizowane słowa tytułu) -
+  grupy powtarzają się tysiące razy, a numery kanałów (>= 3 cyfry) są sprowadzane
+  do jednego tokenu, więc "Kanał 101 HD" i "Kanał 102 HD" to jeden wpis,
+- ``is_vod`` (szerokie: film/video/serial) służy grupowaniu i etykietom; filtr treści
+  (``content_filter``) używa wąskiego ``is_vod_named`` (vod/movie/series) jak dawny filtr
+  Xtream - "Canal+ Film" czy "MTV Video" to kanały live,
+- gotowe flagi zapisane w kanale (``is_adult``/``is_vod`` albo ``metadata``) mają
+  pierwszeństwo - kod dalej w łańcuchu nie klasyfikuje kanału drugi raz.
+"""
+
+import re
+from collections import OrderedDict
+
+# Słowa XXX tylko jako osobne tokeny (granice: spacja, | _ - [ ] ( ) : /).
+ADULT_RE = re.compile(
+    r'(?i)(^|[\s\|_\-\[\]\(\):/])('
+    r'xxx|adult|adults|porn|porno|pornhub|erotic|erotica|sex|sexy|hardcore|redlight|mature|'
+    r'hustler|brazzers|playboy|private|dorcel|babestation|venus|naughty|spice|blue\s*hustler|'
+    r'18\+|\+18|for\s*adults|only\s*adults|dla\s*doroslych|dla\s*dorosłych'
+    r')([\s\|_\-\[\]\(\):/]|$)'
+)
+# "18" w nazwach zwykłych kanałów (wiek, numer kanału) - nie oznacza treści dla dorosłych.
+ADULT_FALSE_RE = re.compile(r'(?i)\b(18\s*(lat|years|yo|roku|rok)|u18|under\s*18|18\s*hd|channel\s*18|canal\s*18)\b')
+VOD_RE = re.compile(r'(vod|movie|film|video|series|serial)', re.IGNORECASE)
+# Wąski zestaw filtra live/vod (dawny filtr Xtream): tylko jawne oznaczenia VOD.
+FILTER_VOD_RE = re.compile(r'(vod|movie|series)', re.IGNORECASE)
+VOD_URL_PARTS = ('/movie/', '/series/', '/vod/')
+# Samodzielna liczba >= 3 cyfr (token klucza LRU, patrz _normalize).
+_NUMBER_TOKEN_RE = re.compile(r'(?<!\S)\d{3,}(?!\S)')
+QUALITY_RE = re.compile(r'(HD|FHD|UHD|4K|RAW|VIP|PL|UK|US)', re.IGNORECASE)
+COUNTRIES = (
+    ('PL', ('PL', 'POLSKA', 'POLAND')),
+    ('UK', ('UK', 'GB', 'ENGLAND')),
+    ('US', ('US', 'USA', 'AMERICA')),
+    ('DE', ('DE', 'GERMANY', 'DEUTSCHLAND')),
+    ('FR', ('FR', 'FRANCE')),
+    ('IT', ('IT', 'ITALY')),
+    ('ES', ('ES', 'SPAIN')),
+)
+
+CACHE_SIZE = 8192
+
+
+class Classification(object):
+    """Wynik klasyfikacji kanału (współdzielony między kanałami - tylko do odczytu)."""
+
+    __slots__ = ("is_adult", "is_vod", "quality", "country", "is_vod_named")
+
+    def __init__(self, is_adult, is_vod, quality="SD", country="UNKNOWN", is_vod_named=None):
+        self.is_adult = is_adult
+        self.is_vod = is_vod
+        self.quality = quality
+        self.country = country
+        # vod/movie/series w tytule/grupie albo URL VOD (filtr treści); domyślnie = is_vod
+        self.is_vod_named = is_vod if is_vod_named is None else is_vod_named
+
+    @property
+    def group(self):
+        """Grupa dla kanału bez grupy: XXX / VOD / Inne."""
+        if self.is_adult:
+            return "XXX"
+        if self.is_vod:
+            return "VOD"
+        return "Inne"
+
+    def __repr__(self):
+        return "Classification(adult=%r, vod=%r, quality=%r, country=%r)" % (
+            self.is_adult, self.is_vod, self.quality, self.country)
+
+
+def _normalize(text):
+    """Małe litery, pojedyncze spacje, liczby >= 3 cyfr jako '#'.
+
+    Żadna heurystyka nie zależy od samodzielnej liczby 3+ cyfrowej ("18+", "channel 18"
+    i "4K" zostają bez zmian), więc klucz nie zmienia wyniku.
+    """
+    if not text:
+        return ""
+    if text.isdecimal():
+        # tytuł z samego URL (numer strumienia) - bez regex
+        return "#" if len(text) >= 3 else text
+    # jedno wywołanie regex zamiast pętli po tokenach (listy "same URL": tytuł = numer strumienia)
+    return _NUMBER_TOKEN_RE.sub("#", " ".join(text.lower().split()))
+
+
+class ContentClassifier(object):
+    """Klasyfikator z pamięcią LRU; ``classify`` jest bezpieczne dla wielu wątków (GIL)."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, title, group="", url=""):
+        """Zwraca Classification dla (tytuł, grupa); URL uzupełnia tylko detekcję VOD."""
+        key = (_normalize(group), _normalize(title))
+        cache = self._cache
+        result = cache.get(key)
+        if result is None:
+            self.misses += 1
+            result = self._compute(key[1], key[0])
+            cache[key] = result
+            if len(cache) > self.maxsize:
+                try:
+                    cache.popitem(last=False)
+                except KeyError:
+                    pass
+        else:
+            self.hits += 1
+            try:
+                cache.move_to_end(key)
+            except KeyError:
+                pass
+        if url and not result.is_vod:
+            url_l = url.lower()
+            # VOD_URL_PARTS rozpisane - bez generatora na każdy kanał
+            if '/movie/' in url_l or '/series/' in url_l or '/vod/' in url_l:
+                return Classification(result.is_adult, True, result.quality, result.country, True)
+        return result
+
+    def _compute(self, title, group):
+        hay = ("%s %s" % (title, group)).strip()
+        adult = bool(hay) and not ADULT_FALSE_RE.search(hay) and bool(ADULT_RE.search(" %s " % hay))
+        vod = bool(VOD_RE.search(hay))
+        vod_named = vod and bool(FILTER_VOD_RE.search(hay))
+        m = QUALITY_RE.search(title)
+        quality = m.group(1).upper() if m else "SD"
+        country = "UNKNOWN"
+        title_upper = title.upper()
+        for code, keywords in COUNTRIES:
+            if any(k in title_upper for k in keywords):
+                country = code
+                break
+        return Classification(adult, vod, quality, country, vod_named)
+
+    def classify_channel(self, channel):
+        """Klasyfikacja kanału (dict / ChannelRow); flagi zapisane w kanale mają pierwszeństwo."""
+        get = channel.get
+        result = self.classify(get("title") or get("name") or "", get("group") or "", get("url") or "")
+        meta = get("metadata")
+        flags = meta if isinstance(meta, dict) else {}
+        adult = get("is_adult", flags.get("is_adult"))
+        vod = get("is_vod", flags.get("is_vod"))
+        if (adult is None or bool(adult) == result.is_adult) and (vod is None or bool(vod) == result.is_vod):
+            return result
+        return Classification(result.is_adult if adult is None else bool(adult),
+                              result.is_vod if vod is None else bool(vod),
+                              result.quality, result.country,
+                              result.is_vod_named if vod is None else bool(vod))
+
+    def content_filter(self, content_filter):
+        """Funkcja accept(title, group, url) dla filtra live/vod/adult; None = bez filtra."""
+        if content_filter in (None, "", "all"):
+            return None
+        classify = self.classify
+
+        def _accept(title, group, url):
+            info = classify(title, group, url)
+            if content_filter == "adult":
+                return info.is_adult
+            # wąskie is_vod_named: "Film"/"Video"/"Serial" w nazwie nie czyni kanału VOD
+            if content_filter == "vod":
+                return info.is_vod_named
+            if content_filter == "live":
+                # Live: wszystko, co nie jest oznaczone jako VOD/XXX
+                return not (info.is_vod_named or info.is_adult)
+            return True
+
+        return _accept
+
+    def stats(self):
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = self.misses = 0
+
+
+# Wspólna instancja dla całego pluginu.
+CLASSIFIER = ContentClassifier()
+
+
+def classify(title, group="", url=""):
+    return CLASSIFIER.classify(title, group, url)
+
+
+def classify_channel(channel):
+    return CLASSIFIER.classify_channel(channel)
@@ -30,13 +30,29 @@ class ConfigManager:
             "net_timeout_read": 30,
             "net_retries": 2,
             "net_backoff": 0.8,
+            "net_deadline": 120,
+            "net_deadline_check": 15,
+            "net_max_kbps": 0,
+            "net_max_connections": 16,
+            "net_max_per_host": 4,
+            "net_background_share": 0.25,
+            "net_playing_kbps": 2048,
+            "xtream_max_workers": 4,
+            "vod_meta_ttl": 604800,
+            "vod_meta_prefetch": 3,
             "service_type": "4097",
             "auto_update": True,
             "webif_enabled": False,
             "webif_port": 9999,
             "cache_enabled": True,
             "cache_max_age": 3600,
+            "cache_budget_mb": 64,
             "streaming_enabled": True,
+            "parallel_parse": False,
+            "parse_workers": 0,
+            "parallel_parse_min_mb": 8,
+            "multi_max_workers": 4,
+            "multi_per_host": 2,
             "progress_bar": True,
             "performance_monitoring": True,
             "epg_auto_install": True,
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - WSPÓLNY SILNIK M3U
+
+Jeden parser M3U dla wszystkich źródeł (URL/plik, Xtream, MAC, ChannelMapper).
+Pracuje bezpośrednio na bajtach (bytes / bytearray / mmap / memoryview), bez
+dekodowania całego pliku do str i bez listy linii całego pliku:
+- bufor jest cięty na bloki ~256 KB (``find(b"\\n")``), linie bloku dzieli ``bytes.splitlines``,
+- 1. faza (bajty): pętla tylko rozpoznaje linie #EXTINF / #EXTGRP / URL i zbiera je surowe,
+- 2. faza: linie #EXTINF i URL bloku dekodowane są jednym wywołaniem (join + decode + split),
+  komentarze, #EXTVLCOPT itp. nie są dekodowane wcale,
+- powtarzające się grupy #EXTGRP i klucze atrybutów rozpoznawane są raz (słowniki),
+- domyślnie wynik trafia od razu do ChannelTable (bez pośrednich słowników).
+
+Różnice między miejscami wywołań (domyślna grupa, filtr treści, format wyniku)
+realizują haki przekazywane do M3UEngine:
+- ``classify(title, group, url)`` - grupa dla każdego kanału (domyślnie: grupa z atrybutów,
+  a gdy jej brak - XXX/VOD/Inne albo ``default_group``),
+- ``accept(title, group, url)`` - filtr; False pomija kanał,
+- ``emit(title, url, group, logo, epg_id[, name])`` - własny format kanału (lista wyników).
+
+Reguły wspólne: #EXTINF z atrybutami ``klucz="wartość"``/``klucz=wartość``, tytuł po
+pierwszym przecinku poza cudzysłowem, #EXTGRP nadpisuje grupę, "[Grupa] tytuł" gdy brak
+grupy, linie URL bez #EXTINF (opcjonalnie). BOM na początku pliku jest pomijany.
+
+Tryb wieloprocesowy (``parse_parallel``): bufor jest dzielony na N wycinków zawsze
+przed linią #EXTINF, wycinki parsują procesy potomne (fork - bufor/mmap jest
+współdzielony, nie kopiowany), a kolumny wyników są sklejane w oryginalnej kolejności.
+Poniżej progu rozmiaru, przy 1 procesie, przy błędzie puli albo gdy wycinek nie wróci w
+``PARALLEL_SLICE_TIMEOUT`` sekund (fork z procesu z wątkami Twisted może zostawić w potomku
+zajętą blokadę) - zwykłe ``parse``. Tryb jest domyślnie wyłączony (``parallel_parse``).
+"""
+
+import marshal
+import mmap
+import os
+import re
+import threading
+
+try:
+    import multiprocessing
+except Exception:  # pragma: no cover - okrojony Python na tunerze
+    multiprocessing = None
+
+from .channel_table import ChannelTable
+from .classifier import CLASSIFIER
+
+# klucz, wartość w cudzysłowie (bez cudzysłowów), wartość bez cudzysłowu
+_ATTR_RE = re.compile(r'([a-zA-Z0-9_-]+)\s*=\s*(?:"([^"]*)"|([^,;\s]+))')
+_GROUP_RE = re.compile(r'^\[([^\]]+)\]')
+_URL_EXT_RE = re.compile(r'\.(ts|m3u8|mp4|mkv)$', re.IGNORECASE)
+
+# Pozycje w roboczym wpisie [title, group, logo, epg_id, name].
+_TITLE, _GROUP, _LOGO, _EPG, _NAME = range(5)
+
+# Klucz atrybutu (małe litery) -> indeks pola we wpisie.
+_ATTR_SLOTS = {
+    "group-title": _GROUP, "group": _GROUP, "category": _GROUP, "cat": _GROUP,
+    "tvg-logo": _LOGO, "logo": _LOGO,
+    "tvg-id": _EPG, "epg-id": _EPG, "id": _EPG,
+    "tvg-name": _NAME,
+}
+
+_BOM = b"\xef\xbb\xbf"
+
+# Rozmiar bloku bufora dzielonego naraz na linie.
+BLOCK_SIZE = 256 * 1024
+
+# Poniżej tego rozmiaru start puli procesów kosztuje więcej niż zysk z równoległości.
+PARALLEL_MIN_SIZE = 8 * 1024 * 1024
+# Najdłuższe czekanie na wynik jednego wycinka (s); potem pula jest zabijana, a bufor
+# parsowany w jednym procesie. Co ``_SLICE_POLL`` s sprawdzany jest hak postępu (anulowanie).
+PARALLEL_SLICE_TIMEOUT = 60.0
+_SLICE_POLL = 0.5
+
+# (silnik, bufor) widoczne w procesach potomnych puli - ustawiane tylko na czas fork().
+_FORK_JOB = None
+_FORK_LOCK = threading.Lock()
+
+
+def _as_buffer(data):
+    """Zwraca obiekt z metodą find(); memoryview obejmujący cały bufor jest rozpakowywany bez kopii."""
+    if isinstance(data, memoryview):
+        obj = data.obj
+        if data.contiguous and data.nbytes == len(obj) and hasattr(obj, "find"):
+            return obj
+        return data.tobytes()
+    if not isinstance(data, (bytes, bytearray, mmap.mmap)):
+        # str (np. requests Response.text) - kodujemy raz do UTF-8
+        return (data or "").encode("utf-8", "ignore")
+    return data
+
+
+def _title_comma(line):
+    """Pozycja przecinka oddzielającego tytuł; przecinki w "cudzysłowach" atrybutów są pomijane."""
+    comma = line.find(",")
+    while comma >= 0 and line.count('"', 0, comma) % 2:
+        quote = line.find('"', comma)
+        if quote < 0:
+            break
+        comma = line.find(",", quote + 1)
+    return comma
+
+
+def classify_group(title, url):
+    """Grupa dla kanału bez grupy: XXX / VOD / Inne (wspólny klasyfikator, po tytule i URL)."""
+    return CLASSIFIER.classify(title, "", url).group
+
+
+def split_extinf_slices(data, count):
+    """Dzieli bufor na ``count`` podobnych wycinków (start, stop).
+
+    Każdy wycinek poza pierwszym zaczyna się od linii #EXTINF, więc wpis (#EXTINF,
+    #EXTGRP, URL) nigdy nie jest rozcięty, a parsowanie wycinków osobno daje te same
+    kanały co parsowanie całości.
+    """
+    buf = _as_buffer(data)
+    end = len(buf)
+    start = 3 if buf[:3] == _BOM else 0
+    bounds = [start]
+    for i in range(1, max(1, count)):
+        target = max(bounds[-1], start + (end - start) * i // count)
+        pos = buf.find(b"\n#EXTINF", target)
+        if pos < 0:
+            break
+        if pos + 1 > bounds[-1]:
+            bounds.append(pos + 1)
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _parse_slice(bounds):
+    """Praca procesu potomnego: parsuje wycinek wspólnego bufora, zwraca kolumny (marshal)."""
+    engine, buf = _FORK_JOB
+    start, stop = bounds
+    table = engine.parse(buf[start:stop])
+    return marshal.dumps(table.to_columns())
+
+
+class _ScanState(object):
+    """Stan przenoszony między porcjami danych (parsowanie strumieniowe)."""
+
+    __slots__ = ("current", "decoded", "slots")
+
+    def __init__(self):
+        self.current = None  # (surowa linia #EXTINF albo b"", surowa grupa #EXTGRP albo None) albo None
+        self.decoded = {}
+        self.slots = {}
+
+
+class M3UEngine(object):
+    """Parser M3U z hakami klasyfikacji/filtra/formatu wyniku."""
+
+    def __init__(self, classify=None, accept=None, emit=None, default_group=None,
+                 require_extinf=False, keep_name=False):
+        self.classify = classify
+        self.accept = accept
+        self.emit = emit
+        self.default_group = default_group
+        # True: linie URL bez poprzedzającego #EXTINF są pomijane (MAC/Xtream).
+        self.require_extinf = require_extinf
+        # True: emit dostaje dodatkowo tvg-name (dekodowane tylko wtedy); bez emit (ChannelTable)
+        # tvg-name trafia do epg_id kanałów bez tvg-id - jak fallback tvg_id eksportu EPG.
+        self.keep_name = keep_name
+
+    # ---------- API ----------
+
+    def parse(self, data, table=None, progress=None):
+        """Parsuje cały bufor. Zwraca ChannelTable albo listę wyników ``emit``.
+
+        Bufor jest dzielony na bloki ~256 KB (granica zawsze na końcu linii) - w pamięci
+        jest naraz tylko lista linii jednego bloku. ``progress(done_bytes, total_bytes, channels)``
+        wywoływane jest po każdym bloku.
+        """
+        buf = _as_buffer(data)
+        out = self._new_output(table)
+        state = _ScanState()
+        end = len(buf)
+        pos = 3 if buf[:3] == _BOM else 0
+        while pos < end:
+            stop = pos + BLOCK_SIZE
+            if stop >= end:
+                stop = end
+            else:
+                nl = buf.find(b"\n", stop)
+                stop = end if nl < 0 else nl + 1
+            self._feed(buf[pos:stop].splitlines(), out, state)
+            pos = stop
+            if progress is not None:
+                progress(pos, end, len(out))
+        return out
+
+    def parse_parallel(self, data, workers=None, slices=None, min_size=PARALLEL_MIN_SIZE,
+                       table=None, progress=None, timeout=PARALLEL_SLICE_TIMEOUT):
+        """Parsuje bufor w puli procesów (wycinki od #EXTINF do #EXTINF). Zwraca ChannelTable.
+
+        ``workers`` - liczba procesów (None = liczba rdzeni), ``slices`` - liczba wycinków
+        (domyślnie = workers). Dla bufora mniejszego niż ``min_size``, 1 procesu, haka ``emit``
+        (wyniki nie są kolumnami) albo braku fork() parsuje zwykłym ``parse``; tak samo gdy
+        wycinek nie wróci w ``timeout`` sekund (zawieszony potomek).
+        Haki classify/accept działają też w procesach potomnych (dziedziczone przez fork).
+        """
+        buf = _as_buffer(data)
+        if workers is None:
+            try:
+                workers = multiprocessing.cpu_count()
+            except Exception:
+                workers = 1
+        slices = slices or workers
+        if (workers <= 1 and slices <= 1) or len(buf) < min_size or self.emit is not None:
+            return self.parse(buf, table, progress)
+        try:
+            ctx = multiprocessing.get_context("fork")
+        except Exception:
+            return self.parse(buf, table, progress)
+        bounds = split_extinf_slices(buf, slices)
+        if len(bounds) <= 1:
+            return self.parse(buf, table, progress)
+
+        global _FORK_JOB
+        try:
+            with _FORK_LOCK:
+                _FORK_JOB = (self, buf)
+                try:
+                    pool = ctx.Pool(min(workers, len(bounds)))
+                finally:
+                    _FORK_JOB = None
+            try:
+                parts = []
+                end = len(buf)
+                count = 0
+                done = 0
+                results = pool.imap(_parse_slice, bounds)
+                for start, stop in bounds:
+                    waited = 0.0
+                    while True:
+                        try:
+                            packed = results.next(_SLICE_POLL)
+                            break
+                        except multiprocessing.TimeoutError:
+                            waited += _SLICE_POLL
+                            if waited >= timeout:
+                                raise
+                            if progress is not None:
+                                progress(done, end, count)
+                    done = stop
+                    part = ChannelTable.from_columns(marshal.loads(packed))
+                    parts.append(part)
+                    count += len(part)
+                    if progress is not None:
+                        progress(stop, end, count)
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        except Exception:
+            # brak zasobów na procesy / błąd albo zawieszenie potomka - wynik z jednego procesu jest ten sam
+            return self.parse(buf, table, progress)
+
+        out = self._new_output(table)
+        for part in parts:
+            out.extend_table(part)
+        return out
+
+    def parse_file(self, path, table=None, workers=1, min_size=PARALLEL_MIN_SIZE, progress=None):
+        """Parsuje plik M3U przez mmap (bez wczytywania całego pliku do pamięci procesu).
+
+        ``workers`` != 1 włącza ``parse_parallel`` (None = liczba rdzeni); ``progress`` jak w ``parse``.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= 0:
+                return self._new_output(table)
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if workers != 1:
+                    return self.parse_parallel(mm, workers, min_size=min_size, table=table, progress=progress)
+                return self.parse(mm, table, progress)
+            finally:
+                mm.close()
+
+    def iter_chunks(self, chunks, table=None):
+        """Parsowanie strumieniowe: kanały (wiersze tabeli albo wyniki emit) oddawane w trakcie pobierania.
+
+        Porcje bajtów mogą dzielić linie (i znaki UTF-8) w dowolnym miejscu - parser
+        przetwarza tylko pełne linie, resztę dokleja do kolejnej porcji.
+        """
+        out = self._new_output(table)
+        state = _ScanState()
+        pending = b""
+        first = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buf = pending + bytes(chunk) if pending else bytes(chunk)
+            pos = 0
+            if first:
+                if len(buf) < 3 and _BOM.startswith(buf):
+                    pending = buf
+                    continue
+                first = False
+                if buf[:3] == _BOM:
+                    pos = 3
+            cut = max(buf.rfind(b"\n"), buf.rfind(b"\r"))
+            if cut < pos:
+                pending = buf[pos:]
+                continue
+            done = len(out)
+            self._feed(buf[pos:cut + 1].splitlines(), out, state)
+            pending = buf[cut + 1:]
+            for i in range(done, len(out)):
+                yield out[i]
+        if pending:
+            done = len(out)
+            self._feed(pending.splitlines(), out, state)
+            for i in range(done, len(out)):
+                yield out[i]
+
+    # ---------- wnętrze ----------
+
+    def _new_output(self, table):
+        if table is not None:
+            return table
+        return ChannelTable() if self.emit is None else []
+
+    def _feed(self, lines, out, state):
+        """Przetwarza pełne linie (bajty) bloku; kanały trafiają partią do ``out``."""
+        # --- faza 1: rozpoznanie linii, bez dekodowania ---
+        require_extinf = self.require_extinf
+        infs = []
+        grps = []
+        urls = []
+        current = state.current
+        for line in lines:
+            if not line:
+                continue
+            c = line[0]
+            if c <= 32:
+                # wiodące spacje/tabulatory (rzadkie) - pełny strip
+                line = line.strip()
+                if not line:
+                    continue
+                c = line[0]
+            if c == 35:  # "#"
+                if line.startswith(b"#EXTINF"):
+                    current = (line, None)
+                elif line.startswith(b"#EXTGRP:"):
+                    current = (current[0] if current is not None else b"", line[8:])
+                continue
+            if current is None:
+                if require_extinf or b"://" not in line:
+                    continue
+                infs.append(b"")
+                grps.append(None)
+            elif b"://" not in line:
+                continue
+            else:
+                infs.append(current[0])
+                grps.append(current[1])
+                current = None
+            urls.append(line)
+        state.current = current
+        if not urls:
+            return
+
+        # --- faza 2: dekodowanie partiami i budowa kanałów ---
+        urls = b"\n".join(urls).decode("utf-8", "ignore").split("\n")
+        infs = b"\n".join(infs).decode("utf-8", "ignore").split("\n")
+        classify = self.classify
+        accept = self.accept
+        default_group = self.default_group
+        keep_name = self.keep_name
+        table_out = self.emit is None
+        decoded = state.decoded
+        slots = state.slots
+        findall = _ATTR_RE.findall
+        group_match = _GROUP_RE.match
+        batch = []
+        add = batch.append
+
+        for inf, raw_grp, url in zip(infs, grps, urls):
+            if url[-1:] <= " ":
+                url = url.rstrip()
+            group = logo = epg_id = name = None
+            if inf:
+                meta, sep, title = inf.partition(",")
+                if sep and '"' in meta and meta.count('"') % 2:
+                    comma = _title_comma(inf)
+                    if comma < 0:
+                        meta, sep = inf, ""
+                    else:
+                        meta, title = inf[:comma], inf[comma + 1:]
+                title = title.strip() if sep else "No Name"
+                if "=" in meta:
+                    for key, quoted, val in findall(meta):
+                        slot = slots.get(key, -1)
+                        if slot == -1:
+                            slot = _ATTR_SLOTS.get(key.lower())
+                            if slot == _NAME and not keep_name:
+                                slot = None
+                            slots[key] = slot
+                        if slot is None:
+                            continue
+                        if val:
+                            if '"' in val:
+                                val = val.replace('"', '')
+                            val = val.strip()
+                        else:
+                            val = quoted.strip()
+                        if slot == _GROUP:
+                            group = val
+                        elif slot == _LOGO:
+                            logo = val
+                        elif slot == _EPG:
+                            epg_id = val
+                        else:
+                            name = val
+                if group is None and title[:1] == "[":
+                    m = group_match(title)
+                    if m:
+                        group = m.group(1).strip()
+            elif raw_grp is None:
+                title = _URL_EXT_RE.sub('', url.split('/')[-1])
+            elif require_extinf:
+                # samo #EXTGRP bez #EXTINF
+                continue
+            else:
+                title = "No Name"
+            if raw_grp is not None:
+                grp = decoded.get(raw_grp)
+                if grp is None:
+                    grp = decoded[raw_grp] = raw_grp.decode("utf-8", "ignore").strip()
+                if grp:
+                    group = grp
+            if classify is not None:
+                group = classify(title, group, url)
+            elif not group:
+                group = default_group or classify_group(title, url)
+            if accept is not None and not accept(title, group, url):
+                continue
+            if keep_name and table_out:
+                add((title, url, group, logo or "", epg_id or name or ""))
+            elif keep_name:
+                add((title, url, group, logo or "", epg_id or "", name or ""))
+            else:
+                add((title, url, group, logo or "", epg_id or ""))
+
+        if not batch:
+            return
+        if self.emit is None:
+            out.extend_fields(batch)
+            return
+        emit = self.emit
+        for fields in batch:
+            item = emit(*fields)
+            if item is not None:
+                out.append(item)
+
+
+# Domyślny silnik: zachowanie PlaylistLoader (URL bez #EXTINF dozwolone, grupa XXX/VOD/Inne).
+DEFAULT_ENGINE = M3UEngine()
+
+
+def scan_m3u_bytes(data, table=None):
+    """Parsuje M3U z bufora bajtów do ChannelTable (domyślne reguły)."""
+    return DEFAULT_ENGINE.parse(data, table)
+
+
+def scan_m3u_file(path, table=None):
+    """Parsuje plik M3U przez mmap do ChannelTable (domyślne reguły)."""
+    return DEFAULT_ENGINE.parse_file(path, table)
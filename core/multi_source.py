@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - WIELE ŹRÓDEŁ NARAZ (równoległe ładowanie + scalanie)
+
+Zestaw źródeł (M3U URL / plik, Xtream, portal MAC) ładowany jest równolegle,
+więc całość trwa mniej więcej tyle, co najwolniejsze źródło:
+- każde źródło w osobnym wątku; M3U/Xtream parsowane strumieniowo w trakcie pobierania,
+- limit jednoczesnych połączeń na host (dwa konta u tego samego dostawcy nie dostają
+  naraz więcej niż ``per_host`` zapytań),
+- wynik scalany w kolejności źródeł; kanał, którego klucz (normalize_channel_key)
+  pojawił się już we wcześniejszym źródle, jest pomijany - duplikaty wewnątrz
+  jednego źródła (np. wersje HD/FHD) zostają,
+- błąd jednego źródła nie przerywa pozostałych (raport w ``last_report``),
+- ``cancel`` (CancelToken) przerywa wszystkie źródła naraz, także te czekające na limit hosta.
+
+Źródła mają format ``last_source`` z konfiguracji:
+{"type": "m3u_url", "value": "URL|User-Agent=..."}, {"type": "m3u_file", "value": ścieżka},
+{"type": "xtream", "value": {"host", "user", "pass", "filter", "categories"?}},
+{"type": "mac", "value": {"host", "mac", "filter"}}.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from twisted.internet import reactor
+
+from .channel_table import ChannelTable
+from .classifier import CLASSIFIER
+from .playlist_loader import split_url_options
+from ..tools.channel_name_utils import normalize_channel_key
+from ..tools.logger import get_logger, mask_sensitive
+from ..tools.progress import as_dispatcher
+from ..tools.xtream_api import XtreamClient, categories_from_stored, load_streams as load_xtream_streams
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Py2
+    from urlparse import urlsplit
+
+DEFAULT_WORKERS = 4
+DEFAULT_PER_HOST = 2
+
+
+def source_host(source):
+    """Host źródła (klucz limitu połączeń); pliki lokalne nie mają hosta."""
+    st = source.get("type")
+    val = source.get("value")
+    if st == "m3u_url":
+        url = split_url_options(val)[0]
+    elif st in ("xtream", "mac"):
+        url = (val or {}).get("host") or ""
+        if url and "://" not in url:
+            url = "http://" + url
+    else:
+        return ""
+    try:
+        return (urlsplit(url).netloc or "").lower()
+    except Exception:
+        return ""
+
+
+def source_label(source):
+    st = source.get("type")
+    val = source.get("value")
+    if st == "m3u_file":
+        return "M3U %s" % val
+    if st == "xtream":
+        return "Xtream %s@%s" % ((val or {}).get("user", ""), source_host(source))
+    if st == "mac":
+        return "MAC %s" % source_host(source)
+    try:
+        return "M3U %s%s" % (source_host(source), urlsplit(split_url_options(val)[0]).path)
+    except Exception:
+        return "M3U %s" % source_host(source)
+
+
+class _HostLimiter(object):
+    """Semafor na host: najwyżej ``per_host`` źródeł z jednego serwera naraz."""
+
+    def __init__(self, per_host):
+        self.per_host = max(1, int(per_host or 1))
+        self._sems = {}
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+
+class MultiSourceLoader(object):
+    """Ładuje kilka źródeł równolegle i scala je w jedną ChannelTable bez duplikatów."""
+
+    def __init__(self, loader, max_workers=None, per_host=None):
+        self.loader = loader
+        cfg = loader.config
+        self.max_workers = max(1, int(max_workers or cfg.get("multi_max_workers", DEFAULT_WORKERS) or 1))
+        self.limiter = _HostLimiter(per_host or cfg.get("multi_per_host", DEFAULT_PER_HOST))
+        self.log = get_logger("IPTVDream.Multi", log_file=cfg.get("log_file", "/tmp/iptvdream.log"),
+                              debug=bool(cfg.get("debug", False)))
+        self.last_report = []
+
+    # ---------- pojedyncze źródła ----------
+
+    def _load_m3u_url(self, val, progress, cancel=None):
+        url, headers = split_url_options(val)
+        return self.loader.load_playlist_url(url, progress_callback=progress, headers=headers or None, cancel=cancel)
+
+    def _load_m3u_file(self, val, progress, cancel=None):
+        return self.loader.parse_m3u_file(val, progress, cancel=cancel)
+
+    def _load_xtream(self, val, progress, cancel=None):
+        cats = categories_from_stored(val.get("categories"))
+        if cats:
+            # źródło zapisane z wybranymi kategoriami: tylko one, przez player_api
+            client = XtreamClient.from_config(val.get("host"), val.get("user"), val.get("pass"), self.loader.config,
+                                              cancel=cancel)
+            cfg = self.loader.config
+            return load_xtream_streams(client, cats, progress_callback=progress, cancel=cancel,
+                                       max_workers=int(cfg.get("xtream_max_workers", 4) or 4))
+        host = val.get("host") or ""
+        base = host if host.startswith("http") else "http://%s" % host
+        url = "%s/get.php?username=%s&password=%s&type=m3u_plus&output=ts" % (base, val.get("user"), val.get("pass"))
+        table = self.loader.load_playlist_url(url, progress_callback=progress, cancel=cancel)
+        accept = CLASSIFIER.content_filter(val.get("filter", "all"))
+        if accept is None:
+            return table
+        return ChannelTable(ch for ch in table if accept(ch.get("title", ""), ch.get("group", ""), ch.get("url", "")))
+
+    def _load_mac(self, val, progress, cancel=None):
+        from ..tools.mac_portal import parse_mac_playlist
+        return parse_mac_playlist(val.get("host"), val.get("mac"), content_type=val.get("filter", "live"),
+                                  progress_callback=progress, cancel=cancel)
+
+    def _load_one(self, source, progress, cancel=None):
+        handler = {
+            "m3u_url": self._load_m3u_url,
+            "m3u_file": self._load_m3u_file,
+            "xtream": self._load_xtream,
+            "mac": self._load_mac,
+        }.get(source.get("type"))
+        if handler is None:
+            raise ValueError("unknown source type: %r" % (source.get("type"),))
+        host = source_host(source)
+        sem = self.limiter.get(host) if host else None
+        if sem is not None:
+            # krótkie oczekiwania zamiast blokującego acquire() - przerwanie nie czeka na cudze źródło
+            while not sem.acquire(timeout=0.2):
+                if cancel is not None:
+                    cancel.check()
+        try:
+            if cancel is not None:
+                cancel.check()
+            return ChannelTable.from_channels(handler(source.get("value"), progress, cancel=cancel) or [])
+        finally:
+            if sem is not None:
+                sem.release()
+
+    # ---------- całość ----------
+
+    def load(self, sources, progress_callback=None, cancel=None):
+        """Ładuje ``sources`` równolegle; zwraca scaloną ChannelTable.
+
+        Wyjątek tylko wtedy, gdy nie udało się żadne źródło (albo Cancelled po ``cancel.cancel()``).
+        """
+        sources = [s for s in (sources or []) if isinstance(s, dict)]
+        if not sources:
+            return ChannelTable()
+        progress = [0.0] * len(sources)
+        lock = threading.Lock()
+
+        progress_callback = as_dispatcher(progress_callback)
+
+        def _source_cb(idx):
+            # wywoływane w wątku reactora (loader i portal MAC przekazują postęp przez ProgressDispatcher)
+            def _cb(pct, msg=""):
+                with lock:
+                    progress[idx] = min(100.0, float(pct or 0))
+                    total = sum(progress) / len(progress)
+                if progress_callback:
+                    progress_callback(min(99, total), "%s: %s" % (source_label(sources[idx]), msg or ""))
+            return _cb
+
+        def _job(idx):
+            t0 = time.time()
+            try:
+                table = self._load_one(sources[idx], _source_cb(idx), cancel)
+                return table, None, time.time() - t0
+            except Exception as e:
+                self.log.warning("Source %s failed: %s", source_label(sources[idx]), mask_sensitive(e))
+                return None, e, time.time() - t0
+            finally:
+                try:
+                    reactor.callFromThread(_source_cb(idx), 100, "")
+                except Exception:
+                    pass
+
+        t0 = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sources))) as ex:
+            results = list(ex.map(_job, range(len(sources))))
+
+        merged, report = self.merge([r[0] for r in results])
+        for idx, (table, err, secs) in enumerate(results):
+            report[idx].update({
+                "source": source_label(sources[idx]),
+                "error": mask_sensitive(err) if err is not None else "",
+                "seconds": secs,
+            })
+        self.last_report = report
+        self.log.info("Multi-source load: %d sources, %d channels in %.1fs (%s)", len(sources), len(merged),
+                      time.time() - t0, ", ".join("%s=%d/-%d" % (r["source"], r["count"], r["dropped"]) for r in report))
+        if all(err is not None for _t, err, _s in results):
+            raise results[0][1]
+        return merged
+
+    @staticmethod
+    def merge(tables):
+        """Scala tabele w podanej kolejności; zwraca (ChannelTable, raport per tabela).
+
+        Kanał z kluczem już obecnym we wcześniejszej tabeli jest pomijany.
+        """
+        merged = ChannelTable()
+        report = []
+        seen = set()
+        keys_cache = {}
+        for table in tables:
+            if not table:
+                report.append({"count": 0, "dropped": 0})
+                continue
+            own = set()
+            keep = []
+            dropped = 0
+            for ch in table:
+                title = ch.get("title") or ""
+                key = keys_cache.get(title)
+                if key is None:
+                    key = keys_cache[title] = normalize_channel_key(title)
+                if key and key in seen:
+                    dropped += 1
+                    continue
+                if key:
+                    own.add(key)
+                keep.append(ch)
+            if dropped:
+                merged.extend(keep)
+            else:
+                merged.extend_table(table)
+            seen |= own
+            report.append({"count": len(keep), "dropped": dropped})
+        return merged, report
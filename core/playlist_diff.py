@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - RÓŻNICE PLAYLIST (diff między odświeżeniami)
+
+Odświeżenie źródła zwykle zmienia kilka kanałów z kilkudziesięciu tysięcy.
+``diff_playlists`` porównuje poprzednią i nową playlistę po kanonicznym kluczu
+kanału i zwraca zbiory dodanych / usuniętych / zmienionych kanałów, żeby
+kolejne etapy (picony, EPG) mogły przetworzyć tylko zmiany:
+- klucz = (URL bez tokenów i danych logowania, znormalizowana nazwa, tvg-id),
+- kanały bez dokładnego dopasowania są parowane po (nazwa, tvg-id), a potem
+  po samym URL - zmieniony adres albo nowa nazwa to "zmieniony", nie usunięty
+  + dodany,
+- duplikaty klucza są parowane w kolejności występowania.
+"""
+
+import re
+
+try:
+    from urllib.parse import urlsplit, parse_qsl, urlencode
+except ImportError:  # Py2
+    from urlparse import urlsplit, parse_qsl
+    from urllib import urlencode
+
+from .channel_table import FIELDS
+from ..tools.channel_name_utils import normalize_channel_key
+
+# Parametry zapytania zmieniające się przy każdym pobraniu playlisty (tokeny, podpisy, dane logowania).
+_TOKEN_PARAMS = frozenset((
+    "token", "auth", "auth_token", "access_token", "play_token", "stalker_token", "sig", "signature",
+    "hash", "expires", "exp", "e", "st", "wmsauthsign", "username", "password", "user", "pass",
+    "mac", "sn", "sessionid", "session",
+))
+# Xtream: /user/pass/<id>.ts oraz /live|movie|series/user/pass/<id>.<ext>
+_XTREAM_PATH_RE = re.compile(r'^(/(?:live|movie|series|timeshift))?/[^/]+/[^/]+/(\d+)(\.\w+)?$', re.IGNORECASE)
+
+
+def canonical_url(url):
+    """URL kanału bez danych logowania i tokenów (stabilny między odświeżeniami)."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    # opcje Enigmy po '|' (User-Agent itp.) i prefiks "ffmpeg " z portali MAC nie identyfikują kanału
+    url = url.split("|", 1)[0]
+    if url.startswith("ffmpeg "):
+        url = url[7:].strip()
+    try:
+        parts = urlsplit(url)
+    except Exception:
+        return url.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port:
+        host = "%s:%d" % (host, parts.port)
+    path = _XTREAM_PATH_RE.sub(r"\1/\2", parts.path)
+    query = ""
+    if parts.query:
+        params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                  if k.lower() not in _TOKEN_PARAMS]
+        query = urlencode(sorted(params))
+    return "%s%s%s" % (host, path, ("?" + query) if query else "")
+
+
+def title_key(title):
+    """Znormalizowana nazwa kanału (bez prefiksów kraju/jakości, jak przy EPG i piconach)."""
+    title = title or ""
+    return normalize_channel_key(title) or title.strip().lower()
+
+
+def channel_key(channel):
+    """Kanoniczny klucz kanału: (URL bez tokenów, znormalizowana nazwa, tvg-id)."""
+    get = channel.get
+    return (canonical_url(get("url")),
+            title_key(get("title") or get("name")),
+            (get("epg_id") or get("tvg-id") or "").strip().lower())
+
+
+class PlaylistDiff(object):
+    """Wynik porównania playlist.
+
+    ``added`` / ``removed`` - kanały nowej / starej playlisty, ``modified`` - krotki
+    (stary, nowy, pola), gdzie pola to nazwy zmienionych kolumn (title, url, group, logo, epg_id).
+    ``base_gen`` - znacznik poprzedniej playlisty przekazany przez wywołującego.
+    """
+
+    def __init__(self, base_gen=None):
+        self.added = []
+        self.removed = []
+        self.modified = []
+        self.unchanged = 0
+        self.base_gen = base_gen
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    __nonzero__ = __bool__
+
+    def changed_channels(self, fields=None):
+        """Kanały nowej playlisty do ponownego przetworzenia: dodane + zmienione.
+
+        ``fields`` zawęża zmienione do tych, w których zmieniło się któreś z podanych pól.
+        """
+        out = list(self.added)
+        wanted = set(fields) if fields else None
+        for _old, new, changed in self.modified:
+            if wanted is None or wanted.intersection(changed):
+                out.append(new)
+        return out
+
+    def summary(self):
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "modified": len(self.modified),
+            "unchanged": self.unchanged,
+        }
+
+    def summary_text(self, lang="pl"):
+        s = self.summary()
+        if lang == "pl":
+            return "Zmiany: +%d nowych, -%d usuniętych, ~%d zmienionych (%d bez zmian)" % (
+                s["added"], s["removed"], s["modified"], s["unchanged"])
+        return "Changes: +%d added, -%d removed, ~%d modified (%d unchanged)" % (
+            s["added"], s["removed"], s["modified"], s["unchanged"])
+
+    def __repr__(self):
+        return "PlaylistDiff(%r)" % (self.summary(),)
+
+
+def _changed_fields(old, new):
+    return tuple(f for f in FIELDS if (old.get(f) or "") != (new.get(f) or ""))
+
+
+def _pair(left_old, left_new, old_key, new_key, pairs):
+    """Paruje pozostałe indeksy po kluczu (duplikaty w kolejności występowania)."""
+    index = {}
+    for i in reversed(left_old):
+        k = old_key(i)
+        if k:
+            index.setdefault(k, []).append(i)
+    matched = set()
+    rest = []
+    for j in left_new:
+        bucket = index.get(new_key(j))
+        if bucket:
+            i = bucket.pop()
+            matched.add(i)
+            pairs.append((i, j))
+        else:
+            rest.append(j)
+    return [i for i in left_old if i not in matched], rest
+
+
+def diff_playlists(old, new, base_gen=None):
+    """Porównuje dwie playlisty (ChannelTable albo listy słowników) i zwraca PlaylistDiff."""
+    result = PlaylistDiff(base_gen)
+    old = list(old or ())
+    new = list(new or ())
+
+    # 0) identyczne wiersze (zwykle prawie cała playlista) - bez liczenia kluczy kanonicznych
+    def _raw(ch):
+        get = ch.get
+        return tuple(get(f) or "" for f in FIELDS)
+
+    same = []
+    left_old, left_new = _pair(list(range(len(old))), list(range(len(new))),
+                               lambda i: _raw(old[i]), lambda j: _raw(new[j]), same)
+    result.unchanged = len(same)
+
+    pairs = []
+    if left_old and left_new:
+        old_keys = dict((i, channel_key(old[i])) for i in left_old)
+        new_keys = dict((j, channel_key(new[j])) for j in left_new)
+        # 1) pełny klucz, 2) nazwa + tvg-id (zmieniony URL), 3) sam URL (zmieniona nazwa/tvg-id)
+        for part in (lambda k: k, lambda k: (k[1], k[2]) if (k[1] or k[2]) else None, lambda k: k[0]):
+            if not left_old or not left_new:
+                break
+            left_old, left_new = _pair(left_old, left_new,
+                                       lambda i: part(old_keys[i]), lambda j: part(new_keys[j]), pairs)
+
+    for i, j in sorted(pairs, key=lambda p: p[1]):
+        changed = _changed_fields(old[i], new[j])
+        if changed:
+            result.modified.append((old[i], new[j], changed))
+        else:
+            result.unchanged += 1
+    result.added = [new[j] for j in left_new]
+    result.removed = [old[i] for i in left_old]
+    return result
@@ -7,11 +7,101 @@
 - Progresywne ładowanie
 """
 
-import os, re, requests, time, hashlib, json, threading, gzip, io
-from twisted.internet import reactor
+import os, re, sys, requests, time, hashlib, json, threading, gzip, marshal, mmap
+from contextlib import contextmanager
 from .config_manager import ConfigManager
-from ..tools.net import http_get, NetError
+from .channel_table import ChannelTable
+from .m3u_engine import DEFAULT_ENGINE
+from .cache_manager import CacheManager, CACHE_DIR, get_cache_manager
+from ..tools.net import http_get, new_session, NetError
 from ..tools.logger import get_logger, mask_sensitive
+from ..tools.progress import as_dispatcher
+from ..tools.singleflight import SingleFlight
+from ..tools.governor import get_governor, url_host, PRIO_INTERACTIVE
+from ..tools.cancel import Cancelled
+
+# Rozmiar porcji przy strumieniowym pobieraniu/parsowaniu (ogranicza szczyt pamięci).
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WRONG_M3U_MSG = ("Serwer zwrócił HTML/stronę błędu zamiast playlisty M3U. Sprawdź, czy URL jest bezpośrednim "
+                  "linkiem do playlisty, a nie stroną logowania/panelem.")
+
+# Wersja parsera zapisywana w cache przetworzonych playlist (*.parsed).
+# Podbij przy każdej zmianie wyniku parsowania - stare pliki zostaną zignorowane.
+PARSER_VERSION = 4
+_PARSED_MAGIC = "IPTVDREAM-PARSED"
+
+# Wspólne dla wszystkich instancji loadera: GUI, WebIF i auto-odświeżanie pobierające ten sam URL
+# naraz dostają jedno pobieranie (klucz = klucz cache, czyli URL + nagłówki).
+_FLIGHTS = SingleFlight()
+
+# Jeden zapisujący ``<klucz>.m3u.part`` naraz: pobieranie do pliku (fetch_m3u_url) i parsowanie
+# w trakcie pobierania (load_playlist_url / iter_m3u_url) tego samego URL to różne loty SingleFlight,
+# ale piszą ten sam plik. Drugi czeka na blokadę i korzysta z odświeżonego właśnie cache.
+_PART_LOCKS = {}
+_PART_LOCKS_GUARD = threading.Lock()
+
+
+def _part_lock(cache_key):
+    with _PART_LOCKS_GUARD:
+        lock = _PART_LOCKS.get(cache_key)
+        if lock is None:
+            lock = _PART_LOCKS[cache_key] = threading.Lock()
+        return lock
+
+
+try:
+    from urllib3.exceptions import ProtocolError as _U3ProtocolError, ReadTimeoutError as _U3ReadTimeout
+    _URLLIB3_DROP_ERRORS = (_U3ProtocolError, _U3ReadTimeout)
+except ImportError:  # stare requests z urllib3 tylko w requests.packages - błędy i tak są opakowane
+    _URLLIB3_DROP_ERRORS = ()
+
+# Zerwany strumień (NET-ABORTED / ChunkedEncodingError / timeout odczytu) - pobieranie da się wznowić Range.
+# Tylko błędy sieci: OSError zapisu .part (brak miejsca, tylko do odczytu) to nie zerwanie - .part jest usuwany.
+_STREAM_DROP_ERRORS = (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError,
+                       requests.exceptions.Timeout) + _URLLIB3_DROP_ERRORS
+# Przerwanie przez użytkownika (Cancelled) albo zamknięty generator (konsument przestał czytać):
+# zapisane bajty .part są poprawne - zostaje do wznowienia jak po zerwaniu.
+_STREAM_STOP_ERRORS = (Cancelled, GeneratorExit)
+
+
+def split_url_options(raw):
+    """'URL|User-Agent=...&Referer=...' -> (url z http://, słownik nagłówków)."""
+    url = (raw or "").strip()
+    headers = {}
+    try:
+        if '|' in url:
+            url, opt = url.split('|', 1)
+            url = url.strip()
+            opt = opt.strip()
+            for kv in re.split(r"[&;]", opt):
+                if '=' not in kv:
+                    continue
+                k, v = kv.split('=', 1)
+                k = (k or '').strip().lower()
+                v = (v or '').strip()
+                if not v:
+                    continue
+                if k in ('user-agent', 'useragent', 'ua'):
+                    headers['User-Agent'] = v
+                elif k in ('referer', 'ref'):
+                    headers['Referer'] = v
+                elif k == 'origin':
+                    headers['Origin'] = v
+    except Exception:
+        headers = {}
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'http://' + url
+    return url, headers
+
+
+class _RestartDownload(Exception):
+    """Przy wznawianiu serwer oddał inną wersję playlisty - pobieranie (i parsowanie) od zera."""
+
+    def __init__(self, response):
+        Exception.__init__(self, "playlist changed during resume")
+        self.response = response
+
 
 class PlaylistLoader:
     """Zaawansowany ładowacz playlist z funkcjami optymalizacji."""
@@ -19,7 +109,7 @@ class PlaylistLoader:
     def __init__(self):
         self.config = ConfigManager("/etc/enigma2/iptvdream_v6_config.json")
         self.cache_dir = "/tmp/iptvdream_cache"
-        self.session = requests.Session()
+        self.session = new_session()
         # logger + network settings
         self.log = get_logger("IPTVDream.Playlist", log_file=self.config.get("log_file", "/tmp/iptvdream.log"), debug=bool(self.config.get("debug", False)))
         # Streaming M3U bywa wolne; read timeout 30s powoduje fałszywe "Read timed out".
@@ -39,12 +129,15 @@ class PlaylistLoader:
         self.net_timeout = (ct, rt)
         self.net_retries = int(self.config.get("net_retries", 2))
         self.net_backoff = float(self.config.get("net_backoff", 0.8))
+        # Łączny czas wszystkich prób (z przerwami); sprawdzenie zmian przy ważnym cache ma krótszy,
+        # bo na nieodpowiadający serwer lepiej nie czekać, skoro jest z czego się załadować.
+        self.net_deadline = float(self.config.get("net_deadline", 120) or 0)
+        self.net_deadline_check = float(self.config.get("net_deadline_check", 15) or 0)
         self.ssl_verify = bool(self.config.get("ssl_verify", False))
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36',
             'Accept': '*/*',
             'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'close',
             'Cache-Control': 'no-cache'
         })
         
@@ -56,6 +149,17 @@ class PlaylistLoader:
         # Upewnij się, że katalog cache istnieje
         os.makedirs(self.cache_dir, exist_ok=True)
 
+        # Wspólne limity pasma i połączeń wszystkich pobierań w tle (tools.governor)
+        self.governor = get_governor()
+        self.governor.configure(self.config)
+
+        # Wspólny budżet bajtów + LRU dla wszystkich katalogów cache w /tmp (RAM)
+        self.cache = get_cache_manager()
+        try:
+            self.cache.budget = int(float(self.config.get("cache_budget_mb", 64)) * 1024 * 1024)
+        except Exception:
+            pass
+
 
     def _meta_path(self, cache_key):
         return os.path.join(self.cache_dir, f"{cache_key}.meta.json")
@@ -75,8 +179,68 @@ class PlaylistLoader:
             mp = self._meta_path(cache_key)
             with open(mp, 'w', encoding='utf-8') as f:
                 json.dump(meta, f, indent=2, ensure_ascii=False)
+            self.cache.record(mp)
         except Exception:
             pass
+
+    def _parsed_path(self, cache_key):
+        return os.path.join(self.cache_dir, f"{cache_key}.parsed")
+
+    def _parsed_validator(self, cache_key, meta=None):
+        """Klucz ważności cache przetworzonej playlisty: parser + ETag/Last-Modified + rozmiar .m3u."""
+        if meta is None:
+            meta = self._read_meta(cache_key)
+        try:
+            size = os.path.getsize(os.path.join(self.cache_dir, f"{cache_key}.m3u"))
+        except Exception:
+            return None
+        return (PARSER_VERSION, tuple(sys.version_info[:2]), cache_key,
+                str(meta.get("etag") or ""), str(meta.get("last_modified") or ""), size)
+
+    def load_parsed_cache(self, cache_key, meta=None):
+        """Zwraca ChannelTable z cache *.parsed albo None, gdy brak/nieaktualny."""
+        validator = self._parsed_validator(cache_key, meta)
+        if validator is None:
+            return None
+        try:
+            with open(self._parsed_path(cache_key), 'rb') as f:
+                magic, stored, columns = marshal.load(f)
+            if magic != _PARSED_MAGIC or tuple(stored) != validator:
+                return None
+            return ChannelTable.from_columns(columns)
+        except Exception:
+            return None
+
+    def save_parsed_cache(self, cache_key, channels, meta=None):
+        """Zapisuje kolumny ChannelTable (marshal) obok <cache_key>.m3u."""
+        validator = self._parsed_validator(cache_key, meta)
+        if validator is None:
+            return False
+        try:
+            columns = ChannelTable.from_channels(channels).to_columns()
+            path = self._parsed_path(cache_key)
+            tmp = path + ".tmp"
+            with open(tmp, 'wb') as f:
+                marshal.dump((_PARSED_MAGIC, validator, columns), f)
+            os.replace(tmp, path)
+            self.cache.record(path)
+            return True
+        except Exception as e:
+            self.log.debug("Parsed cache write failed: %s", e)
+            return False
+
+    def load_cached_channels(self, cache_key):
+        """Kanały z cache: najpierw *.parsed (milisekundy), inaczej parsowanie .m3u i zapis *.parsed."""
+        m3u_file = os.path.join(self.cache_dir, f"{cache_key}.m3u")
+        table = self.load_parsed_cache(cache_key)
+        if table is not None:
+            self.cache.hit(self._parsed_path(cache_key), m3u_file, self._meta_path(cache_key))
+            return table
+        table = self.parse_m3u_file(m3u_file)
+        self.cache.hit(m3u_file, self._meta_path(cache_key))
+        self.save_parsed_cache(cache_key, table)
+        return table
+
     def get_cache_key(self, url):
         """Generuje klucz cache dla URL."""
         return hashlib.md5(url.encode('utf-8')).hexdigest()
@@ -112,9 +276,12 @@ class PlaylistLoader:
         if self.is_cache_valid(cache_file):
             try:
                 with open(cache_file, 'rb') as f:
-                    return f.read()
+                    data = f.read()
+                self.cache.hit(cache_file)
+                return data
             except:
                 pass
+        self.cache.miss()
         return None
 
     def cache_content(self, url, content, meta=None, headers=None):
@@ -135,6 +302,7 @@ class PlaylistLoader:
                     json.dump(meta, f, indent=2)
             except Exception:
                 pass
+        self.cache.record(cache_file, meta_file)
 
     def get_cached_metadata(self, url, headers=None):
         """Returns cached HTTP metadata (ETag/Last-Modified) if present."""
@@ -148,16 +316,6 @@ class PlaylistLoader:
             pass
         return {}
 
-    def _read_cache_file_any_age(self, cache_file):
-        """Return cached playlist even if it is stale; used only as emergency fallback."""
-        try:
-            if cache_file and os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
-                with open(cache_file, 'rb') as f:
-                    return f.read()
-        except Exception:
-            pass
-        return None
-
     def _friendly_m3u_error(self, err):
         s = str(err or '')
         low = s.lower()
@@ -199,19 +357,289 @@ class PlaylistLoader:
         except Exception:
             return False
 
+    # ---------- wznawianie pobierania (Range / If-Range) ----------
+
+    def _net_kwargs(self, cancel=None):
+        return dict(
+            cancel=cancel,
+            session=self.session,
+            stream=True,
+            verify=self.ssl_verify,
+            timeout=self.net_timeout,
+            retries=self.net_retries,
+            backoff=self.net_backoff,
+            deadline=self.net_deadline,
+            debug=bool(self.config.get("debug", False)),
+            log_file=self.config.get("log_file", "/tmp/iptvdream.log"),
+        )
+
+    def _resume_validator(self, r):
+        """Walidator do If-Range albo None, gdy wznowienie nie jest bezpieczne.
+
+        Zakresy bajtów dotyczą treści po Content-Encoding, więc odpowiedź gzip nie jest wznawiana;
+        słaby ETag (W/...) nie może być użyty w If-Range - wtedy Last-Modified.
+        """
+        try:
+            enc = (r.headers.get("Content-Encoding") or "").strip().lower()
+            if enc not in ("", "identity"):
+                return None
+            etag = (r.headers.get("ETag") or "").strip()
+            if etag and not etag.startswith("W/"):
+                return etag
+            return (r.headers.get("Last-Modified") or "").strip() or None
+        except Exception:
+            return None
+
+    def _expected_size(self, r, offset=0):
+        """Pełny rozmiar pliku z Content-Range / Content-Length (0 = nieznany)."""
+        try:
+            cr = r.headers.get("Content-Range") or ""
+            if cr and "/" in cr:
+                total = cr.rsplit("/", 1)[1].strip()
+                return int(total) if total.isdigit() else 0
+            cl = int(r.headers.get("Content-Length", 0) or 0)
+            return offset + cl if cl else 0
+        except Exception:
+            return 0
+
+    def _range_get(self, url, headers, offset, validator, cancel=None):
+        """GET od bajtu ``offset``; If-Range sprawia, że zmieniony plik przychodzi w całości (200)."""
+        h = dict(headers or {})
+        h["Range"] = "bytes=%d-" % offset
+        h["If-Range"] = validator
+        h["Accept-Encoding"] = "identity"
+        return http_get(url, headers=h, **self._net_kwargs(cancel))
 
-    def load_m3u_url(self, url, progress_callback=None, headers=None):
-        """Streaming M3U download with cache, conditional GET, timeouts and retries."""
+    def _range_ok(self, r, offset):
+        try:
+            return (getattr(r, "status_code", 200) == 206 and
+                    (r.headers.get("Content-Range") or "").strip().startswith("bytes %d-" % offset))
+        except Exception:
+            return False
+
+    def _part_info_path(self, part_file):
+        return part_file + ".json"
+
+    def _read_part_info(self, part_file, url):
+        """(bajty w .part, walidator) przerwanego pobierania tego URL albo (0, None)."""
+        try:
+            with open(self._part_info_path(part_file), 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            size = os.path.getsize(part_file)
+            if info.get("url") == url and info.get("validator") and size > 0:
+                return size, info.get("validator")
+        except Exception:
+            pass
+        return 0, None
+
+    def _write_part_info(self, part_file, url, validator, total):
+        try:
+            with open(self._part_info_path(part_file), 'w', encoding='utf-8') as f:
+                json.dump({"url": url, "validator": validator, "total": total}, f)
+        except Exception:
+            pass
+
+    def _drop_part(self, part_file):
+        for path in (part_file, self._part_info_path(part_file)):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception:
+                pass
+
+    def _open_resumed(self, url, headers, part_file, cancel=None):
+        """Wznawia pobieranie przerwane w poprzedniej próbie: (odpowiedź 206, offset) albo (None, 0)."""
+        offset, validator = self._read_part_info(part_file, url)
+        if not offset:
+            return None, 0
+        try:
+            r = self._range_get(url, headers, offset, validator, cancel)
+        except Exception as e:
+            self.log.debug("Resume request failed, downloading from zero: %s", mask_sensitive(e))
+            return None, 0
+        if self._range_ok(r, offset):
+            self.log.info("Resuming M3U download at %d bytes", offset)
+            return r, offset
+        # 200: serwer ignoruje Range albo plik się zmienił - ta odpowiedź to pełne pobieranie
+        self._drop_part(part_file)
+        return r, 0
+
+    def _iter_download(self, r, url, headers, part_file, state, offset=0):
+        """Generator bajtów pobierania; wszystko trafia też do ``part_file``.
+
+        Po zerwaniu strumienia (do ``net_retries`` razy) pobieranie jest wznawiane od ostatniego
+        bajtu przez Range + If-Range. Gdy serwer ignoruje Range, a wersja pliku jest ta sama,
+        już posiadane bajty nowej odpowiedzi są pomijane; inna wersja -> _RestartDownload.
+        Przy ``offset`` > 0 najpierw oddawana jest zawartość istniejącego ``part_file``.
+        ``state["cancel"]`` (CancelToken) jest sprawdzany po każdym chunku.
+        """
+        cancel = state.get("cancel")
+        state["response"] = r
+        validator = self._resume_validator(r)
+        total = self._expected_size(r, offset)
+        if validator:
+            self._write_part_info(part_file, url, validator, total)
+        else:
+            try:
+                os.remove(self._part_info_path(part_file))
+            except Exception:
+                pass
+        retries = max(0, self.net_retries)
+        skip = 0
+        state["downloaded"] = offset
+        state["total"] = total
+        if offset:
+            with open(part_file, 'rb') as prev:
+                left = offset
+                while left > 0:
+                    chunk = prev.read(min(STREAM_CHUNK_SIZE, left))
+                    if not chunk:
+                        break
+                    left -= len(chunk)
+                    yield chunk
+        with open(part_file, 'ab' if offset else 'wb') as out:
+            while True:
+                try:
+                    for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        if cancel is not None:
+                            cancel.check()
+                        if not chunk:
+                            continue
+                        if skip:
+                            if len(chunk) <= skip:
+                                skip -= len(chunk)
+                                continue
+                            chunk, skip = chunk[skip:], 0
+                        out.write(chunk)
+                        state["downloaded"] += len(chunk)
+                        self.governor.consume(len(chunk), PRIO_INTERACTIVE, cancel)
+                        yield chunk
+                    if validator and total and state["downloaded"] < total:
+                        raise requests.exceptions.ChunkedEncodingError(
+                            "stream ended at %d of %d bytes" % (state["downloaded"], total))
+                    return
+                except _STREAM_DROP_ERRORS as e:
+                    if cancel is not None:
+                        # zerwanie przez cancel() (zamknięty socket) - bez wznawiania
+                        cancel.check()
+                    if not validator or retries <= 0:
+                        raise
+                    retries -= 1
+                    out.flush()
+                    have = state["downloaded"]
+                    self.log.warning("M3U stream dropped at %d bytes, resuming: %s", have, mask_sensitive(e))
+                    try:
+                        r.close()
+                    except Exception:
+                        pass
+                    r = state["response"] = self._range_get(url, headers, have, validator, cancel)
+                    if self._range_ok(r, have):
+                        continue
+                    if self._resume_validator(r) == validator:
+                        # serwer ignoruje Range, ale to ta sama wersja - pomijamy posiadane bajty
+                        skip = have
+                        continue
+                    raise _RestartDownload(r)
+
+    def _keep_part(self, part_file, err):
+        """Po błędzie sieci lub przerwaniu .part zostaje do wznowienia w następnej próbie; inaczej jest usuwany."""
+        resumable = os.path.exists(self._part_info_path(part_file))
+        if resumable and isinstance(err, _STREAM_DROP_ERRORS + _STREAM_STOP_ERRORS + (NetError,)):
+            return True
+        self._drop_part(part_file)
+        return False
+
+    def _stale_cache_path(self, cache_file):
+        """Cache file path even if it is stale (emergency fallback) or None."""
+        try:
+            if cache_file and os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
+                return cache_file
+        except Exception:
+            pass
+        return None
+
+    def _read_head(self, path, size=4096):
+        try:
+            with open(path, 'rb') as f:
+                return f.read(size)
+        except Exception:
+            return b""
+
+    def fetch_m3u_url(self, url, progress_callback=None, headers=None, cancel=None):
+        """Streaming M3U download with cache, conditional GET, timeouts and retries.
+
+        Returns the path of the playlist file in the cache directory (fresh download, 304 hit or
+        stale cache fallback). Chunks go straight to ``<cache_key>.m3u.part``, which replaces the
+        cache file (os.replace) only after a complete, non-HTML download - the playlist is never
+        held in memory as a whole; read it with ``parse_m3u_file`` (mmap) or ``iter_m3u_file``.
+        ``cancel`` (CancelToken) stops the download within one chunk and closes the socket.
+        Concurrent calls for the same URL and headers share one download (tools.singleflight).
+        """
+        cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+        path, _shared = _FLIGHTS.do(
+            ("file", cache_key),
+            lambda progress: self._governed(self._fetch_m3u_url, url, progress, headers=headers, cancel=cancel),
+            progress=progress_callback, cancel=cancel)
+        return path
+
+    @contextmanager
+    def _download_lock(self, cache_key, cancel=None):
+        """Wyłączny zapis ``.part`` dla ``cache_key``; zwraca True, gdy inny zapisujący odświeżył
+        cache w czasie oczekiwania (wtedy pobieranie jest zbędne)."""
+        lock = _part_lock(cache_key)
+        started = time.time()
+        waited = not lock.acquire(False)
+        if waited:
+            # krótkie oczekiwania - przerwanie nie czeka na cudze pobieranie
+            while not lock.acquire(True, 0.2):
+                if cancel is not None:
+                    cancel.check()
+        try:
+            fresh = False
+            if waited:
+                try:
+                    fresh = os.path.getmtime(os.path.join(self.cache_dir, f"{cache_key}.m3u")) >= started
+                except OSError:
+                    fresh = False
+            yield fresh
+        finally:
+            lock.release()
+
+    def _governed(self, fn, url, progress, headers=None, cancel=None):
+        """Pobieranie playlisty w slocie governora (priorytet przed piconami i EPG)."""
+        with self.governor.slot(url_host(url), PRIO_INTERACTIVE, cancel):
+            return fn(url, progress, headers=headers, cancel=cancel)
+
+    def _fetch_m3u_url(self, url, progress_callback=None, headers=None, cancel=None):
+        cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+        with self._download_lock(cache_key, cancel) as fresh:
+            if fresh:
+                cache_file = os.path.join(self.cache_dir, f"{cache_key}.m3u")
+                self.cache.hit(cache_file, self._meta_path(cache_key))
+                return cache_file
+            return self._download_m3u_file(url, progress_callback, headers=headers, cancel=cancel)
+
+    def _download_m3u_file(self, url, progress_callback=None, headers=None, cancel=None):
         cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
         cache_file = os.path.join(self.cache_dir, f"{cache_key}.m3u")
+        en = self.config.get("language") == "en"
+
+        progress_callback = as_dispatcher(progress_callback)
 
         def _cb(pct, msg):
             try:
                 if progress_callback:
-                    reactor.callFromThread(progress_callback, pct, msg)
+                    progress_callback(pct, msg)
             except Exception:
                 pass
 
+        def _stale(err, what):
+            stale = self._stale_cache_path(cache_file)
+            if stale:
+                self.log.warning("M3U %s failed, using stale cache: %s", what, mask_sensitive(err))
+                _cb(100, "Loaded from cache" if en else "Ładowanie z cache...")
+            return stale
+
         # 1) If cache is valid, attempt conditional GET (ETag / Last-Modified)
         meta = self._read_meta(cache_key)
         cached_ok = self.is_cache_valid(cache_file, max_age=int(self.config.get("cache_max_age", 3600)))
@@ -226,7 +654,7 @@ class PlaylistLoader:
 
             if cond_headers:
                 try:
-                    _cb(5, "Checking updates..." if self.config.get("language") == "en" else "Sprawdzanie zmian...")
+                    _cb(5, "Checking updates..." if en else "Sprawdzanie zmian...")
                     r = http_get(
                         url,
                         session=self.session,
@@ -236,104 +664,109 @@ class PlaylistLoader:
                         timeout=self.net_timeout,
                         retries=self.net_retries,
                         backoff=self.net_backoff,
+                        deadline=self.net_deadline_check,
                         debug=bool(self.config.get("debug", False)),
                         log_file=self.config.get("log_file", "/tmp/iptvdream.log"),
+                        cancel=cancel,
                     )
                     if getattr(r, "status_code", 200) == 304:
-                        _cb(100, "Loaded from cache" if self.config.get("language") == "en" else "Ładowanie z cache...")
-                        with open(cache_file, 'rb') as f:
-                            return f.read()
+                        _cb(100, "Loaded from cache" if en else "Ładowanie z cache...")
+                        self.cache.hit(cache_file, self._meta_path(cache_key))
+                        return cache_file
                 except Exception as e:
                     # On network issues, fall back to cache
                     self.log.debug("Conditional GET failed, using cache: %s", mask_sensitive(e))
-                    _cb(100, "Loaded from cache" if self.config.get("language") == "en" else "Ładowanie z cache...")
-                    try:
-                        with open(cache_file, 'rb') as f:
-                            return f.read()
-                    except Exception:
-                        pass
+                    _cb(100, "Loaded from cache" if en else "Ładowanie z cache...")
+                    if self._stale_cache_path(cache_file):
+                        return cache_file
 
         # 2) No valid cache or cache disabled -> full download (stream)
+        self.cache.miss()
+        part_file = cache_file + ".part"
         try:
-            _cb(1, "Downloading..." if self.config.get("language") == "en" else "Pobieranie...")
+            _cb(1, "Downloading..." if en else "Pobieranie...")
             try:
-                r = http_get(
-                    url,
-                    session=self.session,
-                    headers=headers,
-                    stream=True,
-                    verify=self.ssl_verify,
-                    timeout=self.net_timeout,
-                    retries=self.net_retries,
-                    backoff=self.net_backoff,
-                    debug=bool(self.config.get("debug", False)),
-                    log_file=self.config.get("log_file", "/tmp/iptvdream.log"),
-                )
+                # Partial bytes of an interrupted earlier attempt are resumed with Range/If-Range.
+                r, offset = self._open_resumed(url, headers, part_file, cancel)
+                if r is None:
+                    r = http_get(url, headers=headers, **self._net_kwargs(cancel))
             except Exception as e:
-                cached = self._read_cache_file_any_age(cache_file)
-                if cached:
-                    self.log.warning("M3U download failed, using stale cache: %s", mask_sensitive(e))
-                    _cb(100, "Loaded from cache" if self.config.get("language") == "en" else "Ładowanie z cache...")
-                    return cached
+                stale = _stale(e, "download")
+                if stale:
+                    return stale
                 raise Exception(self._friendly_m3u_error(e))
 
-            total_size = int(r.headers.get('content-length', 0) or 0)
-            content = io.BytesIO()
-            chunk_size = 8192
-            downloaded = 0
+            chunk_size = STREAM_CHUNK_SIZE
+            state = {"downloaded": 0, "total": 0, "cancel": cancel}
 
             try:
-                for chunk in r.iter_content(chunk_size=chunk_size):
-                    if not chunk:
-                        continue
-                    content.write(chunk)
-                    downloaded += len(chunk)
-                    if progress_callback:
-                        if total_size > 0:
-                            progress = min(99, (downloaded / float(total_size)) * 100.0)
-                            _cb(progress, "Downloaded: %.1f KB" % (downloaded/1024.0) if self.config.get("language") == "en" else "Pobrano: %.1f KB" % (downloaded/1024.0))
-                        else:
-                            # chunked/unknown size: show activity every ~512KB
-                            if downloaded % (512 * 1024) < chunk_size:
-                                _cb(20, "Downloaded: %.1f MB" % (downloaded/1024.0/1024.0) if self.config.get("language") == "en" else "Pobrano: %.1f MB" % (downloaded/1024.0/1024.0))
+                while True:
+                    try:
+                        # _iter_download writes every chunk to part_file; nothing is kept here
+                        for _chunk in self._iter_download(r, url, headers, part_file, state, offset):
+                            downloaded = state["downloaded"]
+                            total_size = state["total"]
+                            if progress_callback:
+                                if total_size > 0:
+                                    progress = min(99, (downloaded / float(total_size)) * 100.0)
+                                    _cb(progress, "Downloaded: %.1f KB" % (downloaded/1024.0) if en else "Pobrano: %.1f KB" % (downloaded/1024.0))
+                                else:
+                                    # chunked/unknown size: show activity every ~512KB
+                                    if downloaded % (512 * 1024) < chunk_size:
+                                        _cb(20, "Downloaded: %.1f MB" % (downloaded/1024.0/1024.0) if en else "Pobrano: %.1f MB" % (downloaded/1024.0/1024.0))
+                        break
+                    except _RestartDownload as restart:
+                        # The playlist changed while resuming - start over with the full response.
+                        r, offset = restart.response, 0
             except Exception as e:
+                # Network drops keep the .part for the next attempt (resume instead of a full re-download).
+                self._keep_part(part_file, e)
                 # If the provider breaks the stream mid-download, fall back to any existing cache.
-                cached = self._read_cache_file_any_age(cache_file)
-                if cached:
-                    self.log.warning("M3U stream failed, using stale cache: %s", mask_sensitive(e))
-                    _cb(100, "Loaded from cache" if self.config.get("language") == "en" else "Ładowanie z cache...")
-                    return cached
+                stale = _stale(e, "stream")
+                if stale:
+                    return stale
                 raise Exception(self._friendly_m3u_error(e))
 
-            content_data = content.getvalue()
-            if self._looks_like_wrong_m3u_response(content_data):
-                cached = self._read_cache_file_any_age(cache_file)
-                if cached:
+            if self._looks_like_wrong_m3u_response(self._read_head(part_file)):
+                self._drop_part(part_file)
+                stale = self._stale_cache_path(cache_file)
+                if stale:
                     self.log.warning("Server returned HTML/not-M3U, using stale cache")
-                    _cb(100, "Loaded from cache" if self.config.get("language") == "en" else "Ładowanie z cache...")
-                    return cached
-                raise Exception("Serwer zwrócił HTML/stronę błędu zamiast playlisty M3U. Sprawdź, czy URL jest bezpośrednim linkiem do playlisty, a nie stroną logowania/panelem.")
+                    _cb(100, "Loaded from cache" if en else "Ładowanie z cache...")
+                    return stale
+                raise Exception(_WRONG_M3U_MSG)
 
-            # Save cache + metadata
+            # Atomic swap: readers see either the previous cache or the complete new file.
+            os.replace(part_file, cache_file)
+            self._drop_part(part_file)
             try:
-                self.cache_content(url, content_data, headers=headers)
                 meta = {
                     "url": url,
                     "saved_at": time.time(),
-                    "size": len(content_data),
+                    "size": state["downloaded"],
                     "etag": r.headers.get("ETag", ""),
                     "last_modified": r.headers.get("Last-Modified", ""),
                 }
                 self._write_meta(cache_key, meta)
             except Exception:
                 pass
+            self.cache.record(cache_file, self._meta_path(cache_key))
 
-            _cb(100, "Done" if self.config.get("language") == "en" else "Gotowe")
-            return content_data
+            _cb(100, "Done" if en else "Gotowe")
+            return cache_file
 
         except Exception as e:
             raise Exception("M3U load error: %s" % self._friendly_m3u_error(e))
 
+    def load_m3u_url(self, url, progress_callback=None, headers=None, cancel=None):
+        """Like ``fetch_m3u_url`` but returns the playlist bytes (one read of the cache file).
+
+        Prefer ``fetch_m3u_url`` + ``parse_m3u_file`` for large playlists.
+        """
+        path = self.fetch_m3u_url(url, progress_callback=progress_callback, headers=headers, cancel=cancel)
+        with open(path, 'rb') as f:
+            return f.read()
+
     def load_m3u_file(self, file_path):
         """Ładuje M3U z pliku."""
         try:
@@ -342,143 +775,328 @@ class PlaylistLoader:
         except Exception as e:
             raise Exception(f"Błąd odczytu pliku: {e}")
 
-    def parse_m3u_content(self, content, progress_callback=None):
+    def _parse_workers(self):
+        """(liczba procesów, próg rozmiaru w bajtach) dla parsowania wieloprocesowego.
+
+        Domyślnie wyłączone (1 proces); ``parse_workers`` = 0 oznacza liczbę rdzeni.
+        """
+        try:
+            min_size = int(float(self.config.get("parallel_parse_min_mb", 8)) * 1024 * 1024)
+        except Exception:
+            min_size = 8 * 1024 * 1024
+        if not self.config.get("parallel_parse", False):
+            return 1, min_size
+        try:
+            workers = int(self.config.get("parse_workers", 0) or 0)
+        except Exception:
+            workers = 0
+        return (workers if workers > 0 else None), min_size
+
+    def _parse_progress(self, progress_callback, cancel=None):
+        """Hook postępu parsera (done, total, count) albo None."""
+        progress_callback = as_dispatcher(progress_callback)
+        if not progress_callback and cancel is None:
+            return None
+
+        def progress(done, total, count):
+            if cancel is not None:
+                cancel.check()
+            if progress_callback:
+                progress_callback(min(100, (done * 100.0) / (total or 1)), f"Przetwarzanie: {count} kanałów")
+        return progress
+
+    def parse_m3u_content(self, content, progress_callback=None, cancel=None):
         """
         NOWE: Streamingowe parsowanie M3U!
         Przetwarza zawartość w czasie rzeczywistym.
+        Zwraca ChannelTable (kolumnowa lista kanałów).
+        ``cancel`` (CancelToken) przerywa parsowanie po bieżącym bloku linii.
         """
-        channels = []
+        channels = ChannelTable()
         
         try:
-            # Dekodowanie z obsługą błędów
-            try:
-                text = content.decode("utf-8", "ignore")
-            except:
-                text = str(content)
-            
-            # Regexy - skompilowane dla lepszej wydajności
-            extinf_pattern = re.compile(r'#EXTINF:([^,]*),(.*)', re.IGNORECASE)
-            attr_pattern = re.compile(r'([a-zA-Z0-9_-]+)\s*=\s*("[^"]*"|[^,;\s]+)')
-            # Uwaga: group_pattern jest też używany w _parse_extinf().
-            # Przekazujemy go jawnie, żeby uniknąć NameError "group_pattern is not defined".
-            group_pattern = re.compile(r'^\[([^\]]+)\]')
-            adult_pattern = re.compile(r'(xxx|adult|porn|sex|erotic|18\+|mature)', re.IGNORECASE)
-            vod_pattern = re.compile(r'(vod|movie|film|video|series|serial)', re.IGNORECASE)
-            
-            lines = text.splitlines()
-            current_entry = {}
-            total_lines = len(lines)
-            processed = 0
-            
-            for line in lines:
-                processed += 1
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # #EXTINF
-                if line.startswith("#EXTINF"):
-                    current_entry = self._parse_extinf(line, extinf_pattern, attr_pattern, group_pattern)
-                    
-                # #EXTGRP
-                elif line.startswith("#EXTGRP:"):
-                    grp_name = line.split(":", 1)[1].strip()
-                    if grp_name:
-                        current_entry["group"] = grp_name
-                        
-                # URL
-                elif "://" in line and not line.startswith("#"):
-                    url = line.strip()
-                    
-                    if not current_entry:
-                        name = url.split('/')[-1]
-                        name = re.sub(r'\.(ts|m3u8|mp4|mkv)$', '', name, flags=re.IGNORECASE)
-                        current_entry = {"title": name}
-                    
-                    # Określenie grupy
-                    if "group" not in current_entry or not current_entry["group"]:
-                        title_lower = current_entry.get("title", "").lower()
-                        
-                        if adult_pattern.search(title_lower):
-                            current_entry["group"] = "XXX"
-                        elif vod_pattern.search(title_lower):
-                            current_entry["group"] = "VOD"
-                        elif '/movie/' in url.lower() or '/series/' in url.lower():
-                            current_entry["group"] = "VOD"
-                        else:
-                            current_entry["group"] = "Inne"
-                    
-                    # Tworzenie kanału
-                    channel = {
-                        "title": current_entry.get("title", "No Name"),
-                        "url": url,
-                        "group": current_entry.get("group", "Inne"),
-                        "logo": current_entry.get("logo", ""),
-                        "epg_id": current_entry.get("epg_id", "")
-                    }
-                    
-                    channels.append(channel)
-                    current_entry = {}
-                    
-                    # Aktualizuj progress co 100 kanałów
-                    if progress_callback and len(channels) % 100 == 0:
-                        progress = min(100, (processed / total_lines) * 100)
-                        reactor.callFromThread(progress_callback, progress, 
-                                             f"Przetwarzanie: {len(channels)} kanałów")
-            
-            return channels
+            workers, min_size = self._parse_workers()
+            return DEFAULT_ENGINE.parse_parallel(content, workers, min_size=min_size, table=channels,
+                                                 progress=self._parse_progress(progress_callback, cancel))
             
         except Exception as e:
             raise Exception(f"Błąd parsowania M3U: {e}")
 
-    def _parse_extinf(self, line, extinf_pattern, attr_pattern, group_pattern=None):
-        """Parsuje linię EXTINF."""
-        entry = {}
-        
-        # Podział na metadane i tytuł
-        if ',' in line:
-            parts = line.split(',', 1)
-            meta_part = parts[0]
-            entry["title"] = parts[1].strip() if len(parts) > 1 else "No Name"
+    def iter_m3u_chunks(self, chunks, table=None):
+        """Generator: parsuje M3U kawałek po kawałku i oddaje kanały (wiersze ChannelTable) na bieżąco.
+
+        Parser pracuje na bajtach i przetwarza tylko pełne linie - znak UTF-8 rozcięty
+        na granicy chunka nie ginie; w pamięci jest tylko bieżący chunk i niedokończona linia.
+        """
+        return DEFAULT_ENGINE.iter_chunks(chunks, table)
+
+    def _iter_file_chunks(self, path, chunk_size=STREAM_CHUNK_SIZE):
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def iter_m3u_file(self, file_path):
+        """Generator kanałów z pliku M3U czytanego porcjami."""
+        return self.iter_m3u_chunks(self._iter_file_chunks(file_path))
+
+    def parse_m3u_file(self, file_path, progress_callback=None, cancel=None, engine=None):
+        """Parsuje plik M3U do ChannelTable skanerem bajtowym (mmap, bez dekodowania całości).
+
+        ``engine`` - własny M3UEngine (np. z filtrem treści ``accept``), domyślnie DEFAULT_ENGINE.
+        """
+        engine = engine or DEFAULT_ENGINE
+        try:
+            workers, min_size = self._parse_workers()
+            return engine.parse_file(file_path, workers=workers, min_size=min_size,
+                                     progress=self._parse_progress(progress_callback, cancel))
+        except (ValueError, OSError, mmap.error) as e:
+            # mmap niedostępny (np. nietypowy system plików) - czytanie porcjami.
+            self.log.debug("mmap scan failed, falling back to chunked parse: %s", e)
+            return ChannelTable(engine.iter_chunks(self._iter_file_chunks(file_path)))
+
+    def iter_m3u_url(self, url, progress_callback=None, headers=None, cancel=None):
+        """Generator kanałów parsowanych w trakcie pobierania (r.iter_content)."""
+        cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+        with self._download_lock(cache_key, cancel) as fresh:
+            if fresh:
+                table = self.load_cached_channels(cache_key)
+            else:
+                table, filling = self._open_m3u_url(url, progress_callback=progress_callback, headers=headers,
+                                                    cancel=cancel)
+                if filling is not None:
+                    # blokada aż do końca zapisu .part; zamknięcie tego generatora zamyka też
+                    # wypełnianie (los .part rozstrzygany jeszcze pod blokadą)
+                    try:
+                        for row in filling:
+                            yield row
+                    finally:
+                        filling.close()
+                    return
+        for row in table:
+            yield row
+
+    def _open_m3u_url(self, url, progress_callback=None, headers=None, cancel=None):
+        """Przygotowuje źródło kanałów dla URL: zwraca (ChannelTable, generator wypełniający albo None).
+
+        Gdy wystarcza cache (304, błąd sieci przy ważnym cache), tabela jest gotowa.
+        W przeciwnym razie generator parsuje strumień HTTP w trakcie pobierania, dopisuje kanały
+        do tabeli i oddaje je na bieżąco. Pobierane bajty trafiają od razu do ``<cache_key>.m3u.part``,
+        który po udanym pobraniu zastępuje (os.replace) poprzedni cache - przerwany strumień zostawia
+        stary cache nietknięty.
+        """
+        cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+        cache_file = os.path.join(self.cache_dir, f"{cache_key}.m3u")
+        en = self.config.get("language") == "en"
+
+        progress_callback = as_dispatcher(progress_callback)
+
+        def _cb(pct, msg):
+            try:
+                if progress_callback:
+                    progress_callback(pct, msg)
+            except Exception:
+                pass
+
+        def _from_cache():
+            _cb(100, "Loaded from cache" if en else "Ładowanie z cache...")
+            return self.load_cached_channels(cache_key), None
+
+        net_kwargs = self._net_kwargs(cancel)
+        part_file = cache_file + ".part"
+
+        # 1) Ważny cache z walidatorami -> warunkowy GET; 200 od razu służy jako strumień do pobrania.
+        # Bez ETag/Last-Modified nie da się sprawdzić zmian - pełne pobieranie (jak _fetch_m3u_url).
+        r = None
+        meta = self._read_meta(cache_key)
+        cond_headers = {}
+        if self.is_cache_valid(cache_file, max_age=int(self.config.get("cache_max_age", 3600))):
+            if meta.get("etag"):
+                cond_headers["If-None-Match"] = meta.get("etag")
+            if meta.get("last_modified"):
+                cond_headers["If-Modified-Since"] = meta.get("last_modified")
+        if cond_headers:
+            try:
+                _cb(5, "Checking updates..." if en else "Sprawdzanie zmian...")
+                r = http_get(url, headers=dict((headers or {}), **cond_headers),
+                             **dict(net_kwargs, deadline=self.net_deadline_check))
+                if getattr(r, "status_code", 200) == 304:
+                    try:
+                        r.close()
+                    except Exception:
+                        pass
+                    return _from_cache()
+            except Exception as e:
+                self.log.debug("Conditional GET failed, using cache: %s", mask_sensitive(e))
+                return _from_cache()
+
+        # 2) Pełne pobieranie strumieniowe
+        self.cache.miss()
+        offset = 0
+        if r is None:
+            _cb(1, "Downloading..." if en else "Pobieranie...")
+            try:
+                # 3) Wznowienie przerwanego pobierania (Range/If-Range od końca .part).
+                r, offset = self._open_resumed(url, headers, part_file, cancel)
+                if r is None:
+                    r = http_get(url, headers=headers, **net_kwargs)
+            except Exception as e:
+                if os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
+                    self.log.warning("M3U download failed, using stale cache: %s", mask_sensitive(e))
+                    return _from_cache()
+                raise Exception(self._friendly_m3u_error(e))
         else:
-            meta_part = line
-            entry["title"] = "No Name"
-
-        # Szukanie atrybutów
-        attrs = attr_pattern.findall(meta_part)
-        for key, val in attrs:
-            clean_val = val.replace('"', '').strip()
-            key_lower = key.lower()
-            
-            if key_lower in ["group-title", "group", "category", "cat"]:
-                entry["group"] = clean_val
-            elif key_lower in ["tvg-logo", "logo"]:
-                entry["logo"] = clean_val
-            elif key_lower in ["tvg-id", "epg-id", "id"]:
-                entry["epg_id"] = clean_val
-        
-        # Jeśli brak grupy, szukaj w tytule
-        if "group" not in entry and group_pattern is not None:
+            # Pełna odpowiedź 200 z warunkowego GET - stary .part jest nieaktualny.
+            self._drop_part(part_file)
+
+        table = ChannelTable()
+        return table, self._fill_from_response(r, table, url, cache_key, cache_file, _cb, en,
+                                               headers=headers, offset=offset, cancel=cancel)
+
+    def _fill_from_response(self, r, table, url, cache_key, cache_file, _cb, en, headers=None, offset=0,
+                            cancel=None):
+        """Parsuje strumień do ``table`` i zapisuje go do ``.part`` (od ``offset`` przy wznowieniu).
+
+        Zerwane połączenie jest wznawiane zapytaniem Range; gdy serwer odda w tym czasie
+        inną wersję playlisty, tabela jest budowana od nowa (kanały oddawane są ponownie).
+        Nieudane pobranie po błędzie sieci, anulowaniu albo zamknięciu generatora zostawia
+        ``.part`` na następną próbę; odpowiedź HTTP jest zamykana w każdym przypadku.
+        """
+        part_file = cache_file + ".part"
+        state = {"downloaded": 0, "total": 0, "cancel": cancel, "response": r}
+
+        def _chunks(resp, start):
+            # Pierwsze ~4 KB sprawdzamy pod kątem HTML/strony logowania zanim ruszy parser
+            # (przy wznowieniu początek pliku był już sprawdzony w poprzedniej próbie).
+            head = b""
+            sniffed = start > 0
+            download = self._iter_download(resp, url, headers, part_file, state, start)
             try:
-                group_match = group_pattern.match(entry.get("title", ""))
-                if group_match:
-                    entry["group"] = group_match.group(1).strip()
+                for chunk in download:
+                    if not sniffed:
+                        head += chunk
+                        if len(head) < 4096:
+                            continue
+                        sniffed = True
+                        if self._looks_like_wrong_m3u_response(head):
+                            raise Exception(_WRONG_M3U_MSG)
+                        chunk, head = head, b""
+                    yield chunk
+            finally:
+                # zamyka .part (flush) zanim zapadnie decyzja o jego losie
+                download.close()
+            if not sniffed and head:
+                if self._looks_like_wrong_m3u_response(head):
+                    raise Exception(_WRONG_M3U_MSG)
+                yield head
+
+        chunks = None
+        try:
+            last_mb = -1
+            while True:
+                try:
+                    chunks = _chunks(r, offset)
+                    for row in self.iter_m3u_chunks(chunks, table):
+                        yield row
+                        count = len(table)
+                        if count % 500 == 0:
+                            mb = state["downloaded"] / 1024.0 / 1024.0
+                            if state["total"] > 0:
+                                pct = min(99, (state["downloaded"] / float(state["total"])) * 100.0)
+                            elif int(mb * 2) != last_mb:
+                                last_mb = int(mb * 2)
+                                pct = 20
+                            else:
+                                continue
+                            _cb(pct, ("Downloaded: %.1f MB, channels: %d" if en else "Pobrano: %.1f MB, kanałów: %d") % (mb, count))
+                    break
+                except _RestartDownload as restart:
+                    r, offset = restart.response, 0
+                    table.clear()
+            os.replace(part_file, cache_file)
+            self._drop_part(part_file)
+            self.cache.record(cache_file)
+        except BaseException as e:
+            if chunks is not None:
+                chunks.close()
+            self._keep_part(part_file, e)
+            raise
+        finally:
+            try:
+                (state.get("response") or r).close()
             except Exception:
                 pass
-        
-        return entry
 
-    def load_with_progress(self, url, progress_callback):
+        meta = {
+            "url": url,
+            "saved_at": time.time(),
+            "size": state["downloaded"],
+            "etag": r.headers.get("ETag", ""),
+            "last_modified": r.headers.get("Last-Modified", ""),
+        }
+        self._write_meta(cache_key, meta)
+        self.save_parsed_cache(cache_key, table, meta)
+        _cb(100, "Done" if en else "Gotowe")
+
+    def load_playlist_url(self, url, progress_callback=None, headers=None, cancel=None):
+        """Pobiera i parsuje playlistę jednocześnie, zwraca ChannelTable.
+
+        Przy zerwanym strumieniu lub odpowiedzi HTML wraca do starego cache (jeśli istnieje).
+        ``cancel`` (CancelToken) przerywa pobieranie po bieżącym chunku (tools.cancel.Cancelled).
+        Równoległe wywołania dla tego samego URL i nagłówków dzielą jedno pobieranie; każdy
+        dołączający dostaje własną kopię tabeli.
+        """
+        cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+        table, shared = _FLIGHTS.do(
+            ("table", cache_key),
+            lambda progress: self._governed(self._load_playlist_url, url, progress, headers=headers, cancel=cancel),
+            progress=progress_callback, cancel=cancel)
+        if shared:
+            copy = ChannelTable()
+            copy.extend_table(table)
+            return copy
+        return table
+
+    def _load_playlist_url(self, url, progress_callback=None, headers=None, cancel=None):
+        progress_callback = as_dispatcher(progress_callback)
+        try:
+            cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+            with self._download_lock(cache_key, cancel) as fresh:
+                if fresh:
+                    # fetch_m3u_url tego samego URL właśnie pobrał playlistę
+                    return self.load_cached_channels(cache_key)
+                table, filling = self._open_m3u_url(url, progress_callback=progress_callback, headers=headers,
+                                                    cancel=cancel)
+                if filling is not None:
+                    for _row in filling:
+                        pass
+                return table
+        except Exception as e:
+            cache_key = self.get_cache_key(self._cache_key_input(url, headers=headers))
+            cache_file = os.path.join(self.cache_dir, f"{cache_key}.m3u")
+            if os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
+                self.log.warning("M3U stream failed, using stale cache: %s", mask_sensitive(e))
+                try:
+                    if progress_callback:
+                        progress_callback.final(100, "Loaded from cache" if self.config.get("language") == "en" else "Ładowanie z cache...")
+                except Exception:
+                    pass
+                return self.load_cached_channels(cache_key)
+            raise Exception("M3U load error: %s" % self._friendly_m3u_error(e))
+
+    def load_with_progress(self, url, progress_callback, cancel=None):
         """
         Główna funkcja ładująca z progress barem.
         Zwraca listę kanałów.
         """
         try:
-            # 1. Załaduj zawartość
-            content = self.load_m3u_url(url, progress_callback)
+            # 1. Pobierz do pliku cache (bez kopii playlisty w pamięci)
+            path = self.fetch_m3u_url(url, progress_callback, cancel=cancel)
             
-            # 2. Parsuj z progress barem
-            channels = self.parse_m3u_content(content, progress_callback)
+            # 2. Parsuj z progress barem (mmap pliku)
+            channels = self.parse_m3u_file(path, progress_callback, cancel=cancel)
             
             return channels
             
@@ -501,24 +1119,22 @@ class PlaylistLoader:
             return {"url": url, "status_code": 0, "error": "Nieznany"}
 
     def cleanup_cache(self, max_age=86400):
-        """Czyści przeterminowane pliki cache."""
-        try:
-            if os.path.exists(self.cache_dir):
-                for filename in os.listdir(self.cache_dir):
-                    filepath = os.path.join(self.cache_dir, filename)
-                    if os.path.isfile(filepath):
-                        file_age = time.time() - os.path.getmtime(filepath)
-                        if file_age > max_age:
-                            os.remove(filepath)
+        """Czyści cache: wpisy nieużywane dłużej niż max_age, potem nadmiar ponad budżet (LRU)."""
+        try:
+            self.cache.rescan()
+            self.cache.cleanup(max_age, roots=(self.cache_dir,))
+            self.cache.enforce()
         except:
             pass
 
     def get_performance_stats(self):
         """Zwraca statystyki wydajności."""
-        cache_files = len([f for f in os.listdir(self.cache_dir) if os.path.isfile(os.path.join(self.cache_dir, f))])
+        stats = self.cache.stats()
         
         return {
-            "Cache size": f"{cache_files} plików",
+            "Cache size": f"{stats['files']} plików, {stats['bytes'] / 1024.0 / 1024.0:.1f} / {stats['budget'] / 1024.0 / 1024.0:.0f} MB",
+            "Cache hits": f"{stats['hits']} / {stats['hits'] + stats['misses']} ({stats['hit_rate'] * 100:.0f}%)",
+            "Cache evictions": f"{stats['evictions']} ({stats['evicted_bytes'] / 1024.0 / 1024.0:.1f} MB)",
             "Cache directory": self.cache_dir,
             "Session active": "Tak" if self.session else "Nie",
             "Last cleanup": "Automatyczna"
@@ -531,26 +1147,20 @@ class PlaylistCache:
     def __init__(self, cache_dir):
         self.cache_dir = cache_dir
         self.cache_index = os.path.join(cache_dir, "index.json")
+        # Wpisy playlist żyją w indeksie menadżera cache (ten sam index.json).
+        if os.path.abspath(cache_dir) == CACHE_DIR:
+            self.manager = get_cache_manager()
+        else:
+            self.manager = CacheManager(roots=(cache_dir,), index_file=self.cache_index)
         self.load_index()
     
     def load_index(self):
         """Wczytuje indeks cache."""
-        try:
-            if os.path.exists(self.cache_index):
-                with open(self.cache_index, 'r') as f:
-                    self.index = json.load(f)
-            else:
-                self.index = {}
-        except:
-            self.index = {}
+        self.index = self.manager.playlists
     
     def save_index(self):
         """Zapisuje indeks cache."""
-        try:
-            with open(self.cache_index, 'w') as f:
-                json.dump(self.index, f, indent=2)
-        except:
-            pass
+        self.manager.flush()
     
     def add_to_cache(self, url, metadata):
         """Dodaje wpis do cache."""
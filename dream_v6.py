@@ -43,8 +43,10 @@ except Exception:
 from .file_pick import M3UFilePick
 from .export_v2 import export_bouquets
 from .tools.lang import _, SUPPORTED_LANGS, LANGUAGE_NAMES, normalize_lang
-from .tools.net import http_get
 from .tools.logger import get_logger, mask_sensitive
+from .tools.progress import ProgressDispatcher
+from .tools.cancel import CancelToken, Cancelled
+from .tools.governor import get_governor
 from .tools.bouquet_picker import BouquetPicker
 from .tools.webif import start_web_server, stop_web_server
 from .tools.updater import check_update, do_update
@@ -54,12 +56,21 @@ from .tools.statistics import StatisticsManager
 from .tools.history import HistoryManager
 from .tools.mac_portal import load_mac_json, save_mac_json, add_mac_portal, clear_mac_backups
 from .tools.mac_portal import _parse_json_flexible as parse_json_flexible_mac
-from .tools.mac_portal import parse_mac_playlist
+from .tools.mac_portal import parse_mac_playlist, resolve_pending as resolve_mac_links
 from .tools.picon_manager_v6 import PiconManager
 from .tools.epg_manager_v6 import EPGManager
 from .tools.xtream_one_window_fixed import XtreamWindow  # alias w pliku
-
-from .core.playlist_loader import PlaylistLoader
+from .tools.xtream_api import XtreamClient, stored_categories, categories_from_stored
+from .tools.xtream_api import load_categories as load_xtream_categories, load_streams as load_xtream_streams
+from .tools.xtream_category_picker import XtreamCategoryPicker
+from .tools.vod_meta import get_vod_meta, meta_ref
+
+from .core.playlist_loader import PlaylistLoader, split_url_options
+from .core.channel_table import ChannelTable
+from .core.m3u_engine import M3UEngine
+from .core.classifier import CLASSIFIER
+from .core.playlist_diff import diff_playlists
+from .core.multi_source import MultiSourceLoader
 
 def _read_version():
     try:
@@ -114,6 +125,9 @@ def run_in_thread(fn, cb, *args, **kwargs):
         try:
             res = fn(*args, **kwargs)
             reactor.callFromThread(cb, res, None)
+        except Cancelled:
+            # przerwane przez użytkownika/timeout - GUI zostało już przywrócone
+            pass
         except Exception as e:
             reactor.callFromThread(cb, None, str(e))
 
@@ -255,6 +269,25 @@ class IPTVDreamV6(Screen):
         self.cfg.setdefault('net_timeout_read', 30)
         self.cfg.setdefault('net_retries', 2)
         self.cfg.setdefault('net_backoff', 0.8)
+        self.cfg.setdefault('net_deadline', 120)
+        self.cfg.setdefault('net_deadline_check', 15)
+        self.cfg.setdefault('net_max_kbps', 0)
+        self.cfg.setdefault('net_max_connections', 16)
+        self.cfg.setdefault('net_max_per_host', 4)
+        self.cfg.setdefault('net_background_share', 0.25)
+        self.cfg.setdefault('net_playing_kbps', 2048)
+        self.cfg.setdefault('xtream_max_workers', 4)
+        self.cfg.setdefault('vod_meta_ttl', 7 * 86400)
+        self.cfg.setdefault('vod_meta_prefetch', 3)
+        # wspólne limity pasma/połączeń; pobierania w tle zwalniają, gdy gra strumień IPTV
+        try:
+            get_governor().configure(self.cfg)
+            get_governor().watch_playback()
+        except Exception:
+            pass
+        # opisy VOD/seriali pobierane dopiero po podświetleniu pozycji
+        self.vod_meta = get_vod_meta()
+        self.vod_meta.configure(self.cfg)
 
         # Prefer language from plugin config; AUTO follows Enigma2 system language.
         try:
@@ -288,6 +321,16 @@ class IPTVDreamV6(Screen):
         self.last_source = self.cfg.get('last_source')
         self.current_playlist = None
         self.playlist_name = ''
+        # postęp z wątków roboczych: najwyżej ~10 odświeżeń paska na sekundę, ostatnia wartość zawsze dochodzi
+        self.progress = ProgressDispatcher(self.updateProgress)
+        # przerwanie bieżącej operacji (EXIT / timeout); nowy token przy każdym startLoading
+        self.cancel_token = CancelToken()
+        # diff przy odświeżaniu: źródło bieżącej playlisty, jej numer i wynik ostatniego porównania
+        self._current_source = None
+        self._refresh_base = None
+        self._playlist_gen = 0
+        self.last_diff = None
+        self._picon_sync = None
         self.menu_context = 'main'
 
         # menadżery v6
@@ -448,6 +491,12 @@ class IPTVDreamV6(Screen):
             except Exception:
                 self.webif_enabled = False
 
+        # podświetlenie pozycji w liście grupy -> opis VOD/serialu
+        try:
+            self["menu_list"].onSelectionChanged.append(self.onMenuFocus)
+        except Exception:
+            pass
+
         # stan początkowy
         try:
             self["progress_bar"].hide()
@@ -462,6 +511,8 @@ class IPTVDreamV6(Screen):
         """EXIT: powrót albo zamknięcie."""
         try:
             if getattr(self, "is_loading", False):
+                # zatrzymuje też wątek roboczy (pobieranie, portal MAC, picony) i zamyka jego połączenia
+                self.cancel_token.cancel("user")
                 self.stopLoading()
                 self["status_bar"].setText(_("Przerwano.", self.lang))
                 return
@@ -607,6 +658,7 @@ class IPTVDreamV6(Screen):
         log_lbl = _("show_log_label", self.lang)
         logc_lbl = _("clear_log_label", self.lang)
         delbq_lbl = _("delete_bouquets_label", self.lang)
+        multi_sources = self.cfg.get("multi_sources") or []
 
         items = [
             (lang_lbl, "lang"),
@@ -618,6 +670,9 @@ class IPTVDreamV6(Screen):
             (cache_lbl, "clear_cache"),
             (hist_lbl, "clear_history"),
             (delbq_lbl, "delete_bouquets"),
+            (_("multi_load_label", self.lang) % len(multi_sources), "multi_load"),
+            (_("multi_add_label", self.lang), "multi_add"),
+            (_("multi_clear_label", self.lang), "multi_clear"),
             (back_lbl, "back_main"),
         ]
         self["menu_list"].setList(items)
@@ -722,6 +777,12 @@ class IPTVDreamV6(Screen):
                 ch = action[1]
                 self.updateInfoPanel(_("Ulubione", self.lang), _("Kanał: %s\nURL: %s", self.lang) % (ch.get("title", ""), ch.get("url", "")))
                 return
+            if action[0] == "pl_group":
+                return self.showPlaylistGroupItems(action[1])
+            if action[0] == "pl_groups_back":
+                return self.showPlaylistGroups()
+            if action[0] == "pl_item":
+                return self.onMenuFocus()
 
         # string actions
         if action == "m3u_url":
@@ -797,6 +858,16 @@ class IPTVDreamV6(Screen):
                 self.session.open(MessageBox, 'Log error: %s' % e, MessageBox.TYPE_ERROR)
             return self.showManagementMenu()
 
+        if action == "multi_load":
+            return self.loadMultiSources()
+        if action == "multi_add":
+            return self.addLastSourceToSet()
+        if action == "multi_clear":
+            self.cfg["multi_sources"] = []
+            self._save_cfg()
+            self.session.open(MessageBox, _("multi_cleared", self.lang), MessageBox.TYPE_INFO, timeout=2)
+            return self.showManagementMenu()
+
         if action == "clear_cache":
             return self.clearCache()
         if action == "clear_history":
@@ -807,6 +878,8 @@ class IPTVDreamV6(Screen):
             return self.showMainMenu()
         if action == "back_fav_groups":
             return self.showFavorites()
+        if action == "back_playlist":
+            return self.showPlaylistMenu()
 
         # playlist menu
         if action == "preview":
@@ -825,6 +898,8 @@ class IPTVDreamV6(Screen):
     # ---------- operacje ładowania ----------
 
     def startLoading(self, message, timeout_ms=None):
+        self.progress.reset()
+        self.cancel_token = CancelToken()
         self.is_loading = True
         self.load_start_time = time.time()
         self["status_bar"].setText(message)
@@ -865,6 +940,7 @@ class IPTVDreamV6(Screen):
 
     def onLoadingTimeout(self):
         if self.is_loading:
+            self.cancel_token.cancel("timeout")
             self.stopLoading()
             self["status_bar"].setText(_("Przekroczono czas ładowania (timeout).", self.lang))
 
@@ -881,31 +957,7 @@ class IPTVDreamV6(Screen):
 
         # Accept formats like: URL|User-Agent=...&Referer=...
         raw_input = url
-        headers = {}
-        try:
-            if '|' in url:
-                url, opt = url.split('|', 1)
-                url = url.strip()
-                opt = opt.strip()
-                for kv in re.split(r"[&;]", opt):
-                    if '=' not in kv:
-                        continue
-                    k, v = kv.split('=', 1)
-                    k = (k or '').strip().lower()
-                    v = (v or '').strip()
-                    if not v:
-                        continue
-                    if k in ('user-agent', 'useragent', 'ua'):
-                        headers['User-Agent'] = v
-                    elif k in ('referer', 'ref'):
-                        headers['Referer'] = v
-                    elif k == 'origin':
-                        headers['Origin'] = v
-        except Exception:
-            headers = {}
-
-        if not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
+        url, headers = split_url_options(raw_input)
 
         self._m3u_url_headers = headers
         # Store the raw input so refresh keeps any |options
@@ -917,12 +969,12 @@ class IPTVDreamV6(Screen):
         self._save_cfg()
 
         self.startLoading(_("Pobieranie playlisty (URL) ...", self.lang))
+        cancel = self.cancel_token
 
         def _load():
-            # PlaylistLoader ma cache i parsowanie
-            content = self.loader.load_m3u_url(url, progress_callback=self.updateProgress, headers=getattr(self, "_m3u_url_headers", None))
-            playlist = self.loader.parse_m3u_content(content, progress_callback=self.updateProgress)
-            return playlist
+            # PlaylistLoader ma cache; parsowanie idzie równolegle z pobieraniem (strumieniowo)
+            return self.loader.load_playlist_url(url, progress_callback=self.progress, headers=getattr(self, "_m3u_url_headers", None),
+                                                 cancel=cancel)
 
         run_in_thread(_load, lambda res, err: self.onPlaylistLoaded(res, "M3U-URL", err))
 
@@ -939,11 +991,10 @@ class IPTVDreamV6(Screen):
         self._save_cfg()
 
         self.startLoading(_("Wczytywanie pliku M3U ...", self.lang))
+        cancel = self.cancel_token
 
         def _load():
-            content = self.loader.load_m3u_file(path)
-            playlist = self.loader.parse_m3u_content(content, progress_callback=self.updateProgress)
-            return playlist
+            return self.loader.parse_m3u_file(path, self.progress, cancel=cancel)
 
         name = os.path.splitext(os.path.basename(path))[0]
         run_in_thread(_load, lambda res, err: self.onPlaylistLoaded(res, name, err))
@@ -960,6 +1011,7 @@ class IPTVDreamV6(Screen):
         options = [
             ("LIVE", "live"),
             ("VOD", "vod"),
+            ("SERIES", "series"),
             ("ALL", "all"),
             ("ADULT", "adult"),
         ]
@@ -969,21 +1021,94 @@ class IPTVDreamV6(Screen):
         if not choice:
             return
         content_type = choice[1]
+        if choice[0] == "REFRESH":
+            src = (self.last_source or {}).get("value") or {}
+            cats = categories_from_stored(src.get("categories"))
+            if cats:
+                return self._loadXtreamStreams(content_type, cats)
+            return self._loadXtreamDump(content_type)
+        if content_type == "all":
+            # całe konto jednym zapytaniem - szybciej niż setki list kategorii
+            return self._loadXtreamDump(content_type)
+        self._loadXtreamCategories(content_type)
+
+    def _xtreamClient(self, cancel):
+        host, user, pwd = self.xtream_data
+        return XtreamClient.from_config(host, user, pwd, self.cfg, cancel=cancel)
+
+    def _loadXtreamCategories(self, content_type):
+        """player_api: najpierw lista kategorii, potem tylko zaznaczone (bez zrzutu całego konta)."""
+        self.startLoading(_("xtream_cat_loading", self.lang))
+        client = self._xtreamClient(self.cancel_token)
+
+        def _done(cats, err):
+            self.stopLoading()
+            if err or not cats:
+                # panel bez player_api (albo pusta lista) - stara ścieżka przez get.php
+                self.log.warning("Xtream player_api categories failed (%s), using get.php", mask_sensitive(err or "empty"))
+                return self._loadXtreamDump(content_type)
+            prev = []
+            src = self.cfg.get("last_source") or {}
+            if src.get("type") == "xtream" and (src.get("value") or {}).get("user") == self.xtream_data[1]:
+                prev = (src.get("value") or {}).get("categories") or []
+            self.session.openWithCallback(lambda picked: self.onXtreamCategoriesPicked(content_type, picked),
+                                          XtreamCategoryPicker, cats, prev, self.lang)
+
+        run_in_thread(load_xtream_categories, _done, client, content_type)
+
+    def onXtreamCategoriesPicked(self, content_type, picked):
+        if picked is None:
+            return
+        if not picked:
+            self.session.open(MessageBox, _("xtream_cat_none", self.lang), MessageBox.TYPE_INFO)
+            return
+        self._loadXtreamStreams(content_type, picked)
+
+    def _loadXtreamStreams(self, content_type, cats):
         host, user, pwd = self.xtream_data
         self.startLoading(_("Pobieranie Xtream ...", self.lang))
+        cancel = self.cancel_token
+        client = self._xtreamClient(cancel)
+        workers = int(self.cfg.get("xtream_max_workers", 4) or 4)
+
+        def _dl():
+            # tabela kolumnowa budowana jeszcze w wątku roboczym
+            return ChannelTable.from_channels(
+                load_xtream_streams(client, cats, progress_callback=self.progress, cancel=cancel, max_workers=workers))
+
+        def _done(playlist, err):
+            if err:
+                self.onPlaylistLoaded(None, None, err)
+                return
+            suffix = "LIVE" if content_type == "live" else "VOD" if content_type == "vod" else "SERIES" if content_type == "series" else "ADULT" if content_type == "adult" else "ALL"
+            self.last_source = {"type": "xtream", "value": {"host": host, "user": user, "pass": pwd, "filter": content_type,
+                                                            "categories": stored_categories(cats)}}
+            self.cfg["last_source"] = self.last_source
+            self._save_cfg()
+            self.onPlaylistLoaded(playlist, "Xtream-%s-%s" % (user, suffix), None)
+
+        run_in_thread(_dl, _done)
+
+    def _loadXtreamDump(self, content_type):
+        """Całe konto z get.php (m3u_plus), filtrowane klasyfikatorem."""
+        host, user, pwd = self.xtream_data
+        self.startLoading(_("Pobieranie Xtream ...", self.lang))
+        cancel = self.cancel_token
 
         def _dl():
             base = host if host.startswith("http") else "http://%s" % host
             url = "%s/get.php?username=%s&password=%s&type=m3u_plus&output=ts" % (base, user, pwd)
-            r = http_get(url, timeout=(int(self.cfg.get('net_timeout_connect',7)), int(self.cfg.get('net_timeout_read',30))), retries=int(self.cfg.get('net_retries',2)), backoff=float(self.cfg.get('net_backoff',0.8)), verify=bool(self.cfg.get('ssl_verify', False)), debug=bool(self.cfg.get('debug', False)), log_file=self.cfg.get('log_file','/tmp/iptvdream.log'))
-            return r.content
+            # Pobieranie strumieniem do pliku cache i parsowanie z filtrem - całość w wątku roboczym,
+            # reactor dostaje gotową ChannelTable (żadnej pracy O(n) na wątku GUI).
+            path = self.loader.fetch_m3u_url(url, progress_callback=self.progress, cancel=cancel)
+            flt = "vod" if content_type == "series" else content_type
+            return self.loader.parse_m3u_file(path, self.progress, cancel=cancel, engine=xtream_m3u_engine(flt))
 
-        def _done(data, err):
+        def _done(playlist, err):
             if err:
                 self.onPlaylistLoaded(None, None, err)
                 return
-            playlist = parse_m3u_bytes_improved(data, content_filter=content_type)
-            suffix = "LIVE" if content_type == "live" else "VOD" if content_type == "vod" else "ADULT" if content_type == "adult" else "ALL"
+            suffix = "LIVE" if content_type == "live" else "VOD" if content_type == "vod" else "SERIES" if content_type == "series" else "ADULT" if content_type == "adult" else "ALL"
             self.last_source = {"type": "xtream", "value": {"host": host, "user": user, "pass": pwd, "filter": content_type}}
             self.cfg["last_source"] = self.last_source
             self._save_cfg()
@@ -991,6 +1116,45 @@ class IPTVDreamV6(Screen):
 
         run_in_thread(_dl, _done)
 
+    # ---------- zestaw źródeł (M3U + Xtream + MAC naraz) ----------
+
+    def addLastSourceToSet(self):
+        src = self.cfg.get("last_source")
+        if not src or src.get("type") == "multi":
+            self.session.open(MessageBox, _("Brak ostatniego źródła.", self.lang), MessageBox.TYPE_INFO)
+            return
+        sources = list(self.cfg.get("multi_sources") or [])
+        if src not in sources:
+            sources.append(src)
+        self.cfg["multi_sources"] = sources
+        self._save_cfg()
+        self.session.open(MessageBox, _("multi_added", self.lang) % len(sources), MessageBox.TYPE_INFO, timeout=2)
+        return self.showManagementMenu()
+
+    def loadMultiSources(self, sources=None):
+        sources = list(sources or self.cfg.get("multi_sources") or [])
+        if not sources:
+            self.session.open(MessageBox, _("multi_empty", self.lang), MessageBox.TYPE_INFO)
+            return
+        self.last_source = {"type": "multi", "value": sources}
+        self.cfg["last_source"] = self.last_source
+        self._save_cfg()
+        big_mac = any(s.get("type") == "mac" and (s.get("value") or {}).get("filter") in ("vod", "series") for s in sources)
+        self.startLoading(_("multi_loading", self.lang) % len(sources), timeout_ms=MAC_VODSERIES_TIMEOUT_MS if big_mac else None)
+
+        cancel = self.cancel_token
+
+        def _load():
+            # źródła równolegle (limit połączeń na host), duplikaty między źródłami usuwane
+            multi = MultiSourceLoader(self.loader)
+            table = multi.load(sources, progress_callback=self.progress, cancel=cancel)
+            for r in multi.last_report:
+                if r.get("error"):
+                    self.log.warning("Multi-source: %s: %s", r.get("source"), r.get("error"))
+            return table
+
+        run_in_thread(_load, lambda res, err: self.onPlaylistLoaded(res, "Multi-%d" % len(sources), err))
+
     # ---------- MAC Portal ----------
 
     def openMacMenu(self):
@@ -1067,12 +1231,14 @@ class IPTVDreamV6(Screen):
         if content_type in ("vod","series"):
             msg = (_("Pobieranie z MAC Portal ...", self.lang) + _("mac_large_library", self.lang))
         self.startLoading(msg, timeout_ms=tmo)
+        cancel = self.cancel_token
 
         def _load():
             # tools/mac_portal.py w repozytorium przyjmuje (host, mac) bez progress_callback.
             # Progress pokazujemy na poziomie GUI (start/stop + status), a parsowanie nie blokuje GUI.
-            playlist = parse_mac_playlist(host, mac, content_type=content_type, progress_callback=self.updateProgress)
-            return playlist
+            playlist = parse_mac_playlist(host, mac, content_type=content_type, progress_callback=self.progress,
+                                          cancel=cancel)
+            return ChannelTable.from_channels(playlist or [])
 
         self.last_source = {"type": "mac", "value": {"host": host, "mac": mac, "filter": content_type}}
         self.cfg["last_source"] = self.last_source
@@ -1166,6 +1332,7 @@ class IPTVDreamV6(Screen):
 
     def onPlaylistLoaded(self, playlist, name, error):
         self.stopLoading()
+        base, self._refresh_base = self._refresh_base, None
 
         if error:
             self["status_bar"].setText(_("Błąd: %s", self.lang) % error)
@@ -1179,8 +1346,17 @@ class IPTVDreamV6(Screen):
         load_time = time.time() - self.load_start_time if self.load_start_time else 0
         speed = (len(playlist) / load_time) if load_time > 0 else 0
 
+        # Kolumnowe przechowywanie (MAC/Xtream zwracają listy słowników) - mniej RAM przy dużych VOD.
+        # Wątki robocze oddają już ChannelTable; tu tylko zabezpieczenie dla innych wywołań.
+        try:
+            playlist = ChannelTable.from_channels(playlist)
+        except Exception:
+            pass
         self.current_playlist = playlist
         self.playlist_name = name or "Playlist"
+        self._current_source = self.last_source
+        self._playlist_gen += 1
+        self.last_diff = None
 
         self["status_bar"].setText(_("Załadowano %d kanałów w %.1fs (%.0f kan/s)", self.lang) % (len(playlist), load_time, speed))
 
@@ -1203,6 +1379,24 @@ class IPTVDreamV6(Screen):
 
         self.showPlaylistMenu()
 
+        if base is not None:
+            # porównanie w wątku - przy dużych playlistach nie blokuje GUI
+            old_playlist, base_gen = base
+            gen = self._playlist_gen
+            run_in_thread(diff_playlists, lambda res, err: self.onPlaylistDiff(res, err, gen, title, body),
+                          old_playlist, playlist, base_gen=base_gen)
+
+    def onPlaylistDiff(self, diff, error, gen, title, body):
+        if error or diff is None:
+            self.log.warning("Playlist diff failed: %s", error)
+            return
+        if gen != self._playlist_gen:
+            # w międzyczasie wczytano inną playlistę
+            return
+        self.last_diff = diff
+        self.log.info("Playlist refresh diff: %r", diff)
+        self.updateInfoPanel(title, body + "\n\n" + diff.summary_text(self.lang))
+
     def showPlaylistPreview(self):
         if not self.current_playlist:
             return
@@ -1241,6 +1435,58 @@ class IPTVDreamV6(Screen):
         self["menu_list"].setList(items)
         self["status_bar"].setText(group_name)
 
+    def onMenuFocus(self):
+        """Informacje o podświetlonej pozycji grupy; opis VOD/serialu pobierany dopiero teraz."""
+        if getattr(self, "menu_context", "") != "playlist_group_items":
+            return
+        try:
+            lst = self["menu_list"].list
+            idx = self["menu_list"].getSelectedIndex()
+            action = lst[idx][1]
+        except Exception:
+            return
+        if not (isinstance(action, tuple) and action[0] == "pl_item"):
+            return
+        ch = action[1]
+        self._focused_item = ch
+        if meta_ref(ch) is None:
+            self.updateInfoPanel(ch.get("title", ""), _("Kanał: %s\nURL: %s", self.lang) % (ch.get("title", ""), ch.get("url", "")))
+            return
+        meta = self.vod_meta.cached(ch)
+        if meta is not None:
+            return self._showVodMeta(ch, meta)
+        self.updateInfoPanel(ch.get("title", ""), _("vod_meta_loading", self.lang))
+        # sąsiedzi podświetlonej pozycji w tle - przewijanie listy nie czeka na sieć
+        n = self.vod_meta.prefetch
+        neighbours = []
+        for i in list(range(idx + 1, idx + 1 + n)) + list(range(idx - 1, idx - 1 - n, -1)):
+            if 0 <= i < len(lst) and isinstance(lst[i][1], tuple) and lst[i][1][0] == "pl_item":
+                neighbours.append(lst[i][1][1])
+        self.vod_meta.request(ch, self.onVodMeta, neighbours)
+
+    def onVodMeta(self, ch, meta, err):
+        if ch is not getattr(self, "_focused_item", None) or self.menu_context != "playlist_group_items":
+            return
+        if err is not None or meta is None:
+            self.updateInfoPanel(ch.get("title", ""), _("vod_meta_none", self.lang))
+            return
+        self._showVodMeta(ch, meta)
+
+    def _showVodMeta(self, ch, meta):
+        lines = []
+        for key, label in (("year", "vod_meta_year"), ("genre", "vod_meta_genre"), ("duration", "vod_meta_duration"),
+                           ("rating", "vod_meta_rating"), ("director", "vod_meta_director"), ("cast", "vod_meta_cast")):
+            if meta.get(key):
+                lines.append("%s: %s" % (_(label, self.lang), meta[key]))
+        episodes = meta.get("episodes") or []
+        if episodes:
+            seasons = len(set(e.get("season") for e in episodes))
+            lines.append(_("vod_meta_episodes", self.lang) % (len(episodes), seasons))
+        if meta.get("plot"):
+            lines.append("")
+            lines.append(meta["plot"])
+        self.updateInfoPanel(meta.get("title") or ch.get("title", ""), "\n".join(lines) or _("vod_meta_none", self.lang))
+
     def addPlaylistToFavorites(self):
         if not self.current_playlist:
             return
@@ -1345,11 +1591,19 @@ class IPTVDreamV6(Screen):
 
         def _start_download():
             # istniejąca logika pobierania (w wątku)
+            cancel = self.cancel_token
+
             def _work():
                 """Pobiera pikony szybciej (wielowątkowo) i aktualizuje progress."""
                 items = []
                 seen = set()
-                for ch in (self.current_playlist or []):
+                channels = self.current_playlist or []
+                # Po odświeżeniu tego samego źródła wystarczą kanały dodane / ze zmienionym logo lub nazwą,
+                # jeśli poprzednia playlista miała już pobrane picony do tego katalogu.
+                diff = self.last_diff
+                if diff is not None and self._picon_sync == (self.picons.picon_dir, diff.base_gen):
+                    channels = diff.changed_channels(("title", "logo"))
+                for ch in channels:
                     title = (ch.get("title") or ch.get("name") or "").strip()
                     purl = (ch.get("tvg-logo") or ch.get("tvg_logo") or ch.get("logo") or "").strip()
                     if title and purl:
@@ -1377,6 +1631,8 @@ class IPTVDreamV6(Screen):
 
                 def _one(purl_title):
                     purl, title = purl_title
+                    if cancel.cancelled:
+                        return False
                     try:
                         out = self.picons.download_picon(purl, title)
                         return True if out else False
@@ -1388,39 +1644,38 @@ class IPTVDreamV6(Screen):
                     with ThreadPoolExecutor(max_workers=max_workers) as ex:
                         futs = [ex.submit(_one, it) for it in items]
                         for fut in as_completed(futs):
+                            if cancel.cancelled:
+                                # nie czekamy na kolejkę - niezaczęte pobrania odpadają
+                                for f in futs:
+                                    f.cancel()
+                                cancel.check()
                             done += 1
                             try:
                                 if fut.result():
                                     ok += 1
                             except Exception:
                                 pass
-                            if total > 0 and (done % 10 == 0 or done == total):
-                                try:
-                                    reactor.callFromThread(
-                                        self.updateProgress,
-                                        min(100, (done / float(total)) * 100),
-                                        "Picon %d/%d" % (done, total)
-                                    )
-                                except Exception:
-                                    pass
+                            if total > 0:
+                                self.progress(min(100, (done / float(total)) * 100), "Picon %d/%d" % (done, total))
                 except Exception:
                     for it in items:
+                        cancel.check()
                         done += 1
                         if _one(it):
                             ok += 1
-                        if total > 0 and (done % 25 == 0 or done == total):
-                            try:
-                                reactor.callFromThread(self.updateProgress, min(100, (done / float(total)) * 100), "Picon %d/%d" % (done, total))
-                            except Exception:
-                                pass
+                        if total > 0:
+                            self.progress(min(100, (done / float(total)) * 100), "Picon %d/%d" % (done, total))
 
                 return ok
 
+            gen = self._playlist_gen
+
             def _done(res, err):
                 self.stopLoading()
                 if err:
                     self.session.open(MessageBox, "Picon error: %s" % err, MessageBox.TYPE_ERROR)
                     return
+                self._picon_sync = (self.picons.picon_dir, gen)
                 self.session.open(MessageBox, _("Pobrano/gotowe picon: %d", self.lang) % res, MessageBox.TYPE_INFO)
 
             run_in_thread(_work, _done)
@@ -1455,6 +1710,11 @@ class IPTVDreamV6(Screen):
             return
         st = src.get("type")
         val = src.get("value")
+        # Poprzednia playlista z tego samego źródła - po wczytaniu liczony jest diff (tylko zmiany).
+        if self.current_playlist and self._current_source == src:
+            self._refresh_base = (self.current_playlist, self._playlist_gen)
+        else:
+            self._refresh_base = None
         if st == "m3u_url":
             return self.onUrlReady(val)
         if st == "m3u_file":
@@ -1468,6 +1728,8 @@ class IPTVDreamV6(Screen):
             flt = val.get("filter", "all")
             self.xtream_data = (host, user, pwd)
             return self.onXtreamTypeSelected(("REFRESH", flt))
+        if st == "multi":
+            return self.loadMultiSources(val)
 
     # ---------- EPG / Update / Settings ----------
 
@@ -1751,6 +2013,40 @@ class IPTVDreamV6(Screen):
             self.session.open(MessageBox, _("Nie wybrano kanałów do eksportu.", self.lang), MessageBox.TYPE_INFO, timeout=3)
             return
 
+        # MAC: pozycje bez linku z create_link (błąd przy ładowaniu), Xtream: seriale jako jeden wiersz
+        # (odcinki z get_series_info) - dociągane dopiero przed eksportem, tylko dla zaznaczonych grup
+        pending = [ch for ch in final_list if ch.get("mac_link")]
+        series = sum(1 for ch in final_list if ch.get("xtream_series"))
+        if pending or series:
+            if pending:
+                self.startLoading(_("mac_links_resolving", self.lang) % len(pending))
+            else:
+                self.startLoading(_("xtream_series_expanding", self.lang) % series)
+            cancel = self.cancel_token
+            workers = int(self.cfg.get("xtream_max_workers", 4) or 4)
+
+            def _prepare():
+                if pending:
+                    resolve_mac_links(pending, self.progress, cancel)
+                if series:
+                    return self.vod_meta.expand_series(final_list, self.progress, cancel, workers)
+                return final_list
+
+            def _done(channels, err):
+                self.stopLoading()
+                if err:
+                    self.log.warning("Lazy export items failed: %s", mask_sensitive(err))
+                    channels = final_list
+                # wiersze serii i pozycje MAC bez linku mają tylko zastępczy URL (localhost / "ffmpeg ...")
+                # - nie trafiają do bukietów, użytkownik dostaje ich liczbę
+                ready = [ch for ch in channels if not (ch.get("mac_link") or ch.get("xtream_series"))]
+                self._exportChannels(ready, len(channels) - len(ready))
+
+            run_in_thread(_prepare, _done)
+            return
+        self._exportChannels(final_list)
+
+    def _exportChannels(self, final_list, skipped=0):
         # v6.6.7: szybki eksport jak wcześniej — bez ciężkiego paska 0%, bez EPG/Picon w tej samej operacji.
         try:
             self["progress_bar"].hide()
@@ -1783,7 +2079,10 @@ class IPTVDreamV6(Screen):
             self["status_bar"].setText(_("exported_channels_bouquets", self.lang) % (total_ch, total_bq))
         except Exception:
             pass
-        self.session.open(MessageBox, _("exported_channels_bouquets", self.lang) % (total_ch, total_bq), MessageBox.TYPE_INFO)
+        msg = _("exported_channels_bouquets", self.lang) % (total_ch, total_bq)
+        if skipped:
+            msg += "\n" + _("export_skipped_unresolved", self.lang) % skipped
+        self.session.open(MessageBox, msg, MessageBox.TYPE_INFO)
 
     # ---------- close ----------
 
@@ -1802,6 +2101,10 @@ class IPTVDreamV6(Screen):
                 self.loading_timer.stop()
         except Exception:
             pass
+        try:
+            self.vod_meta.cancel_pending()
+        except Exception:
+            pass
         Screen.close(self)
 
 
@@ -1816,71 +2119,16 @@ def parse_m3u_bytes_improved(data, content_filter=None):
         data: bytes
         content_filter: live/vod/adult/all/None
     Returns:
-        list[dict]
+        ChannelTable (wiersze jak dict: title/url/group/logo/epg_id, także tvg-logo/tvg-id)
     """
     if not data:
         return []
+    return xtream_m3u_engine(content_filter).parse(data)
 
-    try:
-        text = data.decode("utf-8", "ignore")
-    except Exception:
-        try:
-            text = data.decode("latin-1", "ignore")
-        except Exception:
-            return []
-
-    lines = text.splitlines()
-    out = []
-
-    # filtry - heurystyka na podstawie group-title / tvg-name
-    def _match_filter(meta):
-        if not content_filter or content_filter in ("all",):
-            return True
-        meta_l = (meta or "").lower()
-        if content_filter == "adult":
-            return ("xxx" in meta_l) or ("adult" in meta_l)
-        if content_filter == "vod":
-            return ("vod" in meta_l) or ("movie" in meta_l) or ("series" in meta_l)
-        if content_filter == "live":
-            # Live: wszystko, co nie wygląda na VOD/XXX
-            return not (("vod" in meta_l) or ("movie" in meta_l) or ("series" in meta_l) or ("xxx" in meta_l) or ("adult" in meta_l))
-        return True
-
-    extinf_re = re.compile(r"#EXTINF:(?P<attrs>[^,]*),(?P<title>.*)$")
-    attr_re = re.compile(r'(\w+?)="(.*?)"')
-
-    cur = None
-    for ln in lines:
-        ln = ln.strip()
-        if not ln:
-            continue
-        if ln.startswith("#EXTINF"):
-            m = extinf_re.match(ln)
-            if not m:
-                cur = None
-                continue
-            attrs = m.group("attrs")
-            title = (m.group("title") or "").strip()
-            a = {k: v for (k, v) in attr_re.findall(attrs)}
-            group = a.get("group-title") or a.get("group") or "Inne"
-            logo = a.get("tvg-logo") or ""
-            if not _match_filter(group + " " + title):
-                cur = None
-                continue
-            cur = {
-                "title": title,
-                "group": group,
-                "tvg-logo": logo,
-                "tvg-id": a.get("tvg-id", ""),
-                "tvg-name": a.get("tvg-name", ""),
-            }
-            continue
-        if ln.startswith("#"):
-            continue
-        # URL
-        if cur is not None:
-            cur["url"] = ln
-            out.append(cur)
-            cur = None
 
-    return out
+def xtream_m3u_engine(content_filter=None):
+    """M3UEngine dla zrzutu Xtream/MAC: filtr treści live/vod/adult/all, URL tylko po #EXTINF."""
+    # filtry - wspólny klasyfikator (group-title + tytuł, /movie/ /series/ w URL)
+    accept = CLASSIFIER.content_filter(content_filter)
+    # keep_name: tvg-name jako epg_id kanałów bez tvg-id (mapowanie EPG w export_v2)
+    return M3UEngine(accept=accept, default_group="Inne", require_extinf=True, keep_name=True)
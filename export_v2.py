@@ -31,6 +31,8 @@ except Exception:
     channel_name_variants = None
     alias_candidates = None
 
+from .core.classifier import CLASSIFIER
+
 BOUQUET_DIR = "/etc/enigma2"
 EPG_DIR = "/etc/epgimport"
 EPG_CHANNEL_FILE = os.path.join(EPG_DIR, "iptvdream.channels.xml")
@@ -282,17 +284,24 @@ def _link_picon_for_channel(channel_name, tvg_id, service_refs, dest_dir=PICON_D
 
 
 def _is_adult_channel(title, group=""):
-    hay = (title + ' ' + group).lower()
-    return any(x in hay for x in ('xxx', 'adult', '18+', '+18', 'porn', 'porno', 'erotic', 'sex'))
+    return CLASSIFIER.classify(title, group).is_adult
+
+
+def _content_flags(ch):
+    """(is_adult, is_vod) kanału: z kolumny flag ChannelTable (liczone raz), dla dict klasyfikacja."""
+    flags = getattr(ch, "content_flags", None)
+    if flags is not None:
+        return flags()
+    info = CLASSIFIER.classify_channel(ch)
+    return info.is_adult, info.is_vod
 
 
 def _is_vod_like(title, group="", url=""):
-    hay = (title + ' ' + group + ' ' + url).lower()
     # VOD/series exports can be massive; they normally do not need live EPGImport mappings.
-    return any(x in hay for x in ('vod', 'movie', 'movies', 'film', 'films', 'series', 'serial', 'seriale', '/movie/', '/series/'))
+    return CLASSIFIER.classify(title, group, url).is_vod
 
 
-def _epg_id_variants(name, tvg_id="", group=""):
+def _epg_id_variants(name, tvg_id="", group="", adult=None):
     ids = set()
     tvg_id = _safe_text(tvg_id).strip()
     name = _safe_text(name).strip()
@@ -336,7 +345,9 @@ def _epg_id_variants(name, tvg_id="", group=""):
         for suf in suffixes:
             ids.add('%s.%s' % (re.sub(r'\s+', '', simple), suf))
 
-    if _is_adult_channel(name, group):
+    if adult is None:
+        adult = _is_adult_channel(name, group)
+    if adult:
         ids.update(['xxx', 'adult', 'xxx.tv', 'adult.tv'])
 
     # Usuń śmieci i ogranicz liczbę wpisów, żeby plik EPGImport nie rósł absurdalnie.
@@ -419,10 +430,12 @@ def create_epg_xml(mapping):
                     name = entry.get('name') if isinstance(entry, dict) else entry[1]
                     tvg = entry.get('tvg') if isinstance(entry, dict) else (entry[2] if len(entry) > 2 else '')
                     group = entry.get('group') if isinstance(entry, dict) else (entry[3] if len(entry) > 3 else '')
+                    adult = entry.get('adult') if isinstance(entry, dict) else None
                 except Exception:
                     continue
+                xids = _epg_id_variants(name, tvg, group, adult)
                 for r in _service_ref_import_variants(ref):
-                    for xid in _epg_id_variants(name, tvg, group):
+                    for xid in xids:
                         key = r + '|' + xid
                         if key in visited:
                             continue
@@ -545,9 +558,11 @@ def export_bouquets(playlist, bouquet_name=None, keep_groups=True, service_type=
                     sid_hex = "%X" % sid
                     refs = ["%s:0:1:%s:0:0:0:0:0:0" % (t, sid_hex) for t in (service_type, "4097", "5002", "1")]
                     grp = ch.get("group", "Main")
-                    if not _is_vod_like(title, grp, url):
+                    # flagi z kolumny ChannelTable (is_vod / metadata parsera mają pierwszeństwo)
+                    is_adult, is_vod = _content_flags(ch)
+                    if not is_vod:
                         for r in refs:
-                            epg_mapping.append({'ref': r, 'name': title, 'tvg': tvg_id, 'group': grp})
+                            epg_mapping.append({'ref': r, 'name': title, 'tvg': tvg_id, 'group': grp, 'adult': is_adult})
                     picon_tasks.append((title, tvg_id, refs, logo))
                 except Exception:
                     pass
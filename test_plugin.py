@@ -151,6 +151,22 @@ http://example.com/stream/tvn
         print(f"❌ Błąd podczas parsowania: {e}")
         return False
 
+def test_live_filter_keeps_film_channels():
+    """Filtr LIVE odrzuca tylko vod/movie/series i XXX - kanały "Film"/"Video" zostają."""
+    import importlib.util
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "core", "classifier.py")
+    spec = importlib.util.spec_from_file_location("iptvdream_classifier", path)
+    classifier = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(classifier)
+
+    accept = classifier.ContentClassifier().content_filter("live")
+    for title, group in (("Canal+ Film", "Polska"), ("MTV Video", "Muzyka"),
+                         ("Polsat Film HD", "Filmy"), ("Filmbox Premium", "Filmy")):
+        assert accept(title, group, "http://example.com/live/u/p/1.ts"), title
+    assert not accept("Matrix", "VOD | Movies", "http://example.com/movie/u/p/2.mkv")
+    assert not accept("Hot XXX", "Adult", "http://example.com/live/u/p/3.ts")
+
+
 if __name__ == "__main__":
     print("🚀 TESTOWANIE IPTV Dream v6.0")
     print("=" * 60)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - Cooperative cancellation
+
+A ``CancelToken`` is created for one long operation (playlist download,
+MAC portal crawl, picon batch) and passed down to the code doing the work:
+- workers call ``token.check()`` between chunks / pages / requests,
+- sockets in flight are registered with ``token.track(obj)``; ``cancel()``
+  shuts them down and closes them, so a thread blocked in a read wakes up at
+  once (a plain close() from another thread does not interrupt recv()),
+- ``token.wait(seconds)`` is a sleep (retry backoff) that ends early on cancel.
+
+``Cancelled`` derives from BaseException (like asyncio.CancelledError): the
+loaders have many broad ``except Exception`` fallbacks (stale cache, next
+endpoint, next page) which must not swallow a cancellation and carry on.
+"""
+
+from __future__ import absolute_import, print_function
+
+import socket
+import threading
+import weakref
+
+
+class Cancelled(BaseException):
+    """Raised by ``CancelToken.check()`` after the operation was cancelled."""
+
+
+def _response_socket(obj):
+    """Underlying socket of a requests/urllib3 response (None when not found)."""
+    raw = getattr(obj, "raw", obj)
+    conn = getattr(raw, "_connection", None) or getattr(raw, "connection", None)
+    sock = getattr(conn, "sock", None)
+    if sock is not None:
+        return sock
+    # urllib3 releases the connection object while streaming; http.client keeps the socket file
+    fp = getattr(getattr(raw, "_fp", None), "fp", None)
+    return getattr(getattr(fp, "raw", None), "_sock", None)
+
+
+def _abort(obj):
+    sock = None
+    try:
+        sock = _response_socket(obj)
+    except Exception:
+        pass
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+    try:
+        obj.close()
+    except Exception:
+        pass
+
+
+class CancelToken(object):
+    """Cancellation flag shared between the GUI and worker threads."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        # weak references: a response the caller has dropped (read, closed, or an error
+        # page) must not be kept alive by a long-lived token until cancel() or the end
+        self._tracked = weakref.WeakValueDictionary()
+        self._pinned = {}  # objects that do not support weak references
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """Sets the flag and closes all tracked objects (idempotent, thread-safe)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            tracked = list(self._tracked.values()) + list(self._pinned.values())
+            self._tracked, self._pinned = weakref.WeakValueDictionary(), {}
+        for obj in tracked:
+            _abort(obj)
+
+    def check(self):
+        """Raises Cancelled if the token was cancelled."""
+        if self._event.is_set():
+            raise Cancelled(self.reason or "cancelled")
+
+    def wait(self, timeout):
+        """Sleeps up to ``timeout`` seconds; returns True when cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+    def track(self, obj):
+        """Registers an object with ``close()`` (response, session) to be closed on cancel.
+
+        Returns ``obj``; if the token is already cancelled, closes it and raises Cancelled.
+        The token holds ``obj`` weakly: once the caller drops it, it is forgotten without
+        an explicit ``untrack()``.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                try:
+                    self._tracked[id(obj)] = obj
+                except TypeError:
+                    self._pinned[id(obj)] = obj
+                return obj
+        _abort(obj)
+        raise Cancelled(self.reason or "cancelled")
+
+    def untrack(self, obj):
+        with self._lock:
+            self._tracked.pop(id(obj), None)
+            self._pinned.pop(id(obj), None)
@@ -16,6 +16,18 @@ except Exception:
     normalize_channel_key = None
     channel_name_variants = None
 
+try:
+    from ..core.cache_manager import get_cache_manager
+except Exception:
+    get_cache_manager = None
+
+try:
+    from .net import get_session_registry
+except Exception:
+    get_session_registry = None
+
+from .progress import as_dispatcher
+
 class EPGManager:
     """Zaawansowany menadżer EPG."""
     
@@ -29,6 +41,8 @@ class EPGManager:
         # Upewnij się, że katalog istnieje
         os.makedirs(self.epg_dir, exist_ok=True)
         os.makedirs(self.cache_dir, exist_ok=True)
+        # Wspólny budżet cache w /tmp (None gdy moduł niedostępny)
+        self.cache = get_cache_manager() if get_cache_manager else None
         
         # Rozszerzone źródła EPG - 20+ różnych źródeł!
         self.epg_sources = [
@@ -214,6 +228,7 @@ class EPGManager:
 
     def fetch_epg_data(self, channels, progress_callback=None):
         """Pobiera dane EPG dla kanałów."""
+        progress_callback = as_dispatcher(progress_callback)
         try:
             total = len(channels)
             processed = 0
@@ -223,7 +238,7 @@ class EPGManager:
                 self._fetch_channel_epg(channel)
                 
                 processed += 1
-                if progress_callback and processed % 10 == 0:
+                if progress_callback:
                     progress = (processed / total) * 100
                     progress_callback(progress, f"Pobieranie EPG: {processed}/{total}")
             
@@ -243,12 +258,17 @@ class EPGManager:
             if os.path.exists(cache_file):
                 file_age = time.time() - os.path.getmtime(cache_file)
                 if file_age < 3600:  # 1 godzina
+                    if self.cache:
+                        self.cache.hit(cache_file)
                     return  # Użyj cache
             
             # Tutaj można dodać logikę pobierania EPG z różnych źródeł
             # Na razie tylko zapisz pusty plik cache
             with open(cache_file, 'w') as f:
                 json.dump({}, f)
+            if self.cache:
+                self.cache.miss()
+                self.cache.record(cache_file)
                 
         except:
             pass
@@ -342,6 +362,11 @@ class EPGManager:
     def cleanup_cache(self, max_age=86400):
         """Czyści przeterminowane pliki EPG."""
         try:
+            if self.cache:
+                # indeks menadżera cache: bez listdir/getmtime, przy okazji egzekwuje budżet
+                self.cache.cleanup(max_age, roots=(self.cache_dir,))
+                self.cache.enforce()
+                return True
             if os.path.exists(self.cache_dir):
                 for filename in os.listdir(self.cache_dir):
                     if filename.startswith("epg_"):
@@ -359,7 +384,8 @@ class EPGManager:
         
         for source in self.epg_sources[:5]:  # Testuj tylko 5 pierwszych
             try:
-                response = requests.head(source["url"], timeout=5)
+                http = get_session_registry().session() if get_session_registry else requests
+                response = http.head(source["url"], timeout=5)
                 results.append({
                     "source": source["name"],
                     "url": source["url"],
@@ -10,6 +10,11 @@ import requests
 import re
 from datetime import datetime, timedelta
 from ..tools.lang import _
+try:
+    from ..tools.net import http_get
+    from ..tools.governor import get_governor, url_host, PRIO_NORMAL
+except Exception:
+    http_get = None
 from Components.Language import language
 
 # KLUCZ DO ZAPISYWANIA URL W PROFILU
@@ -142,9 +147,15 @@ class EPGManager:
     def download_epg_data(self, url):
         """Pobiera dane EPG z podanego URL"""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.content
+            if http_get is None:
+                response = requests.get(url, timeout=30)
+                response.raise_for_status()
+                return response.content
+            # duże pliki XMLTV: długi odczyt, ale łącznie nie dłużej niż minuta prób
+            governor = get_governor()
+            with governor.slot(url_host(url), PRIO_NORMAL):
+                response = http_get(url, timeout=(7, 30), retries=2, deadline=60, stream=True)
+                return b"".join(governor.iter_content(response, 64 * 1024, PRIO_NORMAL))
         except Exception as e:
             print(f"[EPGManager] Błąd pobierania EPG: {e}")
             return None
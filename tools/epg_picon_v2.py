@@ -9,6 +9,7 @@ ULEPSZONY MODUŁ EPG I PICON v5.1
 
 import os, re, json, hashlib, time
 from ..tools.lang import _
+from ..core.cache_manager import get_cache_manager
 from Components.Language import language
 import requests
 
@@ -202,6 +203,7 @@ def fetch_epg_for_playlist(pl):
     try:
         with open(cache_file, 'w') as f:
             json.dump(cache_data, f)
+        get_cache_manager().record(cache_file)
     except:
         pass
 
@@ -222,6 +224,7 @@ def download_picon_url(url, title, use_cache=True):
     if use_cache:
         cache_file = _get_cache_path(f"picon_{safe}")
         if _is_cache_valid(cache_file):
+            get_cache_manager().hit(cache_file)
             return cache_file
     
     # Główna ścieżka picon
@@ -235,6 +238,7 @@ def download_picon_url(url, title, use_cache=True):
         if use_cache:
             # Kopiuj do cache
             shutil.copy2(main_path, cache_file)
+            get_cache_manager().record(cache_file)
         return main_path
     
     try:
@@ -250,6 +254,7 @@ def download_picon_url(url, title, use_cache=True):
         if use_cache:
             with open(cache_file, 'wb') as f:
                 f.write(r.content)
+            get_cache_manager().record(cache_file)
             
         return main_path
     except Exception as e:
@@ -341,13 +346,11 @@ def create_epg_import_source_with_sat_mapping(pl):
         return False
 
 def cleanup_cache():
-    """Czyści przeterminowane pliki w cache."""
+    """Czyści przeterminowane pliki w cache (według indeksu menadżera cache, index.json zostaje)."""
     try:
-        if os.path.exists(CACHE_DIR):
-            for filename in os.listdir(CACHE_DIR):
-                filepath = os.path.join(CACHE_DIR, filename)
-                if os.path.isfile(filepath) and not _is_cache_valid(filepath):
-                    os.remove(filepath)
+        manager = get_cache_manager()
+        manager.cleanup(CACHE_DURATION, roots=(CACHE_DIR,))
+        manager.enforce()
     except:
         pass
 
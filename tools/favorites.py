@@ -7,6 +7,11 @@ Zarządzanie ulubionymi kanałami
 import os
 import json
 
+try:
+    from collections.abc import Mapping
+except Exception:  # Py2
+    from collections import Mapping
+
 class FavoritesManager:
     """Menadżer ulubionych kanałów"""
     
@@ -76,13 +81,14 @@ class FavoritesManager:
             existing = set(group.get("channels") or [])
             count = 0
             for channel in channels or []:
-                if not isinstance(channel, dict):
+                # Wiersze ChannelTable to widoki (Mapping), do JSON zapisujemy zwykły dict.
+                if not isinstance(channel, Mapping):
                     continue
                 channel_id = channel.get("url") or channel.get("title") or channel.get("name") or ""
                 if not channel_id:
                     continue
                 if channel_id not in self.favorites["channels"]:
-                    self.favorites["channels"][channel_id] = channel
+                    self.favorites["channels"][channel_id] = dict(channel)
                 if channel_id not in existing:
                     group["channels"].append(channel_id)
                     existing.add(channel_id)
@@ -109,7 +115,7 @@ class FavoritesManager:
             
         channel_id = channel.get("url", channel.get("title", ""))
         if channel_id not in self.favorites["channels"]:
-            self.favorites["channels"][channel_id] = channel
+            self.favorites["channels"][channel_id] = dict(channel)
             
         if channel_id not in self.favorites["groups"][group_name]["channels"]:
             self.favorites["groups"][group_name]["channels"].append(channel_id)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - Download governor (bandwidth and connection limits)
+
+Picon batches, EPG downloads and playlist refreshes run in separate worker
+threads and, left alone, saturate a slow line while the user is watching an
+IPTV stream. All downloaders go through one process-wide ``Governor``:
+- connection slots: at most ``max_connections`` transfers at once and
+  ``per_host`` per server; a waiting higher-priority transfer is admitted
+  before lower-priority ones,
+- bandwidth: a token bucket enforces ``max_bytes_per_sec`` for all transfers
+  (0 = no ceiling); transfers call ``consume(len(chunk))`` per chunk,
+- priorities: ``PRIO_INTERACTIVE`` (playlist the user waits for),
+  ``PRIO_NORMAL`` (EPG), ``PRIO_BACKGROUND`` (picons). While an interactive
+  transfer runs, background transfers get at most ``background_share`` of
+  the ceiling,
+- while a stream is playing (``set_playing`` or ``watch_playback`` polling
+  Enigma2's current service), background transfers are limited to
+  ``playing_bytes_per_sec`` even without a ceiling.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Py2
+    from urlparse import urlsplit
+
+PRIO_INTERACTIVE = 0
+PRIO_NORMAL = 1
+PRIO_BACKGROUND = 2
+_PRIORITIES = (PRIO_INTERACTIVE, PRIO_NORMAL, PRIO_BACKGROUND)
+
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_PER_HOST = 4
+DEFAULT_BACKGROUND_SHARE = 0.25
+DEFAULT_PLAYING_RATE = 256 * 1024
+# A bucket holds at most this many seconds of traffic (short bursts stay smooth).
+BURST_SECONDS = 0.5
+MIN_BURST = 64 * 1024
+# Waiting threads re-check their cancel token this often (seconds).
+WAIT_POLL = 0.2
+PLAYBACK_POLL = 5.0
+
+
+def url_host(url):
+    """Slot key of a URL (host[:port], lowercase)."""
+    try:
+        return (urlsplit(url).netloc or '').lower()
+    except Exception:
+        return ''
+
+
+class _Bucket(object):
+    """Token bucket with reservations: ``reserve(n)`` returns how long the caller has to wait."""
+
+    def __init__(self, rate=0):
+        self.rate = 0.0
+        self.tokens = 0.0
+        self.last = time.time()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        rate = max(0.0, float(rate or 0))
+        if rate != self.rate:
+            self.rate = rate
+            self.tokens = min(self.tokens, self.burst())
+
+    def burst(self):
+        return max(MIN_BURST, self.rate * BURST_SECONDS)
+
+    def reserve(self, n, now):
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst(), self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= n
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Governor(object):
+    """Process-wide limits for background and foreground downloads (thread-safe)."""
+
+    def __init__(self, max_bytes_per_sec=0, max_connections=DEFAULT_MAX_CONNECTIONS, per_host=DEFAULT_PER_HOST,
+                 background_share=DEFAULT_BACKGROUND_SHARE, playing_bytes_per_sec=DEFAULT_PLAYING_RATE):
+        self._cond = threading.Condition()
+        self._active = 0
+        self._hosts = {}
+        self._waiting = dict((p, 0) for p in _PRIORITIES)
+        self._running = dict((p, 0) for p in _PRIORITIES)
+        self._global = _Bucket()
+        self._background = _Bucket()
+        self.playing = False
+        self.bytes = dict((p, 0) for p in _PRIORITIES)
+        self.throttled = 0.0
+        self._watcher = None
+        self.configure_limits(max_bytes_per_sec, max_connections, per_host, background_share, playing_bytes_per_sec)
+
+    def configure_limits(self, max_bytes_per_sec=0, max_connections=DEFAULT_MAX_CONNECTIONS,
+                         per_host=DEFAULT_PER_HOST, background_share=DEFAULT_BACKGROUND_SHARE,
+                         playing_bytes_per_sec=DEFAULT_PLAYING_RATE):
+        with self._cond:
+            self.max_bytes_per_sec = max(0, int(max_bytes_per_sec or 0))
+            self.max_connections = max(1, int(max_connections or 1))
+            self.per_host = max(1, int(per_host or 1))
+            self.background_share = min(1.0, max(0.0, float(background_share or 0)))
+            self.playing_bytes_per_sec = max(0, int(playing_bytes_per_sec or 0))
+            self._global.set_rate(self.max_bytes_per_sec)
+            self._cond.notify_all()
+
+    def configure(self, cfg):
+        """Applies the ``net_*`` limits of the plugin config (dict); bad values keep the defaults."""
+        try:
+            self.configure_limits(
+                max_bytes_per_sec=int(float(cfg.get("net_max_kbps", 0) or 0) * 1024 / 8),
+                max_connections=cfg.get("net_max_connections", DEFAULT_MAX_CONNECTIONS),
+                per_host=cfg.get("net_max_per_host", DEFAULT_PER_HOST),
+                background_share=cfg.get("net_background_share", DEFAULT_BACKGROUND_SHARE),
+                playing_bytes_per_sec=int(float(cfg.get("net_playing_kbps", DEFAULT_PLAYING_RATE * 8 / 1024) or 0)
+                                          * 1024 / 8),
+            )
+        except Exception:
+            pass
+
+    def set_playing(self, playing):
+        self.playing = bool(playing)
+
+    # ---------- connection slots ----------
+
+    def _admissible(self, host, priority):
+        if self._hosts.get(host, 0) >= self.per_host:
+            return False
+        # global slots wanted by waiting higher-priority transfers are kept for them
+        reserved = sum(n for p, n in self._waiting.items() if p < priority)
+        return self._active + reserved < self.max_connections
+
+    def acquire(self, host, priority=PRIO_NORMAL, cancel=None):
+        """Blocks until a connection slot for ``host`` is free (``cancel`` ends the wait with Cancelled)."""
+        with self._cond:
+            if not self._admissible(host, priority):
+                self._waiting[priority] += 1
+                try:
+                    while not self._admissible(host, priority):
+                        self._cond.wait(WAIT_POLL)
+                        if cancel is not None:
+                            cancel.check()
+                finally:
+                    self._waiting[priority] -= 1
+                    # a lower-priority thread may be waiting only because of this one
+                    self._cond.notify_all()
+            self._active += 1
+            self._hosts[host] = self._hosts.get(host, 0) + 1
+            self._running[priority] += 1
+
+    def release(self, host, priority=PRIO_NORMAL):
+        with self._cond:
+            self._active -= 1
+            left = self._hosts.get(host, 0) - 1
+            if left > 0:
+                self._hosts[host] = left
+            else:
+                self._hosts.pop(host, None)
+            self._running[priority] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, host, priority=PRIO_NORMAL, cancel=None):
+        """``with governor.slot(host, prio):`` - connection slot held for one whole transfer."""
+        self.acquire(host, priority, cancel)
+        try:
+            yield self
+        finally:
+            self.release(host, priority)
+
+    # ---------- bandwidth ----------
+
+    def background_rate(self):
+        """Current ceiling for background transfers in bytes/s (0 = none)."""
+        limits = []
+        if self.playing and self.playing_bytes_per_sec:
+            limits.append(self.playing_bytes_per_sec)
+        if self.max_bytes_per_sec and self._running[PRIO_INTERACTIVE]:
+            limits.append(max(1, int(self.max_bytes_per_sec * self.background_share)))
+        return min(limits) if limits else 0
+
+    def consume(self, nbytes, priority=PRIO_NORMAL, cancel=None):
+        """Accounts ``nbytes`` just transferred; sleeps as long as needed to stay under the limits."""
+        if nbytes <= 0:
+            return
+        with self._cond:
+            now = time.time()
+            self.bytes[priority] += nbytes
+            delay = self._global.reserve(nbytes, now)
+            if priority == PRIO_BACKGROUND:
+                self._background.set_rate(self.background_rate())
+                delay = max(delay, self._background.reserve(nbytes, now))
+            if delay > 0:
+                self.throttled += delay
+        if delay > 0:
+            if cancel is not None:
+                cancel.wait(delay)
+                cancel.check()
+            else:
+                time.sleep(delay)
+
+    def iter_content(self, resp, chunk_size=8192, priority=PRIO_NORMAL, cancel=None):
+        """``resp.iter_content`` paced by the governor."""
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            if chunk:
+                self.consume(len(chunk), priority, cancel)
+            yield chunk
+
+    # ---------- playback ----------
+
+    def watch_playback(self, interval=PLAYBACK_POLL):
+        """Polls Enigma2's current service on the reactor thread (call from the reactor thread).
+
+        An IPTV service (reference with a URL) counts as playing; without Enigma2 nothing happens.
+        """
+        if self._watcher is not None:
+            return
+        try:
+            import NavigationInstance
+            from twisted.internet import task
+        except Exception:
+            return
+
+        def _poll():
+            try:
+                nav = NavigationInstance.instance
+                ref = nav.getCurrentlyPlayingServiceReference() if nav else None
+                text = (ref.toString() if ref else "").lower()
+                self.set_playing("%3a//" in text or "://" in text)
+            except Exception:
+                self.set_playing(False)
+
+        try:
+            self._watcher = task.LoopingCall(_poll)
+            self._watcher.start(interval, now=True)
+        except Exception:
+            self._watcher = None
+
+    # ---------- statistics ----------
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "waiting": sum(self._waiting.values()),
+                "hosts": dict(self._hosts),
+                "playing": self.playing,
+                "bytes": dict(self.bytes),
+                "throttled": self.throttled,
+                "max_bytes_per_sec": self.max_bytes_per_sec,
+                "background_rate": self.background_rate(),
+            }
+
+
+_GOVERNOR = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+def get_governor():
+    """Process-wide governor shared by all downloaders."""
+    global _GOVERNOR
+    if _GOVERNOR is None:
+        with _GOVERNOR_LOCK:
+            if _GOVERNOR is None:
+                _GOVERNOR = Governor()
+    return _GOVERNOR
@@ -1931,3 +1931,93 @@ try:
     LANG.setdefault('ar', {})['lang_russian'] = 'الروسية'
 except Exception:
     pass
+
+# Multi-source load (management menu)
+try:
+    LANG.setdefault('pl', {}).update({
+        'multi_load_label': '🔀 Wczytaj zestaw źródeł (%d)',
+        'multi_add_label': '➕ Dodaj ostatnie źródło do zestawu',
+        'multi_clear_label': '🗑️ Wyczyść zestaw źródeł',
+        'multi_empty': 'Zestaw źródeł jest pusty.\nWczytaj źródło (M3U / Xtream / MAC) i wybierz "Dodaj ostatnie źródło do zestawu".',
+        'multi_added': 'Dodano do zestawu (źródeł: %d).',
+        'multi_cleared': 'Zestaw źródeł wyczyszczony.',
+        'multi_loading': 'Pobieranie zestawu źródeł (%d) ...',
+    })
+    LANG.setdefault('en', {}).update({
+        'multi_load_label': '🔀 Load source set (%d)',
+        'multi_add_label': '➕ Add last source to set',
+        'multi_clear_label': '🗑️ Clear source set',
+        'multi_empty': 'The source set is empty.\nLoad a source (M3U / Xtream / MAC) and choose "Add last source to set".',
+        'multi_added': 'Added to set (sources: %d).',
+        'multi_cleared': 'Source set cleared.',
+        'multi_loading': 'Loading source set (%d) ...',
+    })
+except Exception:
+    pass
+
+# Xtream: category selection (player_api)
+try:
+    LANG.setdefault('pl', {}).update({
+        'xtream_cat_title': 'Xtream - wybór kategorii',
+        'xtream_cat_ok': 'OK = Zaznacz',
+        'xtream_cat_all': 'ZIELONY = Wszystkie',
+        'xtream_cat_load': 'NIEBIESKI = Pobierz',
+        'xtream_cat_sum': 'Zaznaczone kategorie: %d z %d',
+        'xtream_cat_loading': 'Pobieranie kategorii Xtream ...',
+        'xtream_cat_none': 'Nie zaznaczono żadnej kategorii.',
+        'xtream_full_dump': 'Całe konto (get.php)',
+    })
+    LANG.setdefault('en', {}).update({
+        'xtream_cat_title': 'Xtream - select categories',
+        'xtream_cat_ok': 'OK = Select',
+        'xtream_cat_all': 'GREEN = All',
+        'xtream_cat_load': 'BLUE = Load',
+        'xtream_cat_sum': 'Selected categories: %d of %d',
+        'xtream_cat_loading': 'Loading Xtream categories ...',
+        'xtream_cat_none': 'No category selected.',
+        'xtream_full_dump': 'Whole account (get.php)',
+    })
+except Exception:
+    pass
+
+# VOD / series details (tools.vod_meta)
+try:
+    LANG.setdefault('pl', {}).update({
+        'vod_meta_loading': 'Pobieranie opisu ...',
+        'vod_meta_none': 'Brak opisu.',
+        'vod_meta_year': 'Rok',
+        'vod_meta_genre': 'Gatunek',
+        'vod_meta_duration': 'Czas',
+        'vod_meta_rating': 'Ocena',
+        'vod_meta_director': 'Reżyseria',
+        'vod_meta_cast': 'Obsada',
+        'vod_meta_episodes': 'Odcinki: %d (sezony: %d)',
+    })
+    LANG.setdefault('en', {}).update({
+        'vod_meta_loading': 'Loading details ...',
+        'vod_meta_none': 'No details.',
+        'vod_meta_year': 'Year',
+        'vod_meta_genre': 'Genre',
+        'vod_meta_duration': 'Duration',
+        'vod_meta_rating': 'Rating',
+        'vod_meta_director': 'Director',
+        'vod_meta_cast': 'Cast',
+        'vod_meta_episodes': 'Episodes: %d (seasons: %d)',
+    })
+except Exception:
+    pass
+
+# MAC links / Xtream series episodes resolved lazily before export
+try:
+    LANG.setdefault('pl', {}).update({
+        'mac_links_resolving': 'MAC: pobieranie linków (%d) ...',
+        'xtream_series_expanding': 'Xtream: pobieranie odcinków seriali (%d) ...',
+        'export_skipped_unresolved': 'Pominięto %d pozycji bez działającego linku (MAC/seriale).',
+    })
+    LANG.setdefault('en', {}).update({
+        'mac_links_resolving': 'MAC: resolving links (%d) ...',
+        'xtream_series_expanding': 'Xtream: loading series episodes (%d) ...',
+        'export_skipped_unresolved': 'Skipped %d items without a working link (MAC/series).',
+    })
+except Exception:
+    pass
@@ -14,7 +14,10 @@ import os
 import random
 import re
 import string
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
@@ -48,6 +51,27 @@ except Exception:
     def mask_sensitive(x):
         return str(x)
 
+try:
+    from .net import get_session_registry
+except Exception:
+    get_session_registry = None
+
+try:
+    from .governor import get_governor, url_host, PRIO_INTERACTIVE
+except Exception:
+    get_governor = None
+
+
+def _new_session():
+    # Shared per-host connection pools (keep-alive across portal pages); own cookies per client.
+    if get_session_registry is not None:
+        return get_session_registry().new_session()
+    return requests.Session()
+
+from ..core.m3u_engine import M3UEngine
+from ..core.classifier import CLASSIFIER, ADULT_RE, ADULT_FALSE_RE
+from .progress import as_dispatcher
+
 MAC_FILE = "/etc/enigma2/iptvdream_mac.json"
 LEGACY_MAC_FILES = ["/etc/enigma2/iptvdream_mylinks.json"]
 LOG_MAC = get_logger("IPTVDream.MAC", log_file="/tmp/iptvdream.log", debug=False)
@@ -61,6 +85,14 @@ MAC_MAX_LIVE_PAGES = 35
 MAC_MAX_VOD_PAGES = 30
 MAC_MAX_SERIES_PAGES = 20
 MAC_MAX_ENDPOINTS = 5
+# create_link/get_link resolution: worker pool size and links in flight at once (results are
+# yielded in list order, so at most this many finished links wait for a slower one before them).
+# The per-portal cap is the governor's per-host limit (net_max_per_host).
+MAC_LINK_WORKERS = 6
+MAC_LINK_WINDOW = 64
+# Live lists with more non-direct channels than this are not resolved while loading: every row keeps
+# its 'mac_link' marker and resolve_pending fills only the channels of the exported bouquets.
+MAC_LIVE_EAGER_LINKS = 400
 
 JS_HTTPREQUEST = "1-xml"
 MAG_UA = "Mozilla/5.0 (QtEmbedded; U; Linux; MAG250; en-US) AppleWebKit/533.3 (KHTML, like Gecko) MAG200 stbapp ver: 2 rev: 250 Safari/533.3"
@@ -71,14 +103,6 @@ _SESSION_CACHE = {}
 _SESSION_TTL = 420
 
 _MAC_HEX_RE = re.compile(r'[^0-9A-Fa-f]')
-ADULT_RE = re.compile(
-    r'(?i)(^|[\s\|_\-\[\]\(\):/])('
-    r'xxx|adult|adults|porn|porno|pornhub|erotic|erotica|sex|sexy|hardcore|redlight|'
-    r'hustler|brazzers|playboy|private|dorcel|babestation|venus|naughty|spice|blue\s*hustler|'
-    r'18\+|\+18|for\s*adults|only\s*adults|dla\s*doroslych|dla\s*dorosłych'
-    r')([\s\|_\-\[\]\(\):/]|$)'
-)
-ADULT_FALSE_RE = re.compile(r'(?i)\b(18\s*(lat|years|yo|roku|rok)|u18|under\s*18|18\s*hd|channel\s*18|canal\s*18)\b')
 
 
 def _mask_mac(mac):
@@ -125,12 +149,8 @@ def clean_name(name):
 
 
 def _is_adult_title_group(title, group=''):
-    hay = ('%s %s' % (title or '', group or '')).strip().lower()
-    if not hay:
-        return False
-    if ADULT_FALSE_RE.search(hay):
-        return False
-    return bool(ADULT_RE.search(' %s ' % hay))
+    # ADULT_RE / ADULT_FALSE_RE żyją we wspólnym klasyfikatorze (wynik zapamiętany w LRU).
+    return CLASSIFIER.classify(title or '', group or '').is_adult
 
 
 def _is_adult_category_name(name):
@@ -534,23 +554,30 @@ def _extract_token(data):
 
 
 class StalkerClient(object):
-    def __init__(self, host, mac):
+    def __init__(self, host, mac, cancel=None):
         self.host = normalize_host(host)
         self.mac = normalize_mac(mac)
         if not self.host or not self.mac:
             raise Exception('INVALID_MAC')
-        self.session = requests.Session()
+        self.session = _new_session()
         self.session.verify = False
+        # CancelToken: checked before every request; in-flight responses are tracked in _request.
+        self.cancel = cancel
         self.endpoints = _make_endpoints(self.host)
         self.endpoint = ''
         self.referer = ''
         self.token = ''
         self.token_random = ''
         self.portal_root = _base_url_and_path(self.host)[0]
+        # link() runs on one client from MAC_LINK_WORKERS threads: a (re-)handshake rewrites
+        # endpoint/token/referer, so it runs alone and call() does not read them half-way
+        self._auth_lock = threading.RLock()
 
     def _warmup(self, referer):
         if not referer:
             return referer
+        if self.cancel is not None:
+            self.cancel.check()
         try:
             r = self.session.get(referer, headers=_headers(self.mac, referer), timeout=MAC_SHORT_TIMEOUT, verify=False, allow_redirects=True)
             return getattr(r, 'url', None) or referer
@@ -561,14 +588,31 @@ class StalkerClient(object):
         h = dict(headers or _headers(self.mac, self.referer))
         if self.token:
             h['Authorization'] = 'Bearer ' + self.token
+        cancel = self.cancel
+        if cancel is not None:
+            cancel.check()
+        # With a cancel token the body is streamed, so cancel() can close the socket mid-read.
+        stream = cancel is not None
         try:
             if post:
-                r = self.session.post(endpoint, params=params, data='', headers=h, timeout=timeout, verify=False, allow_redirects=True)
+                r = self.session.post(endpoint, params=params, data='', headers=h, timeout=timeout, verify=False, allow_redirects=True, stream=stream)
             else:
-                r = self.session.get(endpoint, params=params, headers=h, timeout=timeout, verify=False, allow_redirects=True)
-            r.raise_for_status()
-            return _json_from_response(r)
+                r = self.session.get(endpoint, params=params, headers=h, timeout=timeout, verify=False, allow_redirects=True, stream=stream)
+            if cancel is None:
+                r.raise_for_status()
+                return _json_from_response(r)
+            cancel.track(r)
+            try:
+                r.raise_for_status()
+                data = _json_from_response(r)
+            finally:
+                cancel.untrack(r)
+                r.close()
+            cancel.check()
+            return data
         except Exception:
+            if cancel is not None:
+                cancel.check()
             raise
 
     def _call_at(self, endpoint, type_, action, extra=None, allow_post=False):
@@ -595,11 +639,17 @@ class StalkerClient(object):
         raise Exception('BAD_JSON_RESPONSE')
 
     def call(self, type_, action, extra=None, allow_post=False):
-        if not self.endpoint:
+        with self._auth_lock:
+            endpoint = self.endpoint
+        if not endpoint:
             raise Exception('Auth Failed')
-        return self._call_at(self.endpoint, type_, action, extra=extra, allow_post=allow_post)
+        return self._call_at(endpoint, type_, action, extra=extra, allow_post=allow_post)
 
     def handshake(self):
+        with self._auth_lock:
+            return self._handshake()
+
+    def _handshake(self):
         # Reuse session within one Enigma process to speed refreshing same portal.
         key = '%s|%s' % (self.host.rstrip('/').lower(), self.mac)
         now = time.time()
@@ -750,8 +800,8 @@ class StalkerClient(object):
         return ''
 
 
-def _client(host, mac):
-    c = StalkerClient(host, mac)
+def _client(host, mac, cancel=None):
+    c = StalkerClient(host, mac, cancel=cancel)
     c.handshake()
     return c
 
@@ -788,19 +838,26 @@ def _abs_logo(logo, root):
     return logo
 
 
-def _play_url(client, row, kind='itv', resolve=True):
-    cmd = row.get('cmd') or row.get('play_cmd') or row.get('command') or row.get('cmds') or ''
-    direct = StalkerClient.clean_cmd(cmd)
+def _row_cmd(row):
+    return row.get('cmd') or row.get('play_cmd') or row.get('command') or row.get('cmds') or ''
+
+
+def _direct_url(row):
+    """Playable URL straight from the row's cmd ('' when create_link is needed)."""
+    direct = StalkerClient.clean_cmd(_row_cmd(row))
     if direct.startswith(('http://', 'https://', 'rtmp://', 'rtsp://')) and not _is_local_url(direct):
+        return direct
+    return ''
+
+
+def _play_url(client, row, kind='itv', link=''):
+    """URL of a live row: direct cmd, then the resolved ``link``, then lightweight fallbacks."""
+    direct = _direct_url(row)
+    if direct:
         # Keep direct URLs; resolving all channels would slow down big portals.
         return direct
-    if resolve:
-        try:
-            u = client.link(cmd, kind)
-            if u and not _is_local_url(u):
-                return u
-        except Exception:
-            pass
+    if link and not _is_local_url(link):
+        return link
     url = str(row.get('url') or '').strip()
     if url and not _is_local_url(url):
         return url
@@ -811,7 +868,7 @@ def _play_url(client, row, kind='itv', resolve=True):
     return ''
 
 
-def _channel_from_live(client, row, genres, forced_group=None, resolve=True):
+def _channel_from_live(client, row, genres, forced_group=None):
     name = clean_name(row.get('name') or row.get('title') or ('Channel %s' % (row.get('id') or '')))
     gid = _row_gid(row)
     group = forced_group or genres.get(gid) or row.get('genre') or row.get('category') or row.get('tv_genre') or 'Inne'
@@ -820,7 +877,7 @@ def _channel_from_live(client, row, genres, forced_group=None, resolve=True):
     if adult:
         group = 'XXX'
     logo = _abs_logo(row.get('logo') or row.get('icon') or row.get('stream_icon') or row.get('screenshot_uri') or '', client.portal_root)
-    url = _play_url(client, row, 'itv', resolve=resolve)
+    url = _play_url(client, row, 'itv')
     return {
         'title': name,
         'url': url,
@@ -834,26 +891,154 @@ def _channel_from_live(client, row, genres, forced_group=None, resolve=True):
     }
 
 
-def _fetch_m3u_shortcut(host, mac):
+def _resolve_cmd(client, cmd, kind, cancel=None):
+    """create_link/get_link of one cmd inside the portal's governor slot ('' when it fails)."""
+    try:
+        if get_governor is None:
+            link = client.link(cmd, kind)
+        else:
+            with get_governor().slot(url_host(client.portal_root), PRIO_INTERACTIVE, cancel):
+                link = client.link(cmd, kind)
+    except Exception:
+        # tools.cancel.Cancelled is a BaseException and goes through
+        return ''
+    return link if link and not _is_local_url(link) else ''
+
+
+def resolve_links(client, jobs, cancel=None, workers=MAC_LINK_WORKERS):
+    """Resolves ``jobs`` ((cmd, kind) or None) with a bounded pool; yields links in job order.
+
+    '' = not resolved, None for None jobs. At most MAC_LINK_WINDOW links are in flight.
+    """
+    window = deque()
+    with ThreadPoolExecutor(max_workers=max(1, int(workers or 1))) as ex:
+        try:
+            for job in jobs:
+                if cancel is not None:
+                    cancel.check()
+                window.append(ex.submit(_resolve_cmd, client, job[0], job[1], cancel) if job else None)
+                if len(window) >= MAC_LINK_WINDOW:
+                    head = window.popleft()
+                    yield head.result() if head is not None else None
+            while window:
+                head = window.popleft()
+                yield head.result() if head is not None else None
+        finally:
+            for f in window:
+                if f is not None:
+                    f.cancel()
+
+
+def _mark_pending(ch, host, mac, kind, cmd):
+    # create_link failed/was skipped: keep the item, resolve it lazily (resolve_pending) before use
+    ch['mac_link'] = (host, mac, kind, cmd)
+
+
+def _resolve_channels(client, channels, cb, start, span, label, cancel=None, limit=None):
+    """Fills the URLs of ``channels`` marked with 'mac_link' in parallel, in place and in order.
+
+    Items whose link could not be resolved keep their fallback URL and the marker. With more
+    than ``limit`` marked items nothing is resolved (left to resolve_pending).
+    """
+    pending = [ch for ch in channels if ch.get('mac_link')]
+    if limit is not None and len(pending) > limit:
+        try:
+            LOG_MAC.info('MAC links: %d pending > %d, resolved on export', len(pending), limit)
+        except Exception:
+            pass
+        return 0
+    total = len(pending) or 1
+    jobs = ((ch['mac_link'][3], ch['mac_link'][2]) for ch in pending)
+    resolved = 0
+    for i, (ch, link) in enumerate(zip(pending, resolve_links(client, jobs, cancel))):
+        if link:
+            ch['url'] = link
+            del ch['mac_link']
+            resolved += 1
+        if i % 25 == 0:
+            cb(start + int((i / float(total)) * span), '%s %d/%d' % (label, i, total))
+    if pending:
+        try:
+            LOG_MAC.info('MAC links resolved %d/%d', resolved, len(pending))
+        except Exception:
+            pass
+    return resolved
+
+
+def resolve_pending(channels, progress_callback=None, cancel=None):
+    """Lazy create_link for channels left with a 'mac_link' marker by parse_mac_playlist.
+
+    Runs in a worker thread (export of the selected bouquets); one handshake per portal.
+    Returns the number of links resolved.
+    """
+    progress_callback = as_dispatcher(progress_callback)
+
+    def cb(p, msg=''):
+        if cancel is not None:
+            cancel.check()
+        try:
+            if progress_callback:
+                progress_callback(int(p), msg or '')
+        except Exception:
+            pass
+
+    portals = {}
+    for ch in channels or []:
+        marker = ch.get('mac_link')
+        if marker:
+            portals.setdefault((marker[0], marker[1]), []).append(ch)
+    resolved = 0
+    for (host, mac), chans in portals.items():
+        try:
+            client = _client(host, mac, cancel)
+        except Exception as e:
+            try: LOG_MAC.warning('MAC lazy links: handshake failed: %s', mask_sensitive(e))
+            except Exception: pass
+            continue
+        resolved += _resolve_channels(client, chans, cb, 0, 99, 'Links', cancel)
+    cb(100, 'OK')
+    return resolved
+
+
+def _fetch_m3u_shortcut(host, mac, cancel=None):
     # Optional fast path used by some panels. It is intentionally short-timeout and best-effort only.
     try:
         base, _path = _base_url_and_path(host)
         url = '%s/get.php?username=%s&password=%s&type=m3u_plus&output=ts' % (base, mac, mac)
-        r = requests.get(url, headers={'User-Agent': COMMON_UA, 'Connection': 'close'}, timeout=(3, 7), verify=False, allow_redirects=True)
-        if r.status_code == 200 and '#EXTINF' in (r.text or ''):
-            return parse_m3u_text(r.text)
+        if cancel is not None:
+            cancel.check()
+        r = _new_session().get(url, headers={'User-Agent': COMMON_UA}, timeout=(3, 7), verify=False, allow_redirects=True, stream=cancel is not None)
+        if cancel is not None:
+            cancel.track(r)
+        try:
+            if r.status_code == 200 and b'#EXTINF' in (r.content or b''):
+                return parse_m3u_text(r.content)
+        finally:
+            if cancel is not None:
+                cancel.untrack(r)
+            r.close()
     except Exception:
         pass
     return []
 
 
-def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
+def parse_mac_playlist(host, mac, content_type='live', progress_callback=None, cancel=None):
+    """Loads a MAC/Stalker portal playlist (list of channel dicts).
+
+    ``cancel`` (tools.cancel.CancelToken) stops the crawl before the next request/page and
+    closes the portal session; tools.cancel.Cancelled is raised to the caller.
+    """
     host = normalize_host(host)
     mac = normalize_mac(mac)
     if not host or not mac:
         raise Exception('INVALID_MAC')
 
+    # Runs in a worker thread: updates go to the GUI through the reactor, coalesced.
+    progress_callback = as_dispatcher(progress_callback)
+
     def cb(p, msg=''):
+        if cancel is not None:
+            cancel.check()
         try:
             if progress_callback:
                 progress_callback(int(p), msg or '')
@@ -869,17 +1054,18 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
         # M3U shortcut first for LIVE/ADULT only. If it fails, do real MAG/Stalker.
         if content_type in ('live', 'adult'):
             cb(2, 'M3U shortcut')
-            quick = _fetch_m3u_shortcut(host, mac)
+            quick = _fetch_m3u_shortcut(host, mac, cancel)
             if quick:
+                # is_adult nadane przy parsowaniu - bez ponownej klasyfikacji
                 if content_type == 'adult':
-                    quick = [x for x in quick if _is_adult_title_group(x.get('title') or x.get('name'), x.get('group'))]
+                    quick = [x for x in quick if x.get('is_adult')]
                 else:
-                    quick = [x for x in quick if not _is_adult_title_group(x.get('title') or x.get('name'), x.get('group'))]
+                    quick = [x for x in quick if not x.get('is_adult')]
                 cb(100, 'OK')
                 return quick
 
         cb(4, 'Handshake')
-        client = _client(host, mac)
+        client = _client(host, mac, cancel)
 
         if content_type in ('live', 'adult'):
             cb(8, 'Genres')
@@ -915,26 +1101,40 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
 
             out = []
             seen = set()
+
+            def _keep(chans):
+                # after link resolution: the URL is part of the duplicate key
+                for ch in chans:
+                    if not ch.get('url') and ch.get('mac_link'):
+                        # placeholder until resolve_pending; the marker keeps the item
+                        ch['url'] = StalkerClient.clean_cmd(ch['mac_link'][3])
+                    if not ch.get('url'):
+                        continue
+                    key = (ch.get('channel_id') or '') + '|' + (ch.get('url') or '') + '|' + ch.get('title','')
+                    if key in seen:
+                        continue
+                    seen.add(key); out.append(ch)
+
             if rows:
                 total = len(rows) or 1
-                # Resolve local/non-direct links only when list is not enormous. Huge lists must load first.
-                resolve = total <= 400
+                chans = []
                 for i, row in enumerate(rows):
                     if not isinstance(row, dict):
                         continue
-                    if i % 80 == 0:
-                        cb(15 + int((i / float(total)) * 80), 'LIVE %d/%d' % (i, total))
-                    ch = _channel_from_live(client, row, genres, resolve=resolve)
-                    if not ch.get('url'):
-                        continue
+                    if i % 400 == 0:
+                        cb(15 + int((i / float(total)) * 20), 'LIVE %d/%d' % (i, total))
+                    ch = _channel_from_live(client, row, genres)
                     if content_type == 'adult' and not ch.get('is_adult'):
                         continue
                     if content_type == 'live' and ch.get('is_adult'):
                         continue
-                    key = (ch.get('channel_id') or '') + '|' + (ch.get('url') or '') + '|' + ch.get('title','')
-                    if key in seen:
-                        continue
-                    seen.add(key); out.append(ch)
+                    cmd = _row_cmd(row)
+                    if cmd and not _direct_url(row):
+                        _mark_pending(ch, host, mac, 'itv', cmd)
+                    chans.append(ch)
+                # big lists: links of the selected bouquets only, on export (resolve_pending)
+                _resolve_channels(client, chans, cb, 35, 60, 'LIVE links', cancel, limit=MAC_LIVE_EAGER_LINKS)
+                _keep(chans)
                 cb(100, 'OK')
                 return out
 
@@ -943,30 +1143,30 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
             if not cats:
                 cats = ['']
             total_cats = len(cats) or 1
+            chans = []
             for cidx, gid in enumerate(cats):
                 gname = genres.get(str(gid), 'XXX' if content_type == 'adult' else 'Inne')
-                cb(15 + int((cidx / float(total_cats)) * 80), 'LIVE: %s' % gname)
+                cb(15 + int((cidx / float(total_cats)) * 40), 'LIVE: %s' % gname)
                 try:
                     cat_rows = client.ordered_list('itv', gid, max_pages=MAC_MAX_LIVE_PAGES, sortby='number')
                 except Exception:
                     cat_rows = []
-                resolve = len(cat_rows) <= 350
                 for row in cat_rows:
                     if not isinstance(row, dict):
                         continue
                     if gid and not _group_matches(row, gid):
                         continue
-                    ch = _channel_from_live(client, row, genres, forced_group=gname if gid else None, resolve=resolve)
-                    if not ch.get('url'):
-                        continue
+                    ch = _channel_from_live(client, row, genres, forced_group=gname if gid else None)
                     if content_type == 'adult' and not (ch.get('is_adult') or _is_adult_category_name(gname)):
                         continue
                     if content_type == 'live' and ch.get('is_adult'):
                         continue
-                    key = (ch.get('channel_id') or '') + '|' + (ch.get('url') or '') + '|' + ch.get('title','')
-                    if key in seen:
-                        continue
-                    seen.add(key); out.append(ch)
+                    cmd = _row_cmd(row)
+                    if cmd and not _direct_url(row):
+                        _mark_pending(ch, host, mac, 'itv', cmd)
+                    chans.append(ch)
+            _resolve_channels(client, chans, cb, 55, 40, 'LIVE links', cancel, limit=MAC_LIVE_EAGER_LINKS)
+            _keep(chans)
             if out:
                 cb(100, 'OK')
                 return out
@@ -976,6 +1176,8 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
             cb(8, 'VOD categories')
             cats = client.get_genres('vod') or []
             out = []
+            # one reference tuple for the whole listing; items differ only by meta_id (tools.vod_meta)
+            meta = ('mac', host, mac, 'vod')
             total_cats = len(cats) or 1
             for cidx, cat in enumerate(cats):
                 if not isinstance(cat, dict):
@@ -984,17 +1186,22 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
                 if cid is None:
                     continue
                 group = clean_name(cat.get('title') or cat.get('name') or 'VOD')
-                cb(10 + int((cidx / float(total_cats)) * 85), 'VOD: %s' % group)
+                cb(10 + int((cidx / float(total_cats)) * 40), 'VOD: %s' % group)
                 for it in client.ordered_list('vod', cid, max_pages=MAC_MAX_VOD_PAGES, sortby='added'):
                     if not isinstance(it, dict):
                         continue
                     title = clean_name(it.get('name') or it.get('title') or 'VOD')
                     logo = _abs_logo(it.get('screenshot_uri') or it.get('poster') or it.get('cover') or it.get('logo') or '', client.portal_root)
                     cmd = it.get('cmd') or it.get('play_cmd') or it.get('command') or ''
-                    url = client.link(cmd, 'vod') or StalkerClient.clean_cmd(cmd)
+                    url = StalkerClient.clean_cmd(cmd)
                     if not url:
                         continue
-                    out.append({'title': title, 'url': url, 'group': group, 'logo': logo, 'tvg-logo': logo, 'epg': '', 'is_vod': True})
+                    ch = {'title': title, 'url': url, 'group': group, 'logo': logo, 'tvg-logo': logo, 'epg': '', 'is_vod': True,
+                          'meta': meta, 'meta_id': str(it.get('id') or '')}
+                    _mark_pending(ch, host, mac, 'vod', cmd)
+                    out.append(ch)
+            # create_link for all titles in parallel; failures keep clean_cmd + marker
+            _resolve_channels(client, out, cb, 50, 48, 'VOD links', cancel)
             cb(100, 'OK')
             return out
 
@@ -1002,6 +1209,7 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
             cb(8, 'Series categories')
             cats = client.get_genres('series') or []
             out = []
+            meta = ('mac', host, mac, 'series')
             total_cats = len(cats) or 1
             for cidx, cat in enumerate(cats):
                 if not isinstance(cat, dict):
@@ -1010,17 +1218,21 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
                 if cid is None:
                     continue
                 group = clean_name(cat.get('title') or cat.get('name') or 'Series')
-                cb(10 + int((cidx / float(total_cats)) * 85), 'SERIES: %s' % group)
+                cb(10 + int((cidx / float(total_cats)) * 40), 'SERIES: %s' % group)
                 for it in client.ordered_list('series', cid, max_pages=MAC_MAX_SERIES_PAGES, sortby='added'):
                     if not isinstance(it, dict):
                         continue
                     title = clean_name(it.get('name') or it.get('title') or 'Series')
                     logo = _abs_logo(it.get('screenshot_uri') or it.get('poster') or it.get('cover') or it.get('logo') or '', client.portal_root)
                     cmd = it.get('cmd') or it.get('play_cmd') or it.get('command') or ''
-                    url = client.link(cmd, 'series') or StalkerClient.clean_cmd(cmd)
+                    url = StalkerClient.clean_cmd(cmd)
                     if not url:
                         continue
-                    out.append({'title': title, 'url': url, 'group': group, 'logo': logo, 'tvg-logo': logo, 'epg': '', 'is_vod': True, 'type': 'series'})
+                    ch = {'title': title, 'url': url, 'group': group, 'logo': logo, 'tvg-logo': logo, 'epg': '', 'is_vod': True, 'type': 'series',
+                          'meta': meta, 'meta_id': str(it.get('id') or '')}
+                    _mark_pending(ch, host, mac, 'series', cmd)
+                    out.append(ch)
+            _resolve_channels(client, out, cb, 50, 48, 'SERIES links', cancel)
             cb(100, 'OK')
             return out
 
@@ -1029,40 +1241,28 @@ def parse_mac_playlist(host, mac, content_type='live', progress_callback=None):
         raise Exception(translate_error(e, host))
 
 
+def _m3u_channel(title, url, group, logo, epg_id, name):
+    title = clean_name(name or title)
+    group = clean_name(group or 'Main')
+    return {
+        'title': title,
+        'url': url,
+        'group': group,
+        'logo': logo,
+        'tvg-logo': logo,
+        'epg': '',
+        'epg_id': epg_id,
+        'tvg-id': epg_id,
+        'is_adult': _is_adult_title_group(title, group),
+    }
+
+
+# Wspólny silnik M3U: kanał tylko z #EXTINF, tytuł z tvg-name, domyślna grupa 'Main'.
+_M3U_ENGINE = M3UEngine(emit=_m3u_channel, default_group='Main', require_extinf=True, keep_name=True)
+
+
 def parse_m3u_text(content):
-    channels = []
-    current = {}
-    attr_re = re.compile(r'([\w-]+)="(.*?)"')
-    for line in (content or '').splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith('#EXTINF'):
-            title = line.rsplit(',', 1)[1].strip() if ',' in line else 'No Name'
-            attrs = {}
-            try:
-                attrs = {k.lower(): v for k, v in attr_re.findall(line.split(',', 1)[0])}
-            except Exception:
-                attrs = {}
-            current = {
-                'title': clean_name(attrs.get('tvg-name') or title),
-                'group': clean_name(attrs.get('group-title') or attrs.get('group') or 'Main'),
-                'logo': attrs.get('tvg-logo') or attrs.get('logo') or '',
-                'epg_id': attrs.get('tvg-id') or attrs.get('epg-id') or attrs.get('id') or ''
-            }
-        elif (line.startswith('http') or '://' in line) and current:
-            logo = current.get('logo') or ''
-            epg_id = current.get('epg_id') or ''
-            channels.append({
-                'title': current.get('title') or 'No Name',
-                'url': line,
-                'group': current.get('group') or 'Main',
-                'logo': logo,
-                'tvg-logo': logo,
-                'epg': '',
-                'epg_id': epg_id,
-                'tvg-id': epg_id,
-                'is_adult': _is_adult_title_group(current.get('title'), current.get('group')),
-            })
-            current = {}
-    return channels
+    """Parsuje M3U (bytes albo str) do listy kanałów w formacie portalu MAC."""
+    if not content:
+        return []
+    return _M3U_ENGINE.parse(content)
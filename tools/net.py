@@ -3,26 +3,54 @@
 
 Provides:
 - timeouts (connect/read)
-- retries with exponential backoff
+- retries with decorrelated-jitter backoff, Retry-After and an overall deadline
 - safer headers for IPTV/M3U servers
 - consistent and user-friendly network errors
+- shared sessions with per-host connection pools and keep-alive learning
+
+Keep-alive: every session from ``get_session_registry()`` sends requests
+through one shared adapter, so picon batches, MAC portal paging and M3U
+refreshes reuse TCP/TLS connections per host. Some cheap panels/load
+balancers drop kept-alive connections (RemoteDisconnected); such hosts are
+downgraded to ``Connection: close`` after ``KEEPALIVE_STRIKES`` failures and
+the request is retried once right away. The learned table is saved to
+``KEEPALIVE_FILE`` (flash, survives reboots) and re-probed after
+``KEEPALIVE_REPROBE`` seconds.
+
+Circuit breaker: ``HealthTracker`` records per-host latency histograms and
+failures (connection errors, timeouts, HTTP 5xx). After ``CIRCUIT_FAILURES``
+consecutive failures the host's circuit opens for ``CIRCUIT_COOLDOWN``
+seconds: requests fail at once with NET-CIRCUIT-OPEN instead of waiting
+out (connect, read) x (retries + 1). Then a single probe request is let
+through (half-open); its result closes or re-opens the circuit.
 """
 
 from __future__ import absolute_import, print_function
 
+import json
+import os
+import random
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Py2
+    from urlparse import urlsplit
 
 from .logger import get_logger, mask_sensitive
 
 
 class NetError(Exception):
-    """Tagged network error with a short code."""
+    """Tagged network error with a short code (``retry_after``: seconds from a Retry-After header)."""
 
-    def __init__(self, code, message):
+    def __init__(self, code, message, retry_after=None):
         super(NetError, self).__init__("%s: %s" % (code, message))
         self.code = code
         self.message = message
+        self.retry_after = retry_after
 
 
 DEFAULT_HEADERS = {
@@ -30,12 +58,423 @@ DEFAULT_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
     'Accept': '*/*',
     'Accept-Encoding': 'gzip, deflate',
-    # Keep-alive is a common reason for RemoteDisconnected on cheap panels/load balancers.
-    'Connection': 'close',
+    # Connection is decided per host by the shared adapter (keep-alive unless learned otherwise).
     'Cache-Control': 'no-cache',
     'Pragma': 'no-cache',
 }
 
+KEEPALIVE_FILE = "/etc/enigma2/iptvdream_v6_net_hosts.json"
+# RemoteDisconnected on a kept-alive connection can also be a one-off idle-timeout race;
+# one strike per KEEPALIVE_WINDOW is forgiven (the request is retried with "close" anyway).
+KEEPALIVE_STRIKES = 2
+KEEPALIVE_WINDOW = 3600
+KEEPALIVE_REPROBE = 7 * 86400
+# Host pools kept (LRU) and connections per host (picon batches use up to 12 threads).
+POOL_HOSTS = 32
+POOL_PER_HOST = 12
+_IDEMPOTENT = ('GET', 'HEAD', 'OPTIONS')
+
+CIRCUIT_FAILURES = 5
+CIRCUIT_COOLDOWN = 30.0
+# A half-open probe that never reports back (cancelled) must not block the host forever.
+CIRCUIT_PROBE_TIMEOUT = 120.0
+# Latency histogram bucket upper bounds in seconds (+ one overflow bucket).
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _host_of(url):
+    try:
+        return (urlsplit(url).netloc or '').lower()
+    except Exception:
+        return ''
+
+
+def _is_keepalive_failure(exc):
+    """RemoteDisconnected: the server closed a connection without answering (typical keep-alive drop)."""
+    s = str(exc).lower()
+    return 'remotedisconnected' in s or 'remote end closed connection without response' in s
+
+
+class KeepAliveTable(object):
+    """Per-host keep-alive capability, learned from RemoteDisconnected and persisted as JSON."""
+
+    def __init__(self, path=KEEPALIVE_FILE, strikes=KEEPALIVE_STRIKES, reprobe=KEEPALIVE_REPROBE):
+        self.path = path
+        self.strikes = max(1, int(strikes))
+        self.reprobe = reprobe
+        self._lock = threading.Lock()
+        self._hosts = {}   # host -> {"close": bool, "since": ts, "failures": n}
+        self._load()
+
+    def _load(self):
+        try:
+            if self.path and os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._hosts = dict((k, v) for k, v in data.items() if isinstance(v, dict))
+        except Exception:
+            self._hosts = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = dict((k, dict(v)) for k, v in self._hosts.items() if v.get('close'))
+        try:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def use_close(self, host):
+        """True when ``host`` should get Connection: close."""
+        entry = self._hosts.get(host)
+        if not entry or not entry.get('close'):
+            return False
+        if self.reprobe and time.time() - float(entry.get('since', 0)) > self.reprobe:
+            # give keep-alive another chance (panels get upgraded/moved)
+            with self._lock:
+                self._hosts.pop(host, None)
+            self._save()
+            return False
+        return True
+
+    def record_failure(self, host):
+        """Counts a keep-alive drop; returns True when the host was just downgraded."""
+        with self._lock:
+            now = time.time()
+            entry = self._hosts.setdefault(host, {'close': False, 'failures': 0, 'first': now})
+            if entry.get('close'):
+                return False
+            if now - float(entry.get('first', 0)) > KEEPALIVE_WINDOW:
+                entry['failures'], entry['first'] = 0, now
+            entry['failures'] = int(entry.get('failures', 0)) + 1
+            if entry['failures'] < self.strikes:
+                return False
+            entry['close'] = True
+            entry['since'] = now
+        self._save()
+        return True
+
+    def closed_hosts(self):
+        with self._lock:
+            return sorted(h for h, v in self._hosts.items() if v.get('close'))
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """Raised by the shared adapter while the host's circuit is open (http_get: NET-CIRCUIT-OPEN)."""
+
+
+class _HostHealth(object):
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.consecutive = 0
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self.hist = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.last_error = ''
+
+    def percentile(self, q):
+        """Upper bound (s) of the histogram bucket holding the ``q`` quantile; None without data."""
+        total = sum(self.hist)
+        if not total:
+            return None
+        need = q * total
+        seen = 0
+        for i, n in enumerate(self.hist):
+            seen += n
+            if seen >= need:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float('inf')
+        return float('inf')
+
+
+class HealthTracker(object):
+    """Per-host latency histograms, failure rates and circuit breaker state (thread-safe)."""
+
+    def __init__(self, failures=CIRCUIT_FAILURES, cooldown=CIRCUIT_COOLDOWN, probe_timeout=CIRCUIT_PROBE_TIMEOUT):
+        self.threshold = max(1, int(failures))
+        self.cooldown = float(cooldown)
+        self.probe_timeout = float(probe_timeout)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host):
+        h = self._hosts.get(host)
+        if h is None:
+            h = self._hosts[host] = _HostHealth()
+        return h
+
+    def is_open(self, host):
+        """True while the circuit is open and still cooling down (no side effects)."""
+        h = self._hosts.get(host)
+        return h is not None and h.state == 'open' and time.time() - h.opened_at < self.cooldown
+
+    def allow(self, host):
+        """May a request to ``host`` go out now? Open -> half-open after the cooldown (one probe)."""
+        if not host:
+            return True
+        now = time.time()
+        with self._lock:
+            h = self._get(host)
+            if h.state == 'closed':
+                return True
+            if h.state == 'open' and now - h.opened_at >= self.cooldown:
+                h.state = 'half-open'
+                h.probe_at = now
+                return True
+            if h.state == 'half-open' and now - h.probe_at >= self.probe_timeout:
+                h.probe_at = now
+                return True
+            h.rejected += 1
+            return False
+
+    def record(self, host, latency, ok, error=''):
+        if not host:
+            return
+        log = None
+        with self._lock:
+            h = self._get(host)
+            h.requests += 1
+            if ok:
+                i = 0
+                while i < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[i]:
+                    i += 1
+                h.hist[i] += 1
+                h.latency_sum += latency
+                h.consecutive = 0
+                if h.state != 'closed':
+                    h.state = 'closed'
+                    log = "Circuit closed for %s" % host
+            else:
+                h.failures += 1
+                h.consecutive += 1
+                h.last_error = error or ''
+                if h.state == 'half-open' or (h.state == 'closed' and h.consecutive >= self.threshold):
+                    h.state = 'open'
+                    h.opened_at = time.time()
+                    h.opens += 1
+                    log = "Circuit open for %s (%d failures, last: %s), cooldown %ds" % (
+                        host, h.consecutive, mask_sensitive(error), self.cooldown)
+        if log:
+            get_logger("IPTVDream.NET").warning(log)
+
+    def reset(self, host=None):
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+    def stats(self):
+        """List of per-host dicts (busiest first) for the statistics screen."""
+        with self._lock:
+            out = []
+            for host, h in self._hosts.items():
+                ok = sum(h.hist)
+                out.append({
+                    'host': host,
+                    'state': h.state,
+                    'requests': h.requests,
+                    'failures': h.failures,
+                    'failure_rate': (h.failures / float(h.requests)) if h.requests else 0.0,
+                    'rejected': h.rejected,
+                    'opens': h.opens,
+                    'avg': (h.latency_sum / ok) if ok else None,
+                    'p50': h.percentile(0.5),
+                    'p95': h.percentile(0.95),
+                    'histogram': list(zip(LATENCY_BUCKETS + (float('inf'),), h.hist)),
+                    'last_error': h.last_error,
+                })
+        out.sort(key=lambda d: -d['requests'])
+        return out
+
+
+_HEALTH = HealthTracker()
+
+
+def get_health_tracker():
+    return _HEALTH
+
+
+def network_health():
+    """Per-host health snapshot (``HealthTracker.stats``)."""
+    return _HEALTH.stats()
+
+
+def _short_error(exc):
+    return ('%s: %s' % (exc.__class__.__name__, exc))[:160]
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter shared by all registry sessions: per-host pools, keep-alive downgrade, circuit breaker."""
+
+    def __init__(self, table, health=None, **kwargs):
+        self.table = table
+        self.health = health or get_health_tracker()
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def send(self, request, **kwargs):
+        host = _host_of(request.url)
+        if not self.health.allow(host):
+            raise CircuitOpen("circuit open for %s" % host, request=request)
+        t0 = time.time()
+        try:
+            resp = self._send(request, host, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.health.record(host, time.time() - t0, False, _short_error(e))
+            raise
+        # latency = time to response headers (bodies of stream=True requests are read later)
+        sc = resp.status_code
+        self.health.record(host, time.time() - t0, sc < 500, "HTTP %d" % sc if sc >= 500 else '')
+        return resp
+
+    def _send(self, request, host, **kwargs):
+        close = (request.headers.get('Connection') or '').lower() == 'close'
+        if not close and self.table.use_close(host):
+            request.headers['Connection'] = 'close'
+            close = True
+        try:
+            resp = HTTPAdapter.send(self, request, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            if close or not _is_keepalive_failure(e):
+                raise
+            if self.table.record_failure(host):
+                get_logger("IPTVDream.NET").info("Keep-alive disabled for %s (RemoteDisconnected)", host)
+            if request.method not in _IDEMPOTENT:
+                raise
+            request.headers['Connection'] = 'close'
+            return HTTPAdapter.send(self, request, **kwargs)
+        return resp
+
+    def close(self):
+        # Session.close() of one consumer must not drop the pools of all others.
+        pass
+
+    def shutdown(self):
+        HTTPAdapter.close(self)
+
+
+class SessionRegistry(object):
+    """Sessions sharing one adapter: own cookies/headers per consumer, common per-host pools."""
+
+    def __init__(self, hosts_file=KEEPALIVE_FILE, pool_hosts=POOL_HOSTS, pool_per_host=POOL_PER_HOST):
+        self.hosts = KeepAliveTable(hosts_file)
+        self.adapter = _KeepAliveAdapter(self.hosts, pool_connections=pool_hosts, pool_maxsize=pool_per_host)
+        self._named = {}
+        self._lock = threading.Lock()
+
+    def new_session(self, headers=None):
+        """Fresh session (separate cookies, e.g. one per MAC portal account) on the shared pools."""
+        s = requests.Session()
+        s.mount('http://', self.adapter)
+        s.mount('https://', self.adapter)
+        if headers:
+            s.headers.update(headers)
+        return s
+
+    def session(self, name='default'):
+        """Named session shared by all callers (plain downloads without cookies of their own)."""
+        with self._lock:
+            s = self._named.get(name)
+            if s is None:
+                s = self._named[name] = self.new_session()
+            return s
+
+    def shutdown(self):
+        self.adapter.shutdown()
+
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_session_registry():
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = SessionRegistry()
+    return _REGISTRY
+
+
+def new_session(headers=None):
+    """Shortcut: ``get_session_registry().new_session(headers)``."""
+    return get_session_registry().new_session(headers)
+
+
+# Decorrelated jitter: next sleep is uniform(backoff, 3 * previous sleep), capped.
+BACKOFF_CAP = 30.0
+# Without a deadline a Retry-After longer than this ends the retries instead of blocking the caller.
+RETRY_AFTER_MAX = 60.0
+# An attempt needs at least this much of the remaining budget to be worth starting.
+MIN_ATTEMPT_TIME = 1.0
+
+
+def _retry_after(headers):
+    """Retry-After header (delta-seconds or HTTP-date) in seconds, or None."""
+    try:
+        value = (headers.get('Retry-After') or '').strip()
+    except Exception:
+        return None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_tz, mktime_tz
+        return max(0.0, mktime_tz(parsedate_tz(value)) - time.time())
+    except Exception:
+        return None
+
+
+class RetryBudget(object):
+    """Delays between attempts of one call: decorrelated jitter, Retry-After and an overall deadline.
+
+    ``next_delay()`` returns the sleep before the next attempt, or None when the remaining
+    budget cannot cover the sleep plus ``MIN_ATTEMPT_TIME`` (the caller gives up early).
+    ``clamp()`` shortens the (connect, read) timeout of an attempt to the remaining budget.
+    """
+
+    def __init__(self, backoff, deadline=None, cap=BACKOFF_CAP):
+        self.base = max(0.0, float(backoff or 0))
+        self.cap = max(self.base, float(cap))
+        self.prev = self.base
+        self.end = (time.time() + float(deadline)) if deadline else None
+
+    def remaining(self):
+        return None if self.end is None else self.end - time.time()
+
+    def next_delay(self, retry_after=None):
+        delay = random.uniform(self.base, min(self.cap, self.prev * 3)) if self.base > 0 else 0.0
+        self.prev = max(delay, self.base)
+        if retry_after is not None:
+            # the server said when to come back; earlier attempts would only be refused again
+            if self.end is None and retry_after > RETRY_AFTER_MAX:
+                return None
+            delay = retry_after
+        left = self.remaining()
+        if left is not None and left - delay < MIN_ATTEMPT_TIME:
+            return None
+        return delay
+
+    def clamp(self, timeout):
+        left = self.remaining()
+        if left is None:
+            return timeout
+        left = max(MIN_ATTEMPT_TIME, left)
+        return (min(timeout[0], left), min(timeout[1], left))
+
 
 def _default_timeout(timeout):
     # requests supports a (connect, read) tuple
@@ -118,37 +557,66 @@ def _is_connection_abort(exc):
 
 
 def http_get(url, session=None, headers=None, timeout=None, retries=2, backoff=0.8,
-             stream=False, verify=False, allow_redirects=True, debug=False, log_file=None):
-    """HTTP GET with retries. Returns requests.Response."""
+             stream=False, verify=False, allow_redirects=True, debug=False, log_file=None, cancel=None,
+             deadline=None):
+    """HTTP GET with retries. Returns requests.Response.
+
+    ``cancel`` (tools.cancel.CancelToken): checked before every attempt, cuts the retry
+    backoff short and closes the returned response when the operation is cancelled.
+    ``deadline``: total time budget in seconds for all attempts and sleeps (see RetryBudget);
+    with ``stream=True`` it covers getting the response, not reading the body.
+    """
     logger = get_logger("IPTVDream.NET", log_file=log_file, debug=debug)
     timeout = _default_timeout(timeout)
     req_headers = _merge_headers(headers)
+    host = _host_of(url)
+    budget = RetryBudget(backoff, deadline)
 
     last_exc = None
     total_attempts = max(0, int(retries)) + 1
 
     for attempt in range(0, total_attempts):
-        try:
-            if attempt > 0:
-                sleep_s = float(backoff) * (2 ** (attempt - 1))
-                try:
+        if attempt > 0:
+            if get_health_tracker().is_open(host):
+                # the failures so far opened the circuit - no point in sleeping and retrying
+                logger.warning("NET-CIRCUIT-OPEN for %s", mask_sensitive(url))
+                raise NetError("NET-CIRCUIT-OPEN", "circuit open for %s" % host)
+            sleep_s = budget.next_delay(getattr(last_exc, 'retry_after', None))
+            if sleep_s is None:
+                logger.warning("Retry budget exhausted for %s after %d attempt(s)", mask_sensitive(url), attempt)
+                raise last_exc
+            try:
+                if cancel is not None:
+                    cancel.wait(sleep_s)
+                else:
                     time.sleep(sleep_s)
-                except Exception:
-                    pass
+            except Exception:
+                pass
+        if cancel is not None:
+            cancel.check()
 
-            s = session or requests
+        try:
+            s = session or get_session_registry().session()
             logger.debug("GET %s (attempt %d/%d)", mask_sensitive(url), attempt + 1, total_attempts)
             resp = s.get(
                 url,
                 headers=req_headers,
-                timeout=timeout,
+                timeout=budget.clamp(timeout),
                 stream=bool(stream),
                 verify=bool(verify),
                 allow_redirects=bool(allow_redirects),
             )
+            if cancel is not None:
+                cancel.track(resp)
 
             if resp.status_code >= 400:
-                raise NetError("NET-HTTP-%d" % resp.status_code, _http_message(resp))
+                err = NetError("NET-HTTP-%d" % resp.status_code, _http_message(resp),
+                               retry_after=_retry_after(resp.headers))
+                # the error response is dropped here - release it and its connection
+                if cancel is not None:
+                    cancel.untrack(resp)
+                resp.close()
+                raise err
 
             return resp
 
@@ -166,6 +634,11 @@ def http_get(url, session=None, headers=None, timeout=None, retries=2, backoff=0
             if attempt >= int(retries) or not retryable:
                 raise
 
+        except CircuitOpen as e:
+            # fail fast: no retries while the host is known to be down
+            logger.warning("NET-CIRCUIT-OPEN for %s", mask_sensitive(url))
+            raise NetError("NET-CIRCUIT-OPEN", str(e))
+
         except requests.exceptions.Timeout:
             last_exc = NetError("NET-TIMEOUT", "Timeout")
             logger.warning("NET-TIMEOUT for %s", mask_sensitive(url))
@@ -173,17 +646,17 @@ def http_get(url, session=None, headers=None, timeout=None, retries=2, backoff=0
                 raise last_exc
 
         except requests.exceptions.RequestException as e:
-            last_exc = e
             code = "NET-ABORTED" if _is_connection_abort(e) else "NET-REQUEST"
+            last_exc = NetError(code, str(e))
             logger.warning("%s for %s (%s)", code, mask_sensitive(url), mask_sensitive(e))
             if attempt >= int(retries):
-                raise NetError(code, str(e))
+                raise last_exc
 
         except Exception as e:
-            last_exc = e
             code = "NET-ABORTED" if _is_connection_abort(e) else "NET-UNKNOWN"
+            last_exc = NetError(code, str(e))
             logger.warning("%s for %s (%s)", code, mask_sensitive(url), mask_sensitive(e))
             if attempt >= int(retries):
-                raise NetError(code, str(e))
+                raise last_exc
 
     raise NetError("NET-FAILED", str(last_exc) if last_exc else "Unknown")
@@ -16,6 +16,24 @@ except Exception:
     normalize_channel_key = None
     channel_name_variants = None
 
+try:
+    from ..core.cache_manager import get_cache_manager
+except Exception:
+    get_cache_manager = None
+
+try:
+    from .net import get_session_registry, http_get
+except Exception:
+    get_session_registry = None
+    http_get = None
+
+from .progress import as_dispatcher
+from .singleflight import SingleFlight
+from .governor import get_governor, url_host, PRIO_BACKGROUND
+
+# Jeden URL logo bywa wspólny dla kilkudziesięciu wariantów kanału (HD/FHD/kraj) - pobierany raz.
+_PICON_FLIGHTS = SingleFlight()
+
 try:
     from PIL import Image, ImageDraw, ImageFont
     PIL_AVAILABLE = True
@@ -54,10 +72,13 @@ class PiconManager:
         os.makedirs(self.picon_dir, exist_ok=True)
         os.makedirs(self.cache_dir, exist_ok=True)
         os.makedirs(self.temp_dir, exist_ok=True)
+        # Wspólny budżet cache w /tmp (None gdy moduł niedostępny)
+        self.cache = get_cache_manager() if get_cache_manager else None
         
         # Konfiguracja
         self.config = self.load_config()
-        self.session = requests.Session()
+        # wspólne pule połączeń per host (keep-alive między kolejnymi piconami)
+        self.session = get_session_registry().new_session() if get_session_registry else requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'image/*',
@@ -100,6 +121,7 @@ class PiconManager:
             "cache_enabled": True,
             "cache_max_age": 86400,
             "download_timeout": 10,
+            "download_deadline": 20,
             "max_concurrent_downloads": 5,
             "fallback_colors": True,
             "quality_preference": "high",
@@ -135,12 +157,14 @@ class PiconManager:
         if not url or not channel_name:
             return None
         
+        cache_key = self.get_cache_key(url)
         # Sprawdź cache
         if self.config.get("cache_enabled", True):
-            cache_key = self.get_cache_key(url)
             cache_file = os.path.join(self.cache_dir, f"{cache_key}.png")
             
             if self.is_cache_valid(cache_file):
+                if self.cache:
+                    self.cache.hit(cache_file)
                 safe_name = _safe_picon_basename(channel_name)
                 picon_file = os.path.join(self.picon_dir, f"{safe_name}.png")
                 try:
@@ -150,6 +174,8 @@ class PiconManager:
                     return picon_file
                 except Exception:
                     return cache_file
+            if self.cache:
+                self.cache.miss()
         
         # Bezpieczna nazwa pliku
         safe_name = _safe_picon_basename(channel_name)
@@ -159,15 +185,44 @@ class PiconManager:
         if os.path.exists(picon_file):
             if self.config.get("cache_enabled", True):
                 # Kopiuj do cache
-                import shutil
-                shutil.copy2(picon_file, cache_file)
+                self._store_in_cache(picon_file, cache_file)
             return picon_file
         
+        def _download(_progress):
+            # picony są tłem: ustępują playliście i zwalniają, gdy gra strumień (tools.governor)
+            with get_governor().slot(url_host(url), PRIO_BACKGROUND):
+                return self._download_picon_file(url, cache_key, channel_name, picon_file)
+
+        result, shared = _PICON_FLIGHTS.do(url, _download)
+        if result and shared and result != picon_file:
+            # obraz pobrał równoległy wątek dla innej nazwy kanału - tylko kopia pod własną nazwą
+            try:
+                import shutil
+                shutil.copy2(result, picon_file)
+                return picon_file
+            except Exception:
+                return result
+        if result:
+            return result
+
+        # Fallback na generowany picon tylko jeśli Pillow jest dostępne.
+        if self.config.get("generate_fallback", True) and PIL_AVAILABLE:
+            return self.generate_picon(channel_name)
+        return None
+
+    def _download_picon_file(self, url, cache_key, channel_name, picon_file):
+        """Pobiera obraz z ``url`` do ``picon_file``; zwraca ścieżkę albo None po błędzie."""
+        cache_file = os.path.join(self.cache_dir, f"{cache_key}.png")
         try:
             # Pobieranie z timeout
             timeout = self.config.get("download_timeout", 10)
-            response = self.session.get(url, timeout=timeout, stream=True)
-            response.raise_for_status()
+            if http_get:
+                # jedna ponowna próba w krótkim budżecie - brak jednego picona nie może blokować paczki
+                response = http_get(url, session=self.session, headers={'Accept': 'image/*'}, timeout=timeout,
+                                    stream=True, retries=1, deadline=self.config.get("download_deadline", 20))
+            else:
+                response = self.session.get(url, timeout=timeout, stream=True)
+                response.raise_for_status()
             
             # Sprawdź czy to obraz
             content_type = response.headers.get('content-type', '').lower()
@@ -177,7 +232,7 @@ class PiconManager:
             # Zapisz plik tymczasowy
             temp_file = os.path.join(self.temp_dir, f"temp_{cache_key}.png")
             with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+                for chunk in get_governor().iter_content(response, 8192, PRIO_BACKGROUND):
                     f.write(chunk)
             
             if PIL_AVAILABLE:
@@ -188,8 +243,7 @@ class PiconManager:
                     os.rename(processed_file, picon_file)
                     # Cache
                     if self.config.get("cache_enabled", True):
-                        import shutil
-                        shutil.copy2(picon_file, cache_file)
+                        self._store_in_cache(picon_file, cache_file)
                     # Wyczyść tymczasowy
                     try:
                         os.remove(temp_file)
@@ -200,19 +254,21 @@ class PiconManager:
                 # Pillow is optional: keep downloaded picons usable even without resize/generation.
                 os.rename(temp_file, picon_file)
                 if self.config.get("cache_enabled", True):
-                    import shutil
-                    shutil.copy2(picon_file, cache_file)
+                    self._store_in_cache(picon_file, cache_file)
                 return picon_file
             
         except Exception as e:
             print(f"[PiconManager] Błąd pobierania picon dla {channel_name}: {e}")
-            
-            # Fallback na generowany picon tylko jeśli Pillow jest dostępne.
-            if self.config.get("generate_fallback", True) and PIL_AVAILABLE:
-                return self.generate_picon(channel_name)
         
         return None
 
+    def _store_in_cache(self, picon_file, cache_file):
+        """Kopiuje picon do cache i rejestruje go w budżecie cache (LRU)."""
+        import shutil
+        shutil.copy2(picon_file, cache_file)
+        if self.cache:
+            self.cache.record(cache_file)
+
     def _process_picon(self, image_file, channel_name):
         """Przetwarza pobrany obraz picon."""
         try:
@@ -350,6 +406,7 @@ class PiconManager:
 
     def download_picons_batch(self, channels, progress_callback=None):
         """Pobiera pikony dla listy kanałów."""
+        progress_callback = as_dispatcher(progress_callback)
         total = len(channels)
         downloaded = 0
         failed = 0
@@ -369,7 +426,7 @@ class PiconManager:
                     failed += 1
             
             # Progress callback
-            if progress_callback and i % 5 == 0:
+            if progress_callback:
                 progress = (i / total) * 100
                 progress_callback(progress, f"Pobieranie picon: {i}/{total}")
         
@@ -383,6 +440,11 @@ class PiconManager:
     def cleanup_cache(self, max_age=86400):
         """Czyści przeterminowane pliki picon."""
         try:
+            if self.cache:
+                # indeks menadżera cache: bez listdir/getmtime, przy okazji egzekwuje budżet
+                self.cache.cleanup(max_age, roots=(self.cache_dir,))
+                self.cache.enforce()
+                return True
             if os.path.exists(self.cache_dir):
                 for filename in os.listdir(self.cache_dir):
                     if filename.endswith('.png'):
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - Progress dispatch helpers
+
+Long operations (playlist download/parse, MAC portal, picons, EPG) report
+progress from worker threads. Forwarding every update with
+``reactor.callFromThread`` costs one cross-thread call and one GUI redraw
+per chunk/channel, which grows with the size of the list.
+
+``ProgressDispatcher`` keeps only the latest value and delivers it on the
+reactor thread at most ``max_rate`` times per second:
+- thread-safe: may be called from any thread (including the reactor),
+- coalescing: intermediate updates between two deliveries are dropped,
+- trailing edge: the last reported value is always delivered,
+- ``final()`` delivers immediately, bypassing the rate limit.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+
+from twisted.internet import reactor
+
+DEFAULT_MAX_RATE = 10.0
+
+
+class ProgressDispatcher(object):
+    """Coalescing, rate-limited ``callback(value, text)`` running on the reactor thread."""
+
+    def __init__(self, callback, max_rate=DEFAULT_MAX_RATE):
+        self.callback = callback
+        self.interval = 1.0 / max_rate if max_rate and max_rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._pending = None
+        self._armed = False
+        self._last_time = 0.0
+        self._last_value = None
+        self.received = 0
+        self.delivered = 0
+
+    def __call__(self, value, text=""):
+        with self._lock:
+            self.received += 1
+            self._pending = (value, text)
+            if self._armed:
+                return
+            self._armed = True
+        try:
+            reactor.callFromThread(self._arm)
+        except Exception:
+            with self._lock:
+                self._armed = False
+
+    def final(self, value=100, text=""):
+        """Delivers ``value`` right away (end of operation); pending updates are superseded."""
+        with self._lock:
+            self.received += 1
+            self._pending = (value, text)
+        try:
+            reactor.callFromThread(self._flush)
+        except Exception:
+            pass
+
+    def reset(self):
+        """Forgets pending and last delivered values (start of a new operation)."""
+        with self._lock:
+            self._pending = None
+            self._last_value = None
+
+    def _arm(self):
+        # reactor thread
+        delay = self._last_time + self.interval - time.time()
+        if delay > 0:
+            reactor.callLater(delay, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self):
+        # reactor thread
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._armed = False
+        if pending is None:
+            return
+        self._last_time = time.time()
+        if pending == self._last_value:
+            return
+        self._last_value = pending
+        self.delivered += 1
+        try:
+            self.callback(*pending)
+        except Exception:
+            pass
+
+
+def as_dispatcher(callback, max_rate=DEFAULT_MAX_RATE):
+    """Wraps a progress callback in a ProgressDispatcher (None and dispatchers pass through)."""
+    if callback is None or isinstance(callback, ProgressDispatcher):
+        return callback
+    return ProgressDispatcher(callback, max_rate=max_rate)
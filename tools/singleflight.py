@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - Single-flight request coalescing
+
+The GUI, the WebIF callback and auto-refresh can start loading the same
+playlist at the same moment; picon batches ask for one logo URL for dozens
+of channel variants. ``SingleFlight.do(key, fn)`` runs ``fn`` once per key
+among concurrent callers:
+- the first caller (leader) runs ``fn`` itself, in the caller's thread (no
+  extra thread is started),
+- callers arriving while it runs wait and get the same result or exception,
+- progress reported by the leader is forwarded to every waiting caller,
+- a waiting caller's own ``cancel`` token ends its wait without touching the
+  shared call,
+- if the leader is cancelled, waiting callers that were not cancelled retry
+  (one of them becomes the new leader) instead of failing with Cancelled.
+
+Only calls in flight are coalesced; nothing is cached after the call ends.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+
+from .cancel import Cancelled
+
+# Waiting callers re-check their cancel token this often (seconds).
+WAIT_POLL = 0.2
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.listeners = []
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def _progress(self, call):
+        def _fanout(*args):
+            with self._lock:
+                listeners = list(call.listeners)
+            for cb in listeners:
+                try:
+                    cb(*args)
+                except Exception:
+                    pass
+        return _fanout
+
+    def do(self, key, fn, progress=None, cancel=None):
+        """Runs ``fn(progress)`` once for all concurrent callers of ``key``.
+
+        Returns ``(result, shared)``; ``shared`` is True for callers that got the result of
+        another caller's execution (copy mutable results before changing them).
+        ``progress`` receives the leader's progress calls; ``fn`` gets a callable forwarding
+        to all of them.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.executed += 1
+                if progress is not None:
+                    call.listeners.append(progress)
+
+            if leader:
+                try:
+                    call.result = fn(self._progress(call))
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        self._calls.pop(key, None)
+                    call.done.set()
+                return call.result, False
+
+            try:
+                while not call.done.wait(WAIT_POLL):
+                    if cancel is not None:
+                        cancel.check()
+            finally:
+                with self._lock:
+                    if progress is not None and progress in call.listeners:
+                        call.listeners.remove(progress)
+
+            if isinstance(call.error, Cancelled):
+                # the leader's user gave up, this caller did not - run it again
+                if cancel is not None:
+                    cancel.check()
+                continue
+            with self._lock:
+                self.shared += 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._calls)}
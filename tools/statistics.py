@@ -9,6 +9,11 @@ import json
 import time
 from datetime import datetime, timedelta
 
+try:
+    from .net import network_health
+except Exception:
+    network_health = None
+
 class StatisticsManager:
     """Menadżer statystyk oglądania"""
     
@@ -195,7 +200,33 @@ class StatisticsManager:
             ('', ''),
             (t('📈 Miesięczne', '📈 Monthly'), ''),
             *[(month, f"{tm/3600:.1f}h") for month, tm in monthly_fmt],
+            *self._network_rows(t),
         ]
+
+    def _network_rows(self, t, limit=8):
+        """Stan serwerów z bieżącej sesji (opóźnienia, błędy, circuit breaker)."""
+        try:
+            hosts = network_health()[:limit] if network_health else []
+        except Exception:
+            hosts = []
+        if not hosts:
+            return []
+
+        def ms(v):
+            if v is None:
+                return '-'
+            if v == float('inf'):
+                return '>30 s'
+            return f"{v * 1000:.0f} ms"
+
+        states = {'open': t('NIEDOSTĘPNY', 'DOWN'), 'half-open': t('test', 'probing')}
+        rows = [('', ''), (t('🌐 Serwery (ta sesja)', '🌐 Servers (this session)'), '')]
+        for h in hosts:
+            txt = f"p50 {ms(h['p50'])}, p95 {ms(h['p95'])}, {t('błędy', 'errors')} {h['failures']}/{h['requests']}"
+            if h['state'] in states:
+                txt += f" [{states[h['state']]}]"
+            rows.append((h['host'], txt))
+        return rows
         
     def get_daily_stats(self, days=7):
         """
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - Lazy VOD / series metadata.
+
+Posters, plot, duration and episode lists are not part of the playlist:
+Xtream needs one ``get_vod_info`` / ``get_series_info`` call per item and a
+Stalker (MAC) portal one ``get_ordered_list&movie_id=`` call. Fetching them
+for every item up front is out of the question, so ``VodMeta`` fetches the
+details of one item when the GUI focuses it (or an exporter asks for it):
+- ``meta_ref(channel)`` tells where the details come from: Xtream movies by
+  their ``/movie/<user>/<pass>/<id>`` URL, Xtream series by the
+  ``xtream_series`` marker and MAC items by ``meta`` (one
+  ``("mac", host, mac, kind)`` tuple shared by a whole listing) plus the
+  per-item ``meta_id``,
+- results are stored as small JSON files in a directory managed by
+  ``core.cache_manager`` (byte budget + LRU) and expire after ``ttl``,
+- ``request`` fetches in a small worker pool and prefetches the neighbours of
+  the focused item at background priority; a newer ``request`` makes the
+  queued, not yet started jobs of older ones obsolete,
+- concurrent fetches of one item are coalesced (``SingleFlight``),
+- ``expand_series`` turns the one-row-per-series entries of the Xtream player
+  API (``xtream_series`` marker) into episode channels for the exported
+  bouquets, from the same cache; a changed ``last_modified`` refetches.
+"""
+from __future__ import absolute_import, print_function
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from urllib.parse import unquote
+except ImportError:  # Py2
+    from urllib import unquote
+
+from .governor import get_governor, url_host, PRIO_INTERACTIVE, PRIO_BACKGROUND
+from .logger import get_logger, mask_sensitive
+from .progress import as_dispatcher
+from .singleflight import SingleFlight
+from .xtream_api import XtreamClient, KIND_SERIES, KIND_VOD, DEFAULT_WORKERS as XTREAM_WORKERS, _text
+from ..core.cache_manager import META_DIR, get_cache_manager
+
+try:
+    from twisted.internet import reactor
+except Exception:  # pragma: no cover - outside Enigma2
+    reactor = None
+
+LOG = get_logger("IPTVDream.VodMeta")
+
+DEFAULT_TTL = 7 * 86400
+# Items without any details are asked again sooner (the panel may fill them in).
+EMPTY_TTL = 86400
+DEFAULT_PREFETCH = 3
+DEFAULT_WORKERS = 2
+
+_XTREAM_URL = re.compile(r"^(https?://.+?)/(movie|series)/([^/]+)/([^/]+)/([^/?#]+)\.[^/.?#]+$")
+
+
+def meta_ref(channel):
+    """Source of the details of ``channel``: ("xtream", base, user, pass, kind, id),
+    ("mac", host, mac, kind, id) or None (live channel / unknown source)."""
+    try:
+        meta = channel.get("meta")
+        meta_id = channel.get("meta_id")
+        series = channel.get("xtream_series")
+        url = channel.get("url") or ""
+    except Exception:
+        return None
+    if series:
+        m = _XTREAM_URL.match(url)
+        if m:
+            return ("xtream", m.group(1), unquote(m.group(3)), unquote(m.group(4)), KIND_SERIES, _text(series[0]))
+        return None
+    if isinstance(meta, (list, tuple)):
+        meta = tuple(_text(m) for m in meta)
+        if len(meta) == 4 and meta[0] == "mac" and meta_id:
+            return meta + (_text(meta_id),)
+        # older favorites / lists: the whole reference in one tuple per item
+        if len(meta) == 5 and meta[0] == "mac":
+            return meta
+        if len(meta) == 3 and meta[0] == "xtream":
+            m = _XTREAM_URL.match(url)
+            if m:
+                return ("xtream", m.group(1), unquote(m.group(3)), unquote(m.group(4)), meta[1], meta[2])
+        return None
+    m = _XTREAM_URL.match(url)
+    if m and m.group(2) == "movie":
+        return ("xtream", m.group(1), unquote(m.group(3)), unquote(m.group(4)), KIND_VOD, m.group(5))
+    return None
+
+
+def ref_key(ref):
+    """Cache file stem of ``ref`` (the Xtream password is not part of it)."""
+    parts = ref[:3] + ref[4:] if ref[0] == "xtream" else ref
+    return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _first(data, *keys):
+    for key in keys:
+        value = _text(data.get(key)) if isinstance(data, dict) else ""
+        if value:
+            return value
+    return ""
+
+
+def _duration(info):
+    text = _first(info, "duration", "episode_run_time", "time")
+    if text.isdigit():
+        # Xtream sends minutes in episode_run_time, MAC in time
+        return "%d min" % int(text)
+    return text
+
+
+def _details(info, title=""):
+    """Common metadata dict from an Xtream ``info`` block or a MAC list row."""
+    year = _first(info, "year", "releasedate", "releaseDate", "release_date")
+    return {
+        "title": _first(info, "name", "o_name", "title") or title,
+        "plot": _first(info, "plot", "description"),
+        "poster": _first(info, "movie_image", "cover_big", "cover", "screenshot_uri", "poster"),
+        "duration": _duration(info),
+        "year": year[:4],
+        "genre": _first(info, "genre", "genres_str"),
+        "rating": _first(info, "rating", "rating_imdb", "rating_kinopoisk"),
+        "director": _first(info, "director"),
+        "cast": _first(info, "cast", "actors"),
+        "episodes": [],
+    }
+
+
+def _xtream_episodes(episodes):
+    out = []
+    if isinstance(episodes, dict):
+        seasons = sorted(episodes.items(), key=lambda kv: int(kv[0]) if _text(kv[0]).isdigit() else 0)
+    else:
+        seasons = [(_text(i + 1), eps) for i, eps in enumerate(episodes or [])]
+    for season, eps in seasons:
+        for ep in eps or []:
+            if not isinstance(ep, dict):
+                continue
+            info = ep.get("info") if isinstance(ep.get("info"), dict) else {}
+            # id/ext/logo: enough to build the episode channels on export (expand_series)
+            out.append({"season": _text(season), "episode": _text(ep.get("episode_num")),
+                        "title": _text(ep.get("title")), "duration": _duration(info),
+                        "id": _text(ep.get("id")), "ext": _text(ep.get("container_extension")),
+                        "logo": _text(info.get("movie_image"))})
+    return out
+
+
+class MetaCache(object):
+    """One JSON file per item in ``root``; entries older than ``ttl`` count as missing."""
+
+    def __init__(self, root=META_DIR, ttl=DEFAULT_TTL):
+        self.root = root
+        self.ttl = ttl
+        self.cache = get_cache_manager()
+
+    def path(self, key):
+        return os.path.join(self.root, key + ".json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            meta = entry["meta"]
+            ttl = self.ttl if any(meta.get(k) for k in ("plot", "poster", "episodes")) else min(self.ttl, EMPTY_TTL)
+            if time.time() - float(entry["fetched"]) > ttl:
+                return None
+        except Exception:
+            return None
+        self.cache.hit(path)
+        return meta
+
+    def put(self, key, meta):
+        path = self.path(key)
+        tmp = "%s.%d.tmp" % (path, threading.current_thread().ident or 0)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"fetched": time.time(), "meta": meta}, f)
+            os.replace(tmp, path)
+            self.cache.record(path)
+        except Exception as e:
+            LOG.warning("VOD info not cached: %s", e)
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+
+
+class VodMeta(object):
+    """Lazy metadata of VOD items and series (thread-safe; callbacks run on the reactor thread)."""
+
+    def __init__(self, cache=None, workers=DEFAULT_WORKERS):
+        self.cache = cache or MetaCache()
+        self.config = {}
+        self.prefetch = DEFAULT_PREFETCH
+        self.workers = workers
+        self._pool = None
+        self._flights = SingleFlight()
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._gen = 0
+        self.fetched = 0
+
+    def configure(self, cfg):
+        """``vod_meta_ttl`` (seconds) and ``vod_meta_prefetch`` (neighbours per side) of the plugin config."""
+        self.config = cfg
+        try:
+            self.cache.ttl = int(cfg.get("vod_meta_ttl", DEFAULT_TTL))
+            self.prefetch = max(0, int(cfg.get("vod_meta_prefetch", DEFAULT_PREFETCH)))
+        except Exception:
+            pass
+
+    # ---------- clients ----------
+
+    @staticmethod
+    def _client_key(ref, priority):
+        # Xtream: base/user/pass, MAC: host/mac
+        return (ref[:4] if ref[0] == "xtream" else ref[:3]) + (priority,)
+
+    def _client(self, ref, priority):
+        key = self._client_key(ref, priority)
+        with self._lock:
+            client = self._clients.get(key)
+        if client is not None:
+            return client
+        if ref[0] == "xtream":
+            client = XtreamClient.from_config(ref[1], ref[2], ref[3], self.config)
+            # one item the user looks at - no point in the long playlist deadline
+            client.deadline = float(self.config.get("net_deadline_check", 15) or 15)
+            client.priority = priority
+        else:
+            from .mac_portal import _client as mac_client
+            client = mac_client(ref[1], ref[2])
+        with self._lock:
+            self._clients[key] = client
+        return client
+
+    # ---------- fetching ----------
+
+    def _fetch_xtream(self, ref, priority):
+        client = self._client(ref, priority)
+        kind, item_id = ref[4], ref[5]
+        if kind == KIND_SERIES:
+            data = client.series_info(item_id)
+            info = data.get("info") if isinstance(data.get("info"), dict) else {}
+            meta = _details(info)
+            meta["episodes"] = _xtream_episodes(data.get("episodes"))
+            meta["modified"] = _first(info, "last_modified")
+            return meta
+        data = client.api("get_vod_info", vod_id=item_id)
+        info = data.get("info") if isinstance(data, dict) else None
+        movie = data.get("movie_data") if isinstance(data, dict) else None
+        return _details(info if isinstance(info, dict) else {}, _first(movie or {}, "name"))
+
+    def _fetch_mac(self, ref, priority):
+        from .mac_portal import _data_list
+        client = self._client(ref, priority)
+        kind, item_id = ref[3], ref[4]
+        with get_governor().slot(url_host(client.portal_root), priority):
+            rows = _data_list(client.call(kind, "get_ordered_list", {"movie_id": item_id, "p": "1"}))
+        rows = [r for r in rows if isinstance(r, dict)]
+        if kind != KIND_SERIES:
+            row = next((r for r in rows if _text(r.get("id")) == item_id), rows[0] if rows else {})
+            return _details(row)
+        # series: one row per season, "series" lists the episode numbers
+        meta = _details(rows[0] if rows else {})
+        meta["title"] = ""  # the rows are seasons - the GUI shows the channel title
+        for season in rows:
+            for num in season.get("series") or []:
+                meta["episodes"].append({"season": _first(season, "name"), "episode": _text(num),
+                                         "title": "", "duration": ""})
+        return meta
+
+    def cached(self, channel):
+        """Cached details of ``channel`` or None (never touches the network)."""
+        ref = meta_ref(channel)
+        return self.cache.get(ref_key(ref)) if ref else None
+
+    def fetch(self, channel, priority=PRIO_INTERACTIVE, refresh=False):
+        """Details of ``channel`` (cache first unless ``refresh``); None for items without a metadata source.
+
+        Blocks on the network - call it from a worker thread.
+        """
+        ref = meta_ref(channel)
+        if ref is None:
+            return None
+        key = ref_key(ref)
+        meta = None if refresh else self.cache.get(key)
+        if meta is not None:
+            return meta
+
+        def _load(_progress):
+            fetch = self._fetch_xtream if ref[0] == "xtream" else self._fetch_mac
+            try:
+                result = fetch(ref, priority)
+            except Exception:
+                # expired MAC token / changed password: the next attempt logs in again
+                with self._lock:
+                    self._clients.pop(self._client_key(ref, priority), None)
+                raise
+            self.cache.put(key, result)
+            self.fetched += 1
+            return result
+
+        return self._flights.do(key, _load)[0]
+
+    # ---------- export ----------
+
+    def _series_episodes(self, channel):
+        """Episode channels of one ``xtream_series`` row (cached details while ``last_modified`` matches)."""
+        ref = meta_ref(channel)
+        if ref is None:
+            return []
+        marker = channel.get("xtream_series")
+        modified = _text(marker[1]) if len(marker) > 1 else ""
+        meta = self.cache.get(ref_key(ref))
+        episodes = (meta or {}).get("episodes") or []
+        if (meta is None or _text(meta.get("modified")) != modified
+                or any(not ep.get("id") for ep in episodes)):
+            # new episodes on the panel, or an entry cached before episode ids were kept
+            meta = self.fetch(channel, PRIO_INTERACTIVE, refresh=True) or {}
+            episodes = meta.get("episodes") or []
+        client = self._client(ref, PRIO_INTERACTIVE)
+        return client.episode_channels(channel.get("title", ""), channel.get("logo", ""),
+                                       channel.get("group", ""), episodes)
+
+    def expand_series(self, channels, progress_callback=None, cancel=None, workers=XTREAM_WORKERS):
+        """``channels`` with every Xtream series row replaced by its episodes, in order.
+
+        One ``get_series_info`` per series not cached yet, ``workers`` at a time. Series whose
+        episodes cannot be fetched keep their row (``xtream_series`` marker, no playable URL) for
+        the caller to drop and report. Runs in a worker thread; ``cancel`` (CancelToken) raises
+        tools.cancel.Cancelled.
+        """
+        progress_callback = as_dispatcher(progress_callback)
+        channels = list(channels or [])
+        positions = [i for i, ch in enumerate(channels) if ch.get("xtream_series")]
+        if not positions:
+            return channels
+        series = [channels[i] for i in positions]
+        lock = threading.Lock()
+        done = [0]
+
+        def _one(ch):
+            if cancel is not None:
+                cancel.check()
+            try:
+                eps = self._series_episodes(ch)
+            except Exception as e:
+                LOG.warning("Xtream series %s not expanded: %s", ch.get("title", ""), mask_sensitive(e))
+                eps = []
+            with lock:
+                done[0] += 1
+                n = done[0]
+            try:
+                if progress_callback:
+                    progress_callback(int(n * 99 / len(series)), "Series %d/%d" % (n, len(series)))
+            except Exception:
+                pass
+            return eps
+
+        with ThreadPoolExecutor(max_workers=max(1, min(int(workers or 1), len(series)))) as ex:
+            futures = [ex.submit(_one, ch) for ch in series]
+            try:
+                expanded = [f.result() for f in futures]
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
+        episodes = dict(zip(positions, expanded))
+        out = []
+        for i, ch in enumerate(channels):
+            if episodes.get(i):
+                out.extend(episodes[i])
+            else:
+                out.append(ch)
+        return out
+
+    # ---------- GUI ----------
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool.submit(fn, *args)
+
+    def request(self, channel, callback, neighbours=()):
+        """Fetches ``channel`` in the background, then ``callback(channel, meta, error)`` on the reactor thread.
+
+        ``neighbours`` (items next to the focused one) are prefetched at background priority.
+        Jobs of earlier requests that have not started yet are dropped.
+        """
+        with self._lock:
+            self._gen += 1
+            gen = self._gen
+
+        def _job(ch, priority, cb):
+            if gen != self._gen:
+                return
+            meta, err = None, None
+            try:
+                meta = self.fetch(ch, priority)
+            except Exception as e:
+                err = e
+                LOG.warning("VOD info failed for %s: %s", ch.get("title", ""), mask_sensitive(e))
+            if cb is not None and reactor is not None:
+                reactor.callFromThread(cb, ch, meta, err)
+
+        self._submit(_job, channel, PRIO_INTERACTIVE, callback)
+        for ch in neighbours:
+            if meta_ref(ch) is not None and self.cached(ch) is None:
+                self._submit(_job, ch, PRIO_BACKGROUND, None)
+
+    def cancel_pending(self):
+        """Drops queued jobs (screen closed)."""
+        with self._lock:
+            self._gen += 1
+
+
+_VOD_META = None
+_VOD_META_LOCK = threading.Lock()
+
+
+def get_vod_meta():
+    """Process-wide metadata service."""
+    global _VOD_META
+    if _VOD_META is None:
+        with _VOD_META_LOCK:
+            if _VOD_META is None:
+                _VOD_META = VodMeta()
+    return _VOD_META
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""IPTV Dream - Xtream Codes ``player_api.php`` client.
+
+``get.php?type=m3u_plus`` returns the whole account (live + every movie and
+series) even when the user wants a few live categories. The player API lets
+the plugin fetch the category lists first and then only the streams of the
+categories the user picked:
+- ``get_live_categories`` / ``get_vod_categories`` / ``get_series_categories``,
+- ``get_live_streams`` / ``get_vod_streams`` / ``get_series`` with
+  ``category_id``, fetched in parallel by a bounded pool,
+- series are listed one row per ``get_series`` entry (marker ``xtream_series``);
+  their episodes (``get_series_info``, one request per series) are expanded
+  only for the exported bouquets, through ``tools.vod_meta``,
+- stream URLs are built locally from the stream ids
+  (``/live|movie|series/<user>/<pass>/<id>.<ext>``), as the M3U dump does.
+
+Requests go through ``tools.net.http_get`` (retries, deadline, circuit
+breaker) inside a ``tools.governor`` slot.
+"""
+from __future__ import absolute_import, print_function
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from urllib.parse import urlencode, quote
+except Exception:  # pragma: no cover - Py2 fallback if ever used
+    from urllib import urlencode, quote  # type: ignore
+
+from .net import http_get, NetError
+from .governor import get_governor, url_host, PRIO_INTERACTIVE
+from .logger import get_logger, mask_sensitive
+from .progress import as_dispatcher
+from ..core.classifier import CLASSIFIER
+
+LOG = get_logger("IPTVDream.Xtream")
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = (7, 60)
+
+KIND_LIVE = "live"
+KIND_VOD = "vod"
+KIND_SERIES = "series"
+
+_CATEGORY_ACTIONS = {
+    KIND_LIVE: "get_live_categories",
+    KIND_VOD: "get_vod_categories",
+    KIND_SERIES: "get_series_categories",
+}
+_STREAM_ACTIONS = {
+    KIND_LIVE: "get_live_streams",
+    KIND_VOD: "get_vod_streams",
+    KIND_SERIES: "get_series",
+}
+_URL_PATHS = {KIND_LIVE: "live", KIND_VOD: "movie", KIND_SERIES: "series"}
+
+# Content types of the Xtream menu -> category kinds listed in the picker.
+CONTENT_KINDS = {
+    "live": (KIND_LIVE,),
+    "vod": (KIND_VOD,),
+    "series": (KIND_SERIES,),
+    "adult": (KIND_LIVE, KIND_VOD),
+    "all": (KIND_LIVE, KIND_VOD, KIND_SERIES),
+}
+
+
+def normalize_base(host):
+    """'host:8080/' or 'http://host:8080/player_api.php' -> 'http://host:8080'."""
+    base = (host or "").strip()
+    if base and "://" not in base:
+        base = "http://" + base
+    for tail in ("/player_api.php", "/get.php", "/c/", "/c"):
+        if base.endswith(tail):
+            base = base[:-len(tail)]
+    return base.rstrip("/")
+
+
+def _text(value):
+    return ("%s" % value).strip() if value is not None else ""
+
+
+def _is_adult(name, item=None):
+    if item is not None and _text(item.get("is_adult")) == "1":
+        return True
+    return CLASSIFIER.classify("", name or "").is_adult
+
+
+class XtreamClient(object):
+    """Player API of one Xtream account (thread-safe: one pool of worker threads can share it)."""
+
+    def __init__(self, host, user, password, timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.8, deadline=None,
+                 verify=False, cancel=None, debug=False, log_file=None):
+        self.base = normalize_base(host)
+        self.user = _text(user)
+        self.password = _text(password)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.verify = verify
+        self.cancel = cancel
+        self.debug = debug
+        self.log_file = log_file
+        # governor priority of the requests (background prefetch uses PRIO_BACKGROUND)
+        self.priority = PRIO_INTERACTIVE
+        self._account = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, host, user, password, cfg, cancel=None):
+        """Client with the ``net_*`` settings of the plugin config (dict-like)."""
+        def _num(key, default, conv):
+            try:
+                return conv(cfg.get(key, default))
+            except Exception:
+                return default
+        return cls(host, user, password,
+                   timeout=(_num("net_timeout_connect", 7, int), max(30, _num("net_timeout_read", 30, int))),
+                   retries=_num("net_retries", 2, int),
+                   backoff=_num("net_backoff", 0.8, float),
+                   deadline=_num("net_deadline", 120, float) or None,
+                   verify=bool(cfg.get("ssl_verify", False)),
+                   cancel=cancel,
+                   debug=bool(cfg.get("debug", False)),
+                   log_file=cfg.get("log_file", "/tmp/iptvdream.log"))
+
+    # ---------- HTTP ----------
+
+    def api_url(self, action=None, **params):
+        query = [("username", self.user), ("password", self.password)]
+        if action:
+            query.append(("action", action))
+        query.extend((k, v) for k, v in sorted(params.items()) if v not in (None, ""))
+        return "%s/player_api.php?%s" % (self.base, urlencode(query))
+
+    def api(self, action=None, **params):
+        """One player_api.php call; returns the decoded JSON (list or dict)."""
+        url = self.api_url(action, **params)
+        if self.cancel is not None:
+            self.cancel.check()
+        governor = get_governor()
+        with governor.slot(url_host(url), self.priority, self.cancel):
+            r = http_get(url, timeout=self.timeout, retries=self.retries, backoff=self.backoff,
+                         verify=self.verify, debug=self.debug, log_file=self.log_file,
+                         stream=True, cancel=self.cancel, deadline=self.deadline)
+            try:
+                body = b"".join(governor.iter_content(r, 64 * 1024, self.priority, self.cancel))
+            except Exception:
+                if self.cancel is not None:
+                    self.cancel.check()
+                raise
+            finally:
+                try:
+                    r.close()
+                except Exception:
+                    pass
+        try:
+            return json.loads(body.decode("utf-8", "replace")) if body.strip() else []
+        except ValueError:
+            raise NetError("XTREAM-JSON", "player_api.php did not return JSON (%s)" % (action or "login"))
+
+    # ---------- account ----------
+
+    def account(self):
+        """user_info/server_info of the account; NetError XTREAM-AUTH when the login is rejected."""
+        with self._lock:
+            if self._account is not None:
+                return self._account
+        data = self.api()
+        info = data.get("user_info") if isinstance(data, dict) else None
+        if not isinstance(info, dict) or _text(info.get("auth", 1)) == "0":
+            raise NetError("XTREAM-AUTH", "login rejected by %s" % self.base)
+        with self._lock:
+            self._account = data
+        return data
+
+    def live_extension(self):
+        """'ts' unless the account only allows other output formats (e.g. m3u8)."""
+        try:
+            formats = [(_text(f)).lower() for f in self.account()["user_info"].get("allowed_output_formats") or []]
+        except Exception:
+            formats = []
+        if not formats or "ts" in formats:
+            return "ts"
+        return formats[0]
+
+    # ---------- lists ----------
+
+    def categories(self, kind):
+        """[{"id", "name", "kind", "adult"}] in server order."""
+        out = []
+        for c in self.api(_CATEGORY_ACTIONS[kind]) or []:
+            if not isinstance(c, dict):
+                continue
+            cid = _text(c.get("category_id"))
+            name = _text(c.get("category_name")) or "Inne"
+            if cid:
+                out.append({"id": cid, "name": name, "kind": kind, "adult": _is_adult(name, c)})
+        return out
+
+    def streams(self, kind, category_id=None):
+        rows = self.api(_STREAM_ACTIONS[kind], category_id=category_id)
+        return [r for r in (rows or []) if isinstance(r, dict)]
+
+    def series_info(self, series_id):
+        data = self.api("get_series_info", series_id=series_id)
+        return data if isinstance(data, dict) else {}
+
+    # ---------- channels ----------
+
+    def stream_url(self, kind, stream_id, ext):
+        return "%s/%s/%s/%s/%s.%s" % (self.base, _URL_PATHS[kind], quote(self.user, safe=""),
+                                      quote(self.password, safe=""), stream_id, ext)
+
+    def channel(self, kind, item, group, live_ext="ts"):
+        """Channel dict (title/url/group/logo/epg_id) of a live or VOD stream; None without an id."""
+        sid = _text(item.get("stream_id"))
+        if not sid:
+            return None
+        ext = live_ext if kind == KIND_LIVE else (_text(item.get("container_extension")) or "mp4")
+        return {
+            "title": _text(item.get("name")) or "No Name",
+            "url": self.stream_url(kind, sid, ext),
+            "group": group,
+            "logo": _text(item.get("stream_icon")),
+            "epg_id": _text(item.get("epg_channel_id")),
+        }
+
+    def series_entry(self, item, group):
+        """One row per ``get_series`` entry; episodes are expanded on export (``VodMeta.expand_series``).
+
+        The URL is not playable - it only identifies the account and the series.
+        """
+        sid = _text(item.get("series_id"))
+        if not sid:
+            return None
+        return {
+            "title": _text(item.get("name")) or "No Name",
+            "url": self.stream_url(KIND_SERIES, sid, "series"),
+            "group": group,
+            "logo": _text(item.get("cover")),
+            "epg_id": "",
+            "xtream_series": (sid, _text(item.get("last_modified"))),
+        }
+
+    def episode_channels(self, name, logo, group, episodes):
+        """Channel dicts of the ``episodes`` of one series ({"season", "episode", "title", "id", "ext", "logo"})."""
+        out = []
+        for ep in episodes or []:
+            eid = _text(ep.get("id"))
+            if not eid:
+                continue
+            season, num = _text(ep.get("season")), _text(ep.get("episode"))
+            title = "%s S%02dE%02d" % (name, int(season) if season.isdigit() else 0, int(num) if num.isdigit() else 0)
+            ep_title = _text(ep.get("title"))
+            if ep_title and ep_title not in title:
+                title = "%s - %s" % (title, ep_title)
+            out.append({
+                "title": title,
+                "url": self.stream_url(KIND_SERIES, eid, _text(ep.get("ext")) or "mp4"),
+                "group": group,
+                "logo": _text(ep.get("logo")) or logo,
+                "epg_id": "",
+            })
+        return out
+
+
+def load_categories(client, content_type="live"):
+    """Categories offered for ``content_type`` (live/vod/series/adult/all), kinds in menu order.
+
+    ``live`` and ``vod`` skip adult categories, ``adult`` keeps only them.
+    """
+    client.account()
+    out = []
+    for kind in CONTENT_KINDS.get(content_type, CONTENT_KINDS["all"]):
+        for cat in client.categories(kind):
+            if content_type == "adult" and not cat["adult"]:
+                continue
+            if content_type in ("live", "vod", "series") and cat["adult"]:
+                continue
+            out.append(cat)
+    return out
+
+
+def load_streams(client, categories, progress_callback=None, cancel=None, max_workers=DEFAULT_WORKERS):
+    """Channel dicts of the picked ``categories`` (dicts from ``load_categories``), in their order.
+
+    Category lists are fetched by a pool of ``max_workers`` threads; series categories give one
+    row per series (no ``get_series_info`` here, see ``XtreamClient.series_entry``).
+    ``cancel`` (CancelToken) stops the pool; tools.cancel.Cancelled is raised to the caller.
+    """
+    progress_callback = as_dispatcher(progress_callback)
+    categories = [c for c in (categories or []) if isinstance(c, dict) and c.get("id")]
+    if not categories:
+        return []
+    workers = max(1, int(max_workers or 1))
+    live_ext = client.live_extension() if any(c["kind"] == KIND_LIVE for c in categories) else "ts"
+    lock = threading.Lock()
+    done = [0]
+    errors = []
+
+    def cb(pct, msg=""):
+        if cancel is not None:
+            cancel.check()
+        try:
+            if progress_callback:
+                progress_callback(int(pct), msg)
+        except Exception:
+            pass
+
+    def _step(start, span, total, label):
+        with lock:
+            done[0] += 1
+            n = done[0]
+        cb(start + span * n / float(total or 1), "%s %d/%d" % (label, n, total))
+
+    def _category(cat):
+        if cancel is not None:
+            cancel.check()
+        try:
+            rows = client.streams(cat["kind"], cat["id"])
+        except NetError as e:
+            # one broken category does not cost the others
+            LOG.warning("Xtream category %s failed: %s", cat.get("name"), mask_sensitive(e))
+            errors.append(e)
+            rows = []
+        _step(0, 95, len(categories), "Xtream")
+        return rows
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(categories))) as ex:
+        futures = [ex.submit(_category, c) for c in categories]
+        try:
+            lists = [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+    if len(errors) == len(categories):
+        raise errors[0]
+
+    out = []
+    for cat, rows in zip(categories, lists):
+        for item in rows:
+            if cat["kind"] == KIND_SERIES:
+                ch = client.series_entry(item, cat["name"])
+            else:
+                ch = client.channel(cat["kind"], item, cat["name"], live_ext)
+            if ch is not None:
+                out.append(ch)
+    cb(100, "OK")
+    return out
+
+
+def stored_categories(categories):
+    """Categories in the ``last_source`` format: [[kind, id, name], ...]."""
+    return [[c["kind"], c["id"], c.get("name", "")] for c in categories or [] if isinstance(c, dict)]
+
+
+def categories_from_stored(stored):
+    """Inverse of ``stored_categories`` (bad entries are skipped)."""
+    out = []
+    for item in stored or []:
+        try:
+            kind, cid, name = (list(item) + [""])[:3]
+        except Exception:
+            continue
+        if kind in _STREAM_ACTIONS and _text(cid):
+            out.append({"id": _text(cid), "name": _text(name) or "Inne", "kind": kind,
+                        "adult": _is_adult(name)})
+    return out
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from Screens.Screen import Screen
+from Components.MenuList import MenuList
+from Components.ActionMap import ActionMap
+from Components.Label import Label
+from Screens.VirtualKeyBoard import VirtualKeyBoard
+from .lang import _
+
+_KIND_LABELS = {"live": "LIVE", "vod": "VOD", "series": "SERIES"}
+
+
+class XtreamCategoryPicker(Screen):
+    """Wybór kategorii Xtream przed pobraniem - pobierane są tylko strumienie zaznaczonych."""
+
+    skin = """
+    <screen name="XtreamCategoryPicker" position="center,center" size="900,650" title="Xtream">
+        <eLabel position="0,0" size="900,60" backgroundColor="#202020" zPosition="-1" />
+        <widget name="title_lbl" position="0,10" size="900,40" font="Regular;30" halign="center" valign="center" foregroundColor="#ffcc00" backgroundColor="#202020" transparent="1" />
+        <widget name="filter_lbl" position="20,70" size="860,30" font="Regular;20" halign="right" foregroundColor="yellow" transparent="1" />
+        <widget name="cat_list" position="20,110" size="860,450" scrollbarMode="showOnDemand" transparent="1" />
+        <eLabel position="0,570" size="900,2" backgroundColor="#333333" />
+        <widget name="sum" position="20,580" size="860,30" font="Regular;22" halign="center" valign="center" foregroundColor="yellow"/>
+        <widget name="lbl_ok" position="20,620" size="210,30" font="Regular;20" foregroundColor="#00ff00" />
+        <widget name="lbl_green" position="240,620" size="210,30" font="Regular;20" foregroundColor="#00ff00" />
+        <widget name="lbl_yellow" position="460,620" size="210,30" font="Regular;20" foregroundColor="#ffff00" />
+        <widget name="lbl_blue" position="680,620" size="210,30" font="Regular;20" foregroundColor="#00ccff" />
+    </screen>
+    """
+
+    def __init__(self, session, categories, selected=None, lang="pl"):
+        Screen.__init__(self, session)
+        self.session = session
+        self.lang = lang
+        self.categories = list(categories or [])
+        self.current = list(range(len(self.categories)))
+        wanted = set((c[0], c[1]) for c in (selected or []))
+        self.selected = set(i for i, c in enumerate(self.categories) if (c["kind"], c["id"]) in wanted)
+        self.filter_text = ""
+
+        self["title_lbl"] = Label(_("xtream_cat_title", self.lang))
+        self["filter_lbl"] = Label("")
+        self["cat_list"] = MenuList([], enableWrapAround=True)
+        self["sum"] = Label("")
+        self["lbl_ok"] = Label(_("xtream_cat_ok", self.lang))
+        self["lbl_green"] = Label(_("xtream_cat_all", self.lang))
+        self["lbl_yellow"] = Label(_("ŻÓŁTY = Szukaj", self.lang))
+        self["lbl_blue"] = Label(_("xtream_cat_load", self.lang))
+
+        self["actions"] = ActionMap(["ColorActions", "OkCancelActions"], {
+            "ok": self.toggleSelect,
+            "green": self.toggleAll,
+            "yellow": self.openSearch,
+            "blue": self.save,
+            "red": self.cancel,
+            "cancel": self.cancel,
+        }, -1)
+
+        self.onLayoutFinish.append(self.refreshList)
+
+    def refreshList(self, index=0):
+        items = []
+        for i in self.current:
+            c = self.categories[i]
+            prefix = "[ X ]" if i in self.selected else "[   ]"
+            items.append("%s %s  (%s)" % (prefix, c["name"], _KIND_LABELS.get(c["kind"], c["kind"])))
+        self["cat_list"].setList(items)
+        self["cat_list"].moveToIndex(min(index, max(0, len(items) - 1)))
+        self["sum"].setText(_("xtream_cat_sum", self.lang) % (len(self.selected), len(self.categories)))
+
+    def toggleSelect(self):
+        """Zaznacza/odznacza kategorię."""
+        idx = self["cat_list"].getSelectedIndex()
+        if 0 <= idx < len(self.current):
+            i = self.current[idx]
+            if i in self.selected:
+                self.selected.remove(i)
+            else:
+                self.selected.add(i)
+            self.refreshList(idx)
+
+    def toggleAll(self):
+        """Zaznacza wszystkie widoczne kategorie (albo odznacza, gdy wszystkie są zaznaczone)."""
+        visible = set(self.current)
+        if visible <= self.selected:
+            self.selected -= visible
+        else:
+            self.selected |= visible
+        self.refreshList(self["cat_list"].getSelectedIndex())
+
+    def openSearch(self):
+        self.session.openWithCallback(self.onSearchDone, VirtualKeyBoard,
+                                      title=_("picker_search", self.lang), text=self.filter_text)
+
+    def onSearchDone(self, text):
+        if text is None:
+            return
+        self.filter_text = text.lower()
+        if self.filter_text:
+            self.current = [i for i, c in enumerate(self.categories) if self.filter_text in c["name"].lower()]
+            self["filter_lbl"].setText(_("Filtr: %s", self.lang) % self.filter_text)
+        else:
+            self.current = list(range(len(self.categories)))
+            self["filter_lbl"].setText("")
+        self.refreshList()
+
+    def save(self):
+        """Zwraca zaznaczone kategorie (w kolejności serwera)."""
+        self.close([self.categories[i] for i in sorted(self.selected)])
+
+    def cancel(self):
+        self.close(None)